@@ -0,0 +1,269 @@
+"""
+Controle de admissão das requisições à API: limite de taxa por cliente, faixa prioritária
+para uso interativo e descarte rápido de carga.
+
+Cada cliente (o subject do token JWT) tem um balde de fichas (token bucket) que se
+recarrega a ``rate`` fichas por segundo, até ``burst``. Toda requisição admitida custa uma
+ficha; cada página buscada no site da Embrapa durante a requisição custa ``upstream_cost``
+fichas a mais, cobradas quando a busca acontece (o saldo pode ficar negativo, até
+``-burst``). Assim, consultas atendidas pelo cache custam pouco e um cliente que força
+acessos ao site esgota o seu saldo rapidamente. Sem saldo, a requisição recebe 429 com
+Retry-After.
+
+As requisições são separadas em duas faixas: interativa (padrão) e lote (tokens emitidos
+com ``"prioridade": "lote"`` e as rotas /api/batch e /api/exportar). A faixa de lote tem
+um limite próprio de requisições simultâneas, usa no máximo ``batch_upstream`` conexões
+com o site da Embrapa (as demais ficam reservadas para a faixa interativa) e é descartada
+com 503 quando o acesso ao site está saturado. O total de requisições simultâneas do
+processo também é limitado (503 para ambas as faixas).
+
+Os limites valem por processo: com vários workers do gunicorn, cada worker mantém os seus
+baldes e contadores.
+"""
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+
+INTERACTIVE = "interativa"
+BATCH = "lote"
+
+# Requisição admitida em andamento no contexto atual (ver activate)
+_current = contextvars.ContextVar("vitibrasil_admission", default=None)
+
+
+class AdmissionError(RuntimeError):
+    """
+    Requisição recusada pelo controle de admissão.
+
+    Attributes:
+        status (int): 429 (limite de taxa do cliente) ou 503 (servidor saturado).
+        retry_after (int): Segundos sugeridos até uma nova tentativa.
+    """
+
+    def __init__(self, message, status, retry_after):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """Balde de fichas com recarga contínua e saldo mínimo de ``-capacity``."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, cost=1, now=None):
+        """
+        Retira ``cost`` fichas, se houver saldo.
+
+        Returns:
+            float: 0 se as fichas foram retiradas; caso contrário, os segundos até haver saldo.
+        """
+        self._refill(time.monotonic() if now is None else now)
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / self.rate
+
+    def charge(self, cost, now=None):
+        """Cobra ``cost`` fichas mesmo sem saldo (até o saldo mínimo)."""
+        self._refill(time.monotonic() if now is None else now)
+        self.tokens = max(-self.capacity, self.tokens - cost)
+
+
+class Ticket:
+    """Requisição admitida: cobra os acessos ao site e libera a vaga ao terminar."""
+
+    def __init__(self, controller, identity, lane, bucket):
+        self.controller = controller
+        self.identity = identity
+        self.lane = lane
+        self.bucket = bucket
+        self.upstream = 0
+        self._released = False
+
+    def charge_upstream(self):
+        self.upstream += 1
+        self.controller._charge(self.bucket, self.controller.upstream_cost)
+
+    def release(self):
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """
+    Decide se uma requisição é atendida, de acordo com o saldo do cliente e a carga do processo.
+
+    Args:
+        rate (float): Fichas por segundo de cada cliente.
+        burst (int): Capacidade do balde de cada cliente.
+        upstream_cost (int): Fichas cobradas por página buscada no site da Embrapa.
+        max_concurrent (int): Requisições simultâneas do processo (ambas as faixas).
+        batch_concurrent (int): Requisições simultâneas da faixa de lote.
+        batch_upstream (int): Acessos simultâneos ao site da Embrapa da faixa de lote.
+        upstream_busy (callable, optional): Indica se o acesso ao site está saturado.
+        retry_after (int): Retry-After (segundos) das respostas 503.
+        upstream_wait (float): Espera máxima (segundos) da faixa de lote por uma conexão.
+        max_clients (int): Clientes mantidos em memória (os menos recentes são descartados).
+    """
+
+    def __init__(self, rate=20, burst=100, upstream_cost=10, max_concurrent=64, batch_concurrent=4,
+                 batch_upstream=6, upstream_busy=None, retry_after=1, upstream_wait=35, max_clients=10000):
+        self.rate = rate
+        self.burst = burst
+        self.upstream_cost = upstream_cost
+        self.max_concurrent = max_concurrent
+        self.batch_concurrent = batch_concurrent
+        self.batch_upstream = batch_upstream
+        self.upstream_busy = upstream_busy
+        self.retry_after = retry_after
+        self.upstream_wait = upstream_wait
+        self.max_clients = max_clients
+        self._batch_slots = threading.BoundedSemaphore(batch_upstream)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self._active = {INTERACTIVE: 0, BATCH: 0}
+        self._stats = {
+            f"{lane}_{result}": 0
+            for lane in (INTERACTIVE, BATCH) for result in ("admitted", "limited", "shed")
+        }
+        self._stats["upstream_charged"] = 0
+
+    def admit(self, identity, lane=INTERACTIVE):
+        """
+        Admite uma requisição, cobrando uma ficha do cliente.
+
+        Returns:
+            Ticket: Requisição admitida (chame release() ao terminar).
+
+        Raises:
+            AdmissionError: 503 se o processo ou a faixa estiverem saturados; 429 se o
+                cliente estiver sem saldo.
+        """
+        busy = lane == BATCH and self.upstream_busy is not None and self.upstream_busy()
+        with self._lock:
+            if sum(self._active.values()) >= self.max_concurrent:
+                self._stats[f"{lane}_shed"] += 1
+                raise AdmissionError("Servidor sobrecarregado, tente novamente", 503, self.retry_after)
+            if lane == BATCH and (busy or self._active[BATCH] >= self.batch_concurrent):
+                self._stats[f"{lane}_shed"] += 1
+                raise AdmissionError("Limite de consultas em lote atingido, tente novamente", 503, self.retry_after)
+
+            bucket = self._bucket(identity)
+            wait = bucket.take(1)
+            if wait:
+                self._stats[f"{lane}_limited"] += 1
+                raise AdmissionError("Limite de requisições do cliente atingido", 429, max(1, math.ceil(wait)))
+            self._active[lane] += 1
+            self._stats[f"{lane}_admitted"] += 1
+        return Ticket(self, identity, lane, bucket)
+
+    def _bucket(self, identity):
+        bucket = self._buckets.get(identity)
+        if bucket is None:
+            bucket = self._buckets[identity] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(identity)
+        return bucket
+
+    def _charge(self, bucket, cost):
+        with self._lock:
+            bucket.charge(cost)
+            self._stats["upstream_charged"] += 1
+
+    def _release(self, ticket):
+        with self._lock:
+            self._active[ticket.lane] -= 1
+
+    def stats(self):
+        """Retorna os contadores por faixa, as requisições em andamento e a configuração."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["active"] = dict(self._active)
+            stats["clients"] = len(self._buckets)
+        stats.update(
+            rate=self.rate,
+            burst=self.burst,
+            upstream_cost=self.upstream_cost,
+            max_concurrent=self.max_concurrent,
+            batch_concurrent=self.batch_concurrent,
+            batch_upstream=self.batch_upstream,
+        )
+        return stats
+
+
+def activate(ticket):
+    """Define a requisição admitida do contexto atual (as buscas no site são cobradas dela)."""
+    _current.set(ticket)
+
+
+def deactivate():
+    _current.set(None)
+
+
+def charge_upstream():
+    """Cobra da requisição em andamento (se houver) uma página buscada no site da Embrapa."""
+    ticket = _current.get()
+    if ticket is not None:
+        ticket.charge_upstream()
+
+
+@contextmanager
+def upstream_slot():
+    """
+    Reserva uma conexão com o site da Embrapa para a faixa de lote.
+
+    As requisições interativas (ou fora de uma requisição, como o agendador) não esperam.
+
+    Raises:
+        UpstreamBusyError: Se a faixa de lote não liberar uma conexão a tempo.
+    """
+    ticket = _current.get()
+    if ticket is None or ticket.lane != BATCH:
+        yield
+        return
+    slots = ticket.controller._batch_slots
+    if not slots.acquire(timeout=ticket.controller.upstream_wait):
+        from upstream import UpstreamBusyError
+
+        raise UpstreamBusyError("limite de acessos da faixa de lote ao site da Embrapa atingido")
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+@asynccontextmanager
+async def upstream_slot_async(poll_interval=0.05):
+    """Versão de upstream_slot para o loop de eventos (asgi.py), sem bloquear a thread."""
+    ticket = _current.get()
+    if ticket is None or ticket.lane != BATCH:
+        yield
+        return
+    slots = ticket.controller._batch_slots
+    deadline = time.monotonic() + ticket.controller.upstream_wait
+    while not slots.acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            from upstream import UpstreamBusyError
+
+            raise UpstreamBusyError("limite de acessos da faixa de lote ao site da Embrapa atingido")
+        await asyncio.sleep(poll_interval)
+    try:
+        yield
+    finally:
+        slots.release()
@@ -0,0 +1,175 @@
+"""
+Agregados calculados a partir das tabelas armazenadas: séries históricas por produto,
+totais por ano, crescimento ano a ano e ranking.
+
+Os valores de cada tabela são decompostos em (produto, coluna, valor) e os totais por
+coluna são calculados quando a tabela é gravada (ver storage.DataStore.save_table), de
+modo que as consultas de agregados são buscas diretas no armazenamento local.
+
+O numpy é importado apenas no primeiro cálculo (gravação de uma tabela ou consulta de
+agregados), e não na inicialização da API.
+"""
+import math
+
+from models import SUBITEM, TEXT, TOTAL
+from query import normalize
+
+
+def summarize(table):
+    """
+    Decompõe uma tabela nos valores por produto e calcula os totais de cada coluna numérica.
+
+    O total de uma coluna é o da linha de total da tabela ou, sem ela, a soma das linhas
+    de produto (os subitens já estão incluídos nos itens).
+
+    Args:
+        table (models.Table): Tabela com cabeçalhos.
+
+    Returns:
+        tuple: (lista de (produto, chave, grupo, nível, coluna, valor), dict {coluna: total}).
+            grupo é o produto ao qual um subitem pertence ("" para os demais) e chave é o
+            nome do produto sem acentos e em minúsculas.
+    """
+    import numpy as np
+
+    if not table.headers or not table.rows or table.types[0] != TEXT:
+        return [], {}
+    numeric = [i for i, column_type in enumerate(table.types) if column_type != TEXT]
+    if not numeric:
+        return [], {}
+
+    matrix = np.array(
+        [[row.values[i] if i < len(row.values) else None for i in numeric] for row in table.rows],
+        dtype=float,
+    )
+    levels = np.array([row.level or "" for row in table.rows])
+    is_total = levels == TOTAL
+    is_subitem = levels == SUBITEM
+
+    if is_total.any():
+        totals = matrix[is_total][-1]
+    else:
+        totals = np.nansum(matrix[~is_subitem], axis=0)
+
+    entries = []
+    group = ""
+    for row, values, level in zip(table.rows, matrix, levels):
+        if level == TOTAL:
+            continue
+        product = row.values[0]
+        if level != SUBITEM:
+            group = product
+        for i, value in zip(numeric, values.tolist()):
+            entries.append((
+                product,
+                normalize(product),
+                group if level == SUBITEM else "",
+                row.level,
+                table.headers[i],
+                None if np.isnan(value) else value,
+            ))
+    return entries, {table.headers[i]: json_number(total) for i, total in zip(numeric, totals.tolist())}
+
+
+def align(years, values, start=None, end=None):
+    """
+    Alinha uma série a anos consecutivos, com None nos anos sem dados.
+
+    Args:
+        years (list): Anos com valor.
+        values (list): Valores (ou None) de cada ano.
+        start (int, optional): Primeiro ano; padrão: o menor ano da série.
+        end (int, optional): Último ano; padrão: o maior ano da série.
+
+    Returns:
+        tuple: (lista de anos, numpy.ndarray de valores com NaN nos anos ausentes).
+    """
+    import numpy as np
+
+    start = min(years) if start is None else start
+    end = max(years) if end is None else end
+    aligned = np.full(end - start + 1, np.nan)
+    positions = np.asarray(years, dtype=int) - start
+    inside = (positions >= 0) & (positions < len(aligned))
+    aligned[positions[inside]] = np.asarray(values, dtype=float)[inside]
+    return list(range(start, end + 1)), aligned
+
+
+def growth(values):
+    """
+    Calcula o crescimento ano a ano (%), com None para o primeiro ano e quando o ano
+    anterior não tem valor ou é zero.
+
+    Args:
+        values (numpy.ndarray): Valores anuais consecutivos.
+
+    Returns:
+        list: Crescimento percentual de cada ano em relação ao anterior.
+    """
+    import numpy as np
+
+    values = np.asarray(values, dtype=float)
+    result = np.full(len(values), np.nan)
+    if len(values) > 1:
+        previous = values[:-1]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            result[1:] = np.where(previous != 0, (values[1:] - previous) / np.abs(previous) * 100, np.nan)
+    return [None if np.isnan(value) else round(value, 2) for value in result.tolist()]
+
+
+def series_payload(years, values, start=None, end=None):
+    """Monta a série alinhada com os valores e o crescimento ano a ano."""
+    aligned_years, aligned = align(years, values, start, end)
+    return {
+        "years": aligned_years,
+        "values": [json_number(value) for value in aligned.tolist()],
+        "yoy": growth(aligned),
+    }
+
+
+def ranking(entries, previous, total, limit):
+    """
+    Ordena os produtos pelo valor e calcula a participação no total e o crescimento.
+
+    Args:
+        entries (list): Tuplas (produto, grupo, valor) do ano consultado.
+        previous (dict): {(produto, grupo): valor} do ano anterior.
+        total (float | None): Total da coluna no ano consultado.
+        limit (int): Quantidade de produtos retornados.
+
+    Returns:
+        list: Dicionários com posição, produto, grupo, valor, participação (%) e crescimento (%).
+    """
+    import numpy as np
+
+    entries = [entry for entry in entries if entry[2] is not None]
+    if not entries:
+        return []
+    values = np.array([value for _, _, value in entries], dtype=float)
+    before = np.array([
+        np.nan if previous.get((product, group)) is None else previous[(product, group)]
+        for product, group, _ in entries
+    ], dtype=float)
+    order = np.argsort(-values, kind="stable")[:limit]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        shares = values / total * 100 if total else np.full(len(values), np.nan)
+        changes = np.where(before != 0, (values - before) / np.abs(before) * 100, np.nan)
+    return [
+        {
+            "position": position,
+            "product": entries[i][0],
+            "group": entries[i][1] or None,
+            "value": json_number(values[i]),
+            "share": None if np.isnan(shares[i]) else round(float(shares[i]), 2),
+            "yoy": None if np.isnan(changes[i]) else round(float(changes[i]), 2),
+        }
+        for position, i in enumerate(order.tolist(), start=1)
+    ]
+
+
+def json_number(value):
+    """Converte um valor float para JSON: None para NaN e int para valores inteiros."""
+    if value is None or math.isnan(value):
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else value
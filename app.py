@@ -1,12 +1,31 @@
-from flask import Flask, jsonify, request, send_from_directory
-from flask_jwt_extended import JWTManager, jwt_required, create_access_token
+from flask import Flask, Response, g, has_request_context, jsonify, request, send_from_directory, stream_with_context
+from flask_jwt_extended import JWTManager, jwt_required, create_access_token, get_jwt, verify_jwt_in_request
+import contextvars
+import hashlib
 import os
-from datetime import timedelta
-import requests
-from bs4 import BeautifulSoup
-import re
+import threading
+from collections import Counter, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
 from dotenv import load_dotenv
 
+import admission
+import aggregates
+from admission import AdmissionController, AdmissionError
+from archive import HtmlArchive
+import export
+import http_cache
+import metrics
+from cache import EncodedResponseCache, ResponseCache
+from models import Table
+from parse_pool import ParsePool
+from query import PAGING_PARAMS, QueryError, TableQuery, normalize, resolve_column
+from scheduler import Job, RateLimiter, RequestCounter, Scheduler
+from shared_cache import SharedCache, create_backend
+from singleflight import SingleFlight
+from snapshot import SnapshotFormatError, TableSnapshot
+from storage import DataStore
+
 # Carregar variáveis de ambiente
 load_dotenv()
 
@@ -17,8 +36,340 @@ app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'chave-secreta-p
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
 jwt = JWTManager(app)
 
-# URL base do site da Embrapa Vitivinicultura
-BASE_URL = "http://vitibrasil.cnpuv.embrapa.br/"
+# Configuração do cache de respostas (TTL em segundos; 0 significa sem expiração)
+app.config['CACHE_MAX_ITENS'] = int(os.environ.get('CACHE_MAX_ITENS', 256))
+app.config['CACHE_TTL_ANO_FECHADO'] = int(os.environ.get('CACHE_TTL_ANO_FECHADO', 0))
+app.config['CACHE_TTL_ANO_CORRENTE'] = int(os.environ.get('CACHE_TTL_ANO_CORRENTE', 3600))
+app.config['CACHE_JANELA_STALE'] = int(os.environ.get('CACHE_JANELA_STALE', 86400))
+
+# Nível compartilhado do cache entre workers, contêineres e reinícios: URL redis://host:porta/banco
+# ou caminho de um banco SQLite em um volume compartilhado (vazio desativa)
+app.config['CACHE_COMPARTILHADO'] = os.environ.get('CACHE_COMPARTILHADO', '')
+app.config['CACHE_COMPARTILHADO_MAX_ITENS'] = int(os.environ.get('CACHE_COMPARTILHADO_MAX_ITENS', 10000))
+app.config['CACHE_COMPARTILHADO_TIMEOUT'] = float(os.environ.get('CACHE_COMPARTILHADO_TIMEOUT', 0.5))
+
+# Cabeçalhos de cache HTTP e compressão das respostas. Com CACHE_CONTROL_PUBLICO=1 as
+# respostas podem ser armazenadas por caches compartilhados (CDN, proxy reverso)
+app.config['CACHE_CONTROL_PUBLICO'] = os.environ.get('CACHE_CONTROL_PUBLICO', '0') == '1'
+app.config['COMPRESSAO_MIN_BYTES'] = int(os.environ.get('COMPRESSAO_MIN_BYTES', 1024))
+
+# Corpos das respostas JSON já serializados e comprimidos, por ETag (0 desativa)
+app.config['CACHE_RESPOSTAS_MAX_BYTES'] = int(os.environ.get('CACHE_RESPOSTAS_MAX_BYTES', 64 * 1024 * 1024))
+
+# Armazenamento local (SQLite) das tabelas já ingeridas
+app.config['EMBRAPA_DB_PATH'] = os.environ.get('EMBRAPA_DB_PATH', os.path.join('dados', 'vitibrasil.db'))
+
+# Snapshot das tabelas gerado por snapshot.py, mapeado em memória na inicialização (se o
+# arquivo existir; vazio desativa)
+app.config['EMBRAPA_SNAPSHOT'] = os.environ.get(
+    'EMBRAPA_SNAPSHOT', os.path.join(os.path.dirname(app.config['EMBRAPA_DB_PATH']), 'snapshot.bin')
+)
+
+# Cliente HTTP para o site da Embrapa (timeouts em segundos)
+app.config['EMBRAPA_TIMEOUT_CONEXAO'] = float(os.environ.get('EMBRAPA_TIMEOUT_CONEXAO', 5))
+app.config['EMBRAPA_TIMEOUT_LEITURA'] = float(os.environ.get('EMBRAPA_TIMEOUT_LEITURA', 30))
+app.config['EMBRAPA_TENTATIVAS'] = int(os.environ.get('EMBRAPA_TENTATIVAS', 3))
+app.config['EMBRAPA_BACKOFF'] = float(os.environ.get('EMBRAPA_BACKOFF', 0.5))
+app.config['EMBRAPA_MAX_CONEXOES'] = int(os.environ.get('EMBRAPA_MAX_CONEXOES', 8))
+app.config['EMBRAPA_CIRCUITO_FALHAS'] = int(os.environ.get('EMBRAPA_CIRCUITO_FALHAS', 5))
+app.config['EMBRAPA_CIRCUITO_ESPERA'] = float(os.environ.get('EMBRAPA_CIRCUITO_ESPERA', 30))
+
+# Arquivo local do HTML de cada página obtida do site (vazio desativa). Com EMBRAPA_REPLAY=1
+# as páginas são lidas do arquivo em vez do site, sem acesso à rede
+app.config['EMBRAPA_ARQUIVO_HTML'] = os.environ.get(
+    'EMBRAPA_ARQUIVO_HTML', os.path.join(os.path.dirname(app.config['EMBRAPA_DB_PATH']), 'html')
+)
+app.config['EMBRAPA_REPLAY'] = os.environ.get('EMBRAPA_REPLAY', '0') == '1'
+
+# Pool limitado para buscar vários anos em paralelo (consultas com ano_inicio/ano_fim)
+app.config['EMBRAPA_MAX_WORKERS'] = int(os.environ.get('EMBRAPA_MAX_WORKERS', 8))
+
+# Pool de processos para a extração das páginas (0 extrai na própria thread). Com o pool
+# saturado, as extrações esperam até EMBRAPA_PARSE_ESPERA segundos por uma vaga na fila
+# de EMBRAPA_PARSE_FILA páginas (padrão: 2 por processo)
+app.config['EMBRAPA_PARSE_PROCESSOS'] = int(os.environ.get('EMBRAPA_PARSE_PROCESSOS', 0))
+app.config['EMBRAPA_PARSE_FILA'] = int(os.environ.get('EMBRAPA_PARSE_FILA', 0))
+app.config['EMBRAPA_PARSE_ESPERA'] = float(os.environ.get('EMBRAPA_PARSE_ESPERA', 30))
+
+# Número máximo de consultas em uma requisição a /api/batch
+app.config['BATCH_MAX_CONSULTAS'] = int(os.environ.get('BATCH_MAX_CONSULTAS', 500))
+
+# Coalescência das consultas simultâneas à mesma página do site da Embrapa. Com
+# COALESCENCIA_ENTRE_PROCESSOS=1 os workers do gunicorn também se coordenam (lock em arquivo)
+app.config['COALESCENCIA_ENTRE_PROCESSOS'] = os.environ.get('COALESCENCIA_ENTRE_PROCESSOS', '1') == '1'
+
+# Agendador em segundo plano: pré-aquecimento das consultas mais acessadas e atualização
+# periódica do ano corrente e do anterior (intervalos em segundos)
+app.config['AGENDADOR_ATIVO'] = os.environ.get('AGENDADOR_ATIVO', '1') == '1'
+app.config['AGENDADOR_INTERVALO'] = float(os.environ.get('AGENDADOR_INTERVALO', 21600))
+app.config['AGENDADOR_PREAQUECIMENTO'] = int(os.environ.get('AGENDADOR_PREAQUECIMENTO', 20))
+app.config['AGENDADOR_INTERVALO_REQUISICOES'] = float(os.environ.get('AGENDADOR_INTERVALO_REQUISICOES', 2))
+app.config['AGENDADOR_INTERVALO_CONTADORES'] = float(os.environ.get('AGENDADOR_INTERVALO_CONTADORES', 60))
+# Intervalo (segundos) para descartar do cache as tabelas regravadas por outro worker
+app.config['AGENDADOR_INTERVALO_INVALIDACAO'] = float(os.environ.get('AGENDADOR_INTERVALO_INVALIDACAO', 30))
+
+# Threads que executam as rotas Flask no servidor ASGI (asgi.py). As rotas de dados esperam
+# o site da Embrapa sem ocupar uma thread, então poucas threads atendem muitas requisições
+app.config['ASGI_THREADS'] = int(os.environ.get('ASGI_THREADS', 16))
+
+# Controle de admissão das rotas /api: limite de taxa por cliente (subject do token JWT), em
+# fichas por segundo e capacidade do balde. Cada requisição custa 1 ficha e cada página
+# buscada no site da Embrapa custa ADMISSAO_CUSTO_UPSTREAM fichas a mais. A faixa de lote
+# (tokens com "prioridade": "lote", /api/batch e /api/exportar) tem no máximo
+# ADMISSAO_LOTE_SIMULTANEAS requisições e deixa ADMISSAO_RESERVA_INTERATIVA conexões com o
+# site para a faixa interativa. Acima de ADMISSAO_MAX_SIMULTANEAS requisições, responde 503
+app.config['ADMISSAO_ATIVO'] = os.environ.get('ADMISSAO_ATIVO', '1') == '1'
+app.config['ADMISSAO_TAXA'] = float(os.environ.get('ADMISSAO_TAXA', 20))
+app.config['ADMISSAO_RAJADA'] = int(os.environ.get('ADMISSAO_RAJADA', 100))
+app.config['ADMISSAO_CUSTO_UPSTREAM'] = int(os.environ.get('ADMISSAO_CUSTO_UPSTREAM', 10))
+app.config['ADMISSAO_MAX_SIMULTANEAS'] = int(os.environ.get('ADMISSAO_MAX_SIMULTANEAS', 64))
+app.config['ADMISSAO_LOTE_SIMULTANEAS'] = int(os.environ.get('ADMISSAO_LOTE_SIMULTANEAS', 4))
+app.config['ADMISSAO_RESERVA_INTERATIVA'] = int(os.environ.get('ADMISSAO_RESERVA_INTERATIVA', 2))
+
+# Métricas em /metrics (formato do Prometheus), cabeçalho Server-Timing com o tempo de cada
+# fase e, com OTEL_ATIVO=1 e o pacote opentelemetry-api instalado, spans do OpenTelemetry
+app.config['METRICAS_ATIVO'] = os.environ.get('METRICAS_ATIVO', '1') == '1'
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '1') == '1'
+app.config['OTEL_ATIVO'] = os.environ.get('OTEL_ATIVO', '0') == '1'
+if app.config['OTEL_ATIVO']:
+    metrics.enable_tracing()
+
+# Serviços do processo (cache, armazenamento, cliente HTTP e pool de threads), criados por
+# init_services(). Em servidores com vários processos (gunicorn) cada worker cria os seus
+response_cache = None
+encoded_responses = None
+data_store = None
+table_snapshot = None
+html_archive = None
+embrapa_client = None
+fetch_executor = None
+parse_pool = None
+request_counter = None
+single_flight = None
+admission_controller = None
+# Última versão de tabela do registro de mudanças já refletida no cache deste processo
+seen_version = 0
+scheduler = None
+# Busca assíncrona das tabelas, definida por asgi.py quando a API é servida via ASGI
+async_fetcher = None
+_services_pid = None
+
+
+class LazyEmbrapaClient:
+    """
+    Cliente do site da Embrapa (upstream.EmbrapaClient) criado no primeiro acesso ao site.
+
+    O requests e o urllib3 só são importados quando uma tabela precisa ser buscada no
+    site: um worker que atende apenas tabelas do cache, do snapshot ou do armazenamento
+    local não os carrega.
+
+    Args:
+        options (dict): Argumentos de upstream.EmbrapaClient.
+    """
+
+    def __init__(self, options):
+        self.options = options
+        self.max_concurrency = options['max_concurrency']
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from upstream import EmbrapaClient
+                    self._client = EmbrapaClient(**self.options)
+        return self._client
+
+    @property
+    def breaker(self):
+        return self.client.breaker
+
+    def get(self, url):
+        return self.client.get(url)
+
+    def stats(self):
+        if self._client is not None:
+            return self._client.stats()
+        return {
+            "requests": 0, "errors": 0, "rejected": 0, "in_flight": 0, "archive_errors": 0,
+            "mode": "live", "max_concurrency": self.max_concurrency, "circuit_state": "closed",
+        }
+
+    def close(self):
+        if self._client is not None:
+            self._client.close()
+
+
+def init_services(force=False):
+    """
+    Cria os serviços usados pelas rotas a partir de app.config.
+
+    Threads, conexões SQLite e sockets não podem ser compartilhados entre processos, então
+    cada worker do gunicorn chama esta função após o fork (ver gunicorn.conf.py).
+
+    Args:
+        force (bool): Recria os serviços mesmo que já tenham sido criados neste processo.
+    """
+    global response_cache, encoded_responses, data_store, table_snapshot, html_archive, embrapa_client, fetch_executor
+    global parse_pool, request_counter, single_flight, admission_controller, seen_version
+    global _services_pid
+    if _services_pid == os.getpid() and not force:
+        return
+    shared_cache = None
+    if app.config['CACHE_COMPARTILHADO']:
+        shared_cache = SharedCache(create_backend(
+            app.config['CACHE_COMPARTILHADO'],
+            max_items=app.config['CACHE_COMPARTILHADO_MAX_ITENS'],
+            timeout=app.config['CACHE_COMPARTILHADO_TIMEOUT'],
+        ))
+    response_cache = ResponseCache(
+        max_items=app.config['CACHE_MAX_ITENS'],
+        stale_window=app.config['CACHE_JANELA_STALE'],
+        shared=shared_cache,
+    )
+    encoded_responses = EncodedResponseCache(max_bytes=app.config['CACHE_RESPOSTAS_MAX_BYTES'])
+    data_store = DataStore(app.config['EMBRAPA_DB_PATH'])
+    table_snapshot = _open_snapshot(app.config['EMBRAPA_SNAPSHOT'])
+    seen_version = data_store.last_seq()
+    html_archive = HtmlArchive(app.config['EMBRAPA_ARQUIVO_HTML']) if app.config['EMBRAPA_ARQUIVO_HTML'] else None
+    if app.config['EMBRAPA_REPLAY']:
+        if html_archive is None:
+            raise RuntimeError("EMBRAPA_REPLAY=1 requer o arquivo de páginas (EMBRAPA_ARQUIVO_HTML)")
+        from replay import ReplayClient
+        embrapa_client = ReplayClient(html_archive)
+    else:
+        embrapa_client = LazyEmbrapaClient(dict(
+            connect_timeout=app.config['EMBRAPA_TIMEOUT_CONEXAO'],
+            read_timeout=app.config['EMBRAPA_TIMEOUT_LEITURA'],
+            retries=app.config['EMBRAPA_TENTATIVAS'],
+            backoff_factor=app.config['EMBRAPA_BACKOFF'],
+            max_concurrency=app.config['EMBRAPA_MAX_CONEXOES'],
+            failure_threshold=app.config['EMBRAPA_CIRCUITO_FALHAS'],
+            reset_timeout=app.config['EMBRAPA_CIRCUITO_ESPERA'],
+            archive=html_archive,
+        ))
+    fetch_executor = ThreadPoolExecutor(
+        max_workers=app.config['EMBRAPA_MAX_WORKERS'],
+        thread_name_prefix='embrapa-fetch',
+    )
+    parse_pool = ParsePool(
+        processes=app.config['EMBRAPA_PARSE_PROCESSOS'],
+        max_pending=app.config['EMBRAPA_PARSE_FILA'] or None,
+        wait_timeout=app.config['EMBRAPA_PARSE_ESPERA'],
+    )
+    request_counter = RequestCounter()
+    single_flight = SingleFlight(
+        lock_dir=(
+            os.path.join(os.path.dirname(app.config['EMBRAPA_DB_PATH']), 'locks')
+            if app.config['COALESCENCIA_ENTRE_PROCESSOS'] else None
+        ),
+        lock_timeout=app.config['EMBRAPA_TIMEOUT_CONEXAO'] + app.config['EMBRAPA_TIMEOUT_LEITURA'],
+    )
+    admission_controller = None
+    if app.config['ADMISSAO_ATIVO']:
+        admission_controller = AdmissionController(
+            rate=app.config['ADMISSAO_TAXA'],
+            burst=app.config['ADMISSAO_RAJADA'],
+            upstream_cost=app.config['ADMISSAO_CUSTO_UPSTREAM'],
+            max_concurrent=app.config['ADMISSAO_MAX_SIMULTANEAS'],
+            batch_concurrent=app.config['ADMISSAO_LOTE_SIMULTANEAS'],
+            batch_upstream=max(1, app.config['EMBRAPA_MAX_CONEXOES'] - app.config['ADMISSAO_RESERVA_INTERATIVA']),
+            upstream_busy=_upstream_saturated,
+            upstream_wait=app.config['EMBRAPA_TIMEOUT_CONEXAO'] + app.config['EMBRAPA_TIMEOUT_LEITURA'],
+        )
+    _services_pid = os.getpid()
+
+
+def _open_snapshot(path):
+    """Abre o snapshot das tabelas, se existir. Um snapshot inválido é ignorado (com aviso)."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        snapshot = TableSnapshot(path)
+    except (OSError, SnapshotFormatError) as e:
+        app.logger.warning("Snapshot ignorado: %s", e)
+        return None
+    # Tabelas regravadas depois da geração (ex.: nova ingestão após uma correção no parser)
+    # passam a ser lidas do armazenamento local
+    snapshot.discard(_changed_tables(snapshot.version)[0])
+    return snapshot
+
+
+def _upstream_saturated():
+    """Indica se todas as conexões com o site da Embrapa estão em uso (descarte da faixa de lote)."""
+    in_flight = embrapa_client.stats().get('in_flight', 0)
+    if async_fetcher is not None:
+        in_flight += async_fetcher.stats()['in_flight']
+    return in_flight >= app.config['EMBRAPA_MAX_CONEXOES']
+
+
+def start_scheduler():
+    """
+    Inicia o agendador em segundo plano do processo atual, se AGENDADOR_ATIVO.
+
+    Deve ser chamado no processo que atende as requisições (no gunicorn, após o fork).
+    A atualização periódica roda em apenas um processo por vez (lock em arquivo ao lado
+    do banco SQLite); o pré-aquecimento, a gravação dos contadores e a invalidação do
+    cache rodam em todos.
+    """
+    global scheduler
+    if scheduler is not None or not app.config['AGENDADOR_ATIVO']:
+        return scheduler
+    limiter = RateLimiter(app.config['AGENDADOR_INTERVALO_REQUISICOES'])
+    scheduler = Scheduler(
+        [
+            Job('contadores', _flush_request_counts, app.config['AGENDADOR_INTERVALO_CONTADORES'], run_at_start=False),
+            Job('invalidacao', _invalidate_changed_tables, app.config['AGENDADOR_INTERVALO_INVALIDACAO'], run_at_start=False),
+            Job('preaquecimento', lambda stop: _prewarm_cache(limiter, stop)),
+            Job('atualizacao', lambda stop: _refresh_recent_years(limiter, stop), app.config['AGENDADOR_INTERVALO'], exclusive=True),
+        ],
+        lock_path=os.path.join(os.path.dirname(app.config['EMBRAPA_DB_PATH']), 'agendador.lock'),
+    )
+    scheduler.start()
+    return scheduler
+
+
+def shutdown_services():
+    """Encerra o agendador, os pools de threads e de processos e as conexões HTTP do processo atual (desligamento do worker)."""
+    global scheduler
+    if scheduler is not None:
+        scheduler.stop()
+        scheduler = None
+    if request_counter is not None:
+        _flush_request_counts()
+    if fetch_executor is not None:
+        fetch_executor.shutdown(wait=False, cancel_futures=True)
+    if parse_pool is not None:
+        parse_pool.close()
+    if embrapa_client is not None:
+        embrapa_client.close()
+    if response_cache is not None and response_cache.shared is not None:
+        response_cache.shared.close()
+    if table_snapshot is not None:
+        table_snapshot.close()
+
+
+def create_app():
+    """
+    Retorna a aplicação pronta para um servidor WSGI (ex.: gunicorn wsgi:app).
+
+    Returns:
+        Flask: A aplicação, com os serviços do processo atual inicializados.
+    """
+    init_services()
+    return app
+
+
+init_services()
+
+# URL base do site da Embrapa Vitivinicultura (EMBRAPA_URL_BASE permite apontar para um
+# servidor substituto, como o de benchmarks/stub_embrapa.py)
+BASE_URL = os.environ.get('EMBRAPA_URL_BASE', "http://vitibrasil.cnpuv.embrapa.br/")
+
+# Primeiro ano com dados disponíveis no site da Embrapa
+FIRST_YEAR = 1970
 
 # Mapeamento de opções para as categorias
 CATEGORY_OPTIONS = {
@@ -62,14 +413,44 @@ def auth():
     if username != 'admin' or password != 'password':
         return jsonify({"msg": "Credenciais inválidas"}), 401
     
+    # Clientes de lote (ingestão, exportações periódicas) pedem um token da faixa de lote
+    priority = request.json.get('prioridade', admission.INTERACTIVE)
+    if priority not in (admission.INTERACTIVE, admission.BATCH):
+        return jsonify({"msg": "O parâmetro prioridade deve ser interativa ou lote"}), 400
+    
     # Criar token de acesso
-    access_token = create_access_token(identity=username)
+    access_token = create_access_token(identity=username, additional_claims={"prioridade": priority})
     return jsonify(access_token=access_token)
 
+def _is_closed_year(year):
+    """Indica se o ano informado já foi encerrado (seus dados não mudam mais)."""
+    return bool(year) and str(year).isdigit() and int(year) < date.today().year
+
+def _is_final_year(year):
+    """
+    Indica se os dados do ano são definitivos: anos anteriores ao ano passado, que a
+    atualização periódica (_refresh_recent_years) não consulta mais no site.
+    """
+    return bool(year) and str(year).isdigit() and int(year) < date.today().year - 1
+
+def _cache_ttl(year):
+    """
+    Define o TTL do cache de acordo com o ano consultado.
+
+    Anos definitivos não mudam mais e usam CACHE_TTL_ANO_FECHADO; o ano corrente, o
+    anterior (ainda atualizado pelo agendador) e a consulta sem ano, que retorna o ano
+    mais recente, usam CACHE_TTL_ANO_CORRENTE.
+    """
+    if _is_final_year(year):
+        ttl = app.config['CACHE_TTL_ANO_FECHADO']
+    else:
+        ttl = app.config['CACHE_TTL_ANO_CORRENTE']
+    return ttl if ttl > 0 else None
+
 # Função auxiliar para obter dados do site da Embrapa
 def fetch_embrapa_data(category, year=None, subcategory=None):
     """
-    Obtém dados do site da Embrapa Vitivinicultura.
+    Obtém dados do site da Embrapa Vitivinicultura, usando o cache de respostas.
     
     Args:
         category (str): Categoria de dados (producao, processamento, comercializacao, importacao, exportacao)
@@ -79,9 +460,293 @@ def fetch_embrapa_data(category, year=None, subcategory=None):
     Returns:
         dict: Dados obtidos do site da Embrapa
     """
+    result = fetch_embrapa_table(category, year, subcategory)
+    return result.to_dict() if isinstance(result, Table) else result
+
+def fetch_embrapa_table(category, year=None, subcategory=None):
+    """
+    Obtém a tabela tipada de uma categoria, usando o cache de respostas.
+    
+    Args:
+        category (str): Categoria de dados.
+        year (str, optional): Ano dos dados. Se None, usa o ano mais recente disponível.
+        subcategory (str, optional): Subcategoria específica dentro da categoria principal.
+        
+    Returns:
+        models.Table | dict: Tabela obtida, ou dicionário com a chave "error" em caso de falha
+    """
     if category not in CATEGORY_OPTIONS:
         return {"error": "Categoria inválida"}
     
+    # Subcategorias inválidas são ignoradas, então não fazem parte da chave
+    if subcategory not in SUBCATEGORY_OPTIONS.get(category, {}):
+        subcategory = None
+    
+    request_counter.add((category, year or None, subcategory))
+    return _cached_table(category, year, subcategory)
+
+def _cached_table(category, year=None, subcategory=None):
+    """
+    Obtém a tabela pelo cache de respostas (categoria e subcategoria já validadas).
+    
+    No servidor ASGI (asgi.py) as tabelas da requisição já foram obtidas de forma assíncrona
+    e chegam em request.environ['vitibrasil.prefetched'], sem bloquear a thread.
+    """
+    key = (category, year or None, subcategory)
+    result = _prefetched(key)
+    if result is None:
+        result = response_cache.get_or_load(
+            key,
+            lambda: _load_embrapa_data(category, year, subcategory),
+            ttl=_cache_ttl(year),
+            cacheable=lambda result: isinstance(result, Table),
+        )
+    if not isinstance(result, Table):
+        # Site indisponível: servir a última versão conhecida, mesmo que expirada
+        cached = response_cache.peek(key)
+        if cached is not None:
+            return cached
+    return result
+
+def _prefetched(key):
+    if not has_request_context():
+        return None
+    return request.environ.get('vitibrasil.prefetched', {}).get(key)
+
+def fetch_embrapa_range(category, start_year, end_year, subcategory=None, layout='linhas'):
+    """
+    Obtém dados de vários anos em paralelo e os combina em uma única tabela.
+    
+    As consultas de cada ano são distribuídas no pool limitado fetch_executor. Falhas em
+    anos individuais são reportadas em "errors" sem interromper os demais anos.
+    
+    Args:
+        category (str): Categoria de dados.
+        start_year (int): Primeiro ano do intervalo.
+        end_year (int): Último ano do intervalo (inclusive).
+        subcategory (str, optional): Subcategoria específica dentro da categoria principal.
+        layout (str, optional): "linhas" (um dicionário por linha) ou "colunas" (valores tipados por coluna).
+        
+    Returns:
+        dict: Linhas de todos os anos, com a coluna "year" indicando o ano de cada linha
+    """
+    if category not in CATEGORY_OPTIONS:
+        return {"error": "Categoria inválida"}
+    
+    tables, errors = _fetch_range_tables(category, start_year, end_year, subcategory)
+    return _range_payload(category, start_year, end_year, subcategory, tables, errors, layout)
+
+def _fetch_range_tables(category, start_year, end_year, subcategory=None):
+    """
+    Obtém as tabelas de um intervalo de anos pelo pool limitado.
+    
+    Returns:
+        tuple: ({ano: models.Table}, {ano (str): mensagem de erro})
+    """
+    specs = ((category, str(year), subcategory) for year in range(start_year, end_year + 1))
+    tables = {}
+    errors = {}
+    for (_, year, _), result in iter_embrapa_tables(specs):
+        if isinstance(result, Table):
+            tables[int(year)] = result
+        else:
+            errors[year] = result["error"]
+    return tables, errors
+
+def _range_payload(category, start_year, end_year, subcategory, tables, errors, layout='linhas'):
+    """Combina as tabelas de um intervalo de anos em um único resultado."""
+    headers = ["year"]
+    types = ["int"]
+    for table in tables.values():
+        for header, column_type in zip(table.headers or [], table.types or []):
+            if header not in headers:
+                headers.append(header)
+                types.append(column_type)
+    
+    response = {
+        "category": category,
+        "subcategory": subcategory,
+        "start_year": start_year,
+        "end_year": end_year,
+        "titles": {str(year): table.title for year, table in tables.items()},
+        "headers": headers,
+    }
+    if layout == 'colunas':
+        columns = [[] for _ in headers]
+        levels = []
+        for year, table in tables.items():
+            table_columns = table.to_columnar()["columns"]
+            by_header = dict(zip(table.headers or [], table_columns))
+            columns[0].extend([year] * len(table.rows))
+            for header, column in zip(headers[1:], columns[1:]):
+                column.extend(by_header.get(header, [None] * len(table.rows)))
+            levels.extend(row.level for row in table.rows)
+        response.update({"types": types, "columns": columns, "levels": levels})
+    else:
+        response["data"] = [
+            {"year": year, **row}
+            for year, table in tables.items()
+            for row in table.row_dicts()
+        ]
+    response["errors"] = errors
+    return response
+
+def iter_embrapa_tables(specs, ordered=True):
+    """
+    Obtém as tabelas de várias consultas em paralelo.
+    
+    No máximo EMBRAPA_MAX_WORKERS consultas ficam em andamento ao mesmo tempo, de modo que
+    a memória usada não cresce com o número de consultas.
+    
+    Args:
+        specs (iterable): Tuplas (categoria, ano, subcategoria).
+        ordered (bool): Entrega os resultados na ordem das consultas; com False, na ordem
+            em que ficam prontos.
+        
+    Yields:
+        tuple: (spec, models.Table | dict de erro)
+    """
+    if not ordered:
+        yield from _iter_completed(specs)
+        return
+    pending = deque()
+    for spec in specs:
+        pending.append((spec, _submit_fetch(spec)))
+        if len(pending) >= app.config['EMBRAPA_MAX_WORKERS']:
+            yield _pop_result(pending)
+    while pending:
+        yield _pop_result(pending)
+
+def _iter_completed(specs):
+    pending = {}
+    for spec in specs:
+        pending[_submit_fetch(spec)] = spec
+        if len(pending) >= app.config['EMBRAPA_MAX_WORKERS']:
+            yield from _pop_completed(pending)
+    while pending:
+        yield from _pop_completed(pending)
+
+def _submit_fetch(spec):
+    # O contexto da requisição é copiado para que os tempos das fases entrem no Server-Timing
+    return fetch_executor.submit(contextvars.copy_context().run, fetch_embrapa_table, *spec)
+
+def _pop_result(pending):
+    spec, future = pending.popleft()
+    return spec, _future_result(future)
+
+def _pop_completed(pending):
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        yield pending.pop(future), _future_result(future)
+
+def _future_result(future):
+    try:
+        return future.result()
+    except Exception as e:
+        return {"error": f"Erro ao processar os dados: {str(e)}"}
+
+def _load_embrapa_data(category, year=None, subcategory=None):
+    """
+    Carrega os dados do armazenamento local e, se não estiverem lá, do site da Embrapa.
+    
+    Anos encerrados são servidos diretamente do armazenamento local. Tabelas obtidas
+    do site para um ano específico são gravadas no armazenamento, que também serve de
+    reserva quando o site da Embrapa está indisponível.
+    
+    Consultas simultâneas à mesma página (mesma URL) compartilham um único acesso ao site:
+    entre threads do processo e, entre workers, pelo lock de single_flight. O worker que
+    esperou pelo lock usa a tabela gravada pelo outro, se ela foi obtida durante a espera.
+    """
+    year_is_known = bool(year) and str(year).isdigit()
+    if year_is_known and _is_closed_year(year):
+        with metrics.phase('store'):
+            stored = get_stored_table(category, year, subcategory)
+        if stored is not None:
+            return stored
+    
+    started_at = datetime.now(timezone.utc)
+    
+    def recheck():
+        stored = data_store.get_table(category, year, subcategory) if year_is_known else None
+        if stored is not None and stored.fetched_at >= started_at:
+            return stored
+        return None
+    
+    result = single_flight.do(
+        _embrapa_url(category, year, subcategory),
+        lambda: _scrape_and_store(category, year, subcategory),
+        recheck=recheck,
+    )
+    if year_is_known and not isinstance(result, Table):
+        stored = get_stored_table(category, year, subcategory)
+        if stored is not None:
+            return stored
+    return result
+
+def get_stored_table(category, year, subcategory=None):
+    """
+    Obtém a tabela de um ano do snapshot (snapshot.py) ou do armazenamento local.
+    
+    Os anos que a atualização periódica ainda pode regravar (o corrente e o anterior) são
+    lidos primeiro do armazenamento local, que pode ter uma versão mais nova que a do
+    snapshot; os demais, primeiro do snapshot.
+    
+    Returns:
+        models.Table | None: A tabela, ou None se ela não estiver armazenada.
+    """
+    if table_snapshot is not None and _is_final_year(year):
+        table = table_snapshot.get_table(category, year, subcategory)
+        if table is not None:
+            return table
+    stored = data_store.get_table(category, year, subcategory)
+    if stored is None and table_snapshot is not None:
+        stored = table_snapshot.get_table(category, year, subcategory)
+    return stored
+
+def _scrape_and_store(category, year=None, subcategory=None):
+    """Consulta o site da Embrapa e grava a tabela obtida para um ano específico."""
+    result = _scrape_embrapa_data(category, year, subcategory)
+    if isinstance(result, Table) and result.rows and year and str(year).isdigit():
+        with metrics.phase('store'):
+            data_store.save_table(category, year, subcategory, result)
+    return result
+
+def _scrape_embrapa_data(category, year=None, subcategory=None):
+    """
+    Consulta o site da Embrapa e extrai a tabela de dados, sem passar pelo cache.
+    
+    Args:
+        category (str): Categoria de dados, já validada.
+        year (str, optional): Ano dos dados.
+        subcategory (str, optional): Subcategoria específica dentro da categoria principal.
+        
+    Returns:
+        models.Table | dict: Tabela obtida, ou dicionário com a chave "error" em caso de falha
+    """
+    from requests.exceptions import RequestException
+
+    url = _embrapa_url(category, year, subcategory)
+    try:
+        # Fazer requisição ao site da Embrapa (a faixa de lote usa apenas as conexões não reservadas)
+        with admission.upstream_slot(), metrics.phase('upstream'):
+            admission.charge_upstream()
+            response = embrapa_client.get(url)
+        
+        # Extrair título, cabeçalhos e linhas da tabela, convertendo os valores numéricos
+        return _parse_response(response, url)
+        
+    except RequestException as e:
+        return {"error": f"Erro ao acessar o site da Embrapa: {str(e)}"}
+    except Exception as e:
+        return {"error": f"Erro ao processar os dados: {str(e)}"}
+
+def _parse_response(response, url):
+    """Extrai a tabela de uma resposta do site da Embrapa (no pool de processos, se configurado)."""
+    encoding = response.encoding or getattr(response, 'apparent_encoding', None)
+    return parse_pool.parse(response.content, encoding, url, datetime.now(timezone.utc))
+
+def _embrapa_url(category, year=None, subcategory=None):
+    """Monta a URL da página de uma categoria no site da Embrapa."""
     # Construir URL para a categoria
     url = f"{BASE_URL}index.php?opcao={CATEGORY_OPTIONS[category]}"
     
@@ -92,118 +757,651 @@ def fetch_embrapa_data(category, year=None, subcategory=None):
     # Verificar se a subcategoria é válida para a categoria
     if subcategory and category in SUBCATEGORY_OPTIONS and subcategory in SUBCATEGORY_OPTIONS[category]:
         url += f"&subopcao={SUBCATEGORY_OPTIONS[category][subcategory]}"
+    return url
+
+def refresh_embrapa_table(category, year, subcategory=None):
+    """
+    Consulta novamente o site da Embrapa e atualiza a tabela armazenada se ela mudou.
     
-    try:
-        # Fazer requisição ao site da Embrapa
-        response = requests.get(url)
-        response.raise_for_status()
-        
-        # Parsear o HTML
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extrair título da tabela
-        title = "Dados não encontrados"
-        
-        # Procurar o título em diferentes formatos
-        if soup.find('h3'):
-            title = soup.find('h3').text.strip()
-        elif soup.find('div', class_='conteudo') and soup.find('div', class_='conteudo').find('h3'):
-            title = soup.find('div', class_='conteudo').find('h3').text.strip()
-        
-        # Extrair dados da tabela - procurar em diferentes formatos
-        table = None
-        if soup.find('table', class_='tabela'):
-            table = soup.find('table', class_='tabela')
-        else:
-            # Tentar encontrar qualquer tabela na página
-            tables = soup.find_all('table')
-            if tables:
-                table = tables[0]  # Usar a primeira tabela encontrada
-        
-        if not table:
-            return {
-                "title": title,
-                "data": [],
-                "message": "Tabela não encontrada",
-                "source_url": url
-            }
+    A página só é extraída se o hash do HTML for diferente do armazenado, e a tabela só é
+    regravada (e substituída no cache) se o hash do conteúdo extraído também mudou.
+    
+    Args:
+        category (str): Categoria de dados, já validada.
+        year (str): Ano dos dados.
+        subcategory (str, optional): Subcategoria específica dentro da categoria principal.
         
-        # Extrair cabeçalhos
-        headers = []
-        header_row = table.find('tr')
-        if header_row:
-            headers = [th.text.strip() for th in header_row.find_all(['th', 'td'])]
+    Returns:
+        str: "changed", "unchanged", "empty" (página sem tabela) ou "error".
+    """
+    from requests.exceptions import RequestException
+
+    url = _embrapa_url(category, year, subcategory)
+    try:
+        with metrics.phase('upstream'):
+            response = embrapa_client.get(url)
+    except RequestException:
+        return "error"
+    
+    html_hash = hashlib.sha256(response.content).hexdigest()
+    content_hash, stored_html_hash = data_store.get_hashes(category, year, subcategory)
+    if html_hash == stored_html_hash:
+        return "unchanged"
+    
+    try:
+        table = _parse_response(response, url)
+    except Exception:
+        return "error"
+    if not table.rows:
+        return "empty"
+    if table.content_hash() == content_hash:
+        data_store.set_html_hash(category, year, subcategory, html_hash)
+        return "unchanged"
+    
+    data_store.save_table(category, year, subcategory, table, html_hash)
+    response_cache.set((category, str(year), subcategory), table, ttl=_cache_ttl(year))
+    return "changed"
+
+def _refresh_recent_years(limiter, stop_event):
+    """Tarefa do agendador: atualiza todas as tabelas do ano corrente e do anterior."""
+    summary = Counter()
+    current_year = date.today().year
+    for year in (current_year, current_year - 1):
+        for category in CATEGORY_OPTIONS:
+            for subcategory in SUBCATEGORY_OPTIONS.get(category) or [None]:
+                if not limiter.wait(stop_event):
+                    return dict(summary)
+                summary[refresh_embrapa_table(category, str(year), subcategory)] += 1
+    return dict(summary)
+
+def _prewarm_cache(limiter, stop_event):
+    """Tarefa do agendador: carrega no cache as consultas mais acessadas."""
+    summary = Counter()
+    for category, year, subcategory in data_store.top_requested(app.config['AGENDADOR_PREAQUECIMENTO']):
+        if category not in CATEGORY_OPTIONS or response_cache.peek((category, year, subcategory)) is not None:
+            continue
+        # Anos encerrados já armazenados não acessam o site da Embrapa
+        if not (_is_closed_year(year) and data_store.has_table(category, year, subcategory)):
+            if not limiter.wait(stop_event):
+                break
+        result = _cached_table(category, year, subcategory)
+        summary["loaded" if isinstance(result, Table) else "error"] += 1
+    return dict(summary)
+
+def _invalidate_changed_tables(stop_event=None):
+    """
+    Tarefa do agendador: descarta do cache em memória as tabelas regravadas por outro processo.
+
+    A atualização periódica roda em um único worker e substitui a tabela apenas no cache
+    dele e no nível compartilhado; os demais encontram as tabelas alteradas no registro de
+    mudanças do armazenamento local (versoes) e as carregam novamente na próxima consulta.
+    Essas tabelas também são descartadas do snapshot, que passaria a servir a versão antiga.
+    """
+    global seen_version
+    tables, seen_version = _changed_tables(seen_version)
+    if table_snapshot is not None:
+        table_snapshot.discard(tables)
+    keys = []
+    for category, year, subcategory in tables:
+        keys.append((category, str(year), subcategory))
+        if year == date.today().year:
+            # A consulta sem ano retorna o ano corrente
+            keys.append((category, None, subcategory))
+    return {"changes": len(tables), "invalidated": response_cache.invalidate(keys)}
+
+def _changed_tables(since):
+    """
+    Lê o registro de mudanças do armazenamento local a partir da versão ``since``.
+
+    Returns:
+        tuple: (lista de (categoria, ano, subcategoria) das tabelas regravadas, última versão lida).
+    """
+    tables = []
+    while True:
+        changes = data_store.get_changes(since=since, limit=1000)
+        tables.extend((change["category"], change["year"], change["subcategory"]) for change in changes)
+        if changes:
+            since = changes[-1]["seq"]
+        if len(changes) < 1000:
+            return tables, since
+
+def _flush_request_counts(stop_event=None):
+    """Tarefa do agendador: grava no armazenamento local os contadores de acesso."""
+    counts = request_counter.drain()
+    data_store.add_request_counts(counts)
+    return {"keys": len(counts)}
+
+def _parse_year_range():
+    """
+    Lê os parâmetros ano_inicio e ano_fim (um deles basta) da requisição.
+    
+    Returns:
+        tuple: (ano_inicio, ano_fim, None) ou (None, None, resposta de erro 400).
+            Sem nenhum dos parâmetros, retorna (None, None, None).
+    """
+    start_year, end_year, error = year_range(request.args.get('ano_inicio'), request.args.get('ano_fim'))
+    if error:
+        return None, None, (jsonify({"msg": error}), 400)
+    return start_year, end_year, None
+
+def year_range(start, end):
+    """
+    Valida os valores de ano_inicio e ano_fim (um deles basta).
+    
+    Returns:
+        tuple: (ano_inicio, ano_fim, None) ou (None, None, mensagem de erro). Sem nenhum dos
+            valores, retorna (None, None, None).
+    """
+    if not start and not end:
+        return None, None, None
+    
+    if (start and not start.isdigit()) or (end and not end.isdigit()):
+        return None, None, "Os parâmetros ano_inicio e ano_fim devem ser anos numéricos"
+    start_year = int(start) if start else FIRST_YEAR
+    end_year = int(end) if end else date.today().year
+    if start_year > end_year:
+        return None, None, "ano_inicio deve ser menor ou igual a ano_fim"
+    if start_year < FIRST_YEAR or end_year > date.today().year:
+        return None, None, f"O intervalo deve estar entre {FIRST_YEAR} e {date.today().year}"
+    return start_year, end_year, None
+
+def _negotiate_format(default='json'):
+    """
+    Define o formato da resposta pelo parâmetro formato ou pelo cabeçalho Accept.
+    
+    Returns:
+        tuple: (formato, None) ou (None, resposta de erro).
+    """
+    name = export.format_from_request(request, default)
+    if name is None:
+        return None, (jsonify({"msg": f"Formato inválido. Valores: {', '.join(export.MIMETYPES)}"}), 400)
+    if not export.available(name):
+        return None, (jsonify({"msg": f"O formato {name} requer o pacote pyarrow"}), 406)
+    return name, None
+
+def _stream_response(name, context_columns, items, filename):
+    """Cria a resposta em streaming de uma exportação no formato informado."""
+    response = Response(
+        stream_with_context(export.stream(name, context_columns, items)),
+        mimetype=export.MIMETYPES[name],
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}.{name}"'
+    return response
+
+def _apply_query(query, result):
+    """Aplica a consulta a uma tabela de uma exportação em streaming (colunas inválidas viram erro)."""
+    if query is None or not isinstance(result, Table):
+        return result
+    try:
+        return query.apply(result)[0]
+    except QueryError as e:
+        return {"error": str(e)}
+
+def _conditional_response(build, etag, last_modified, closed, ttl):
+    """
+    Responde 304 se o cliente já possui a versão atual; caso contrário, monta a resposta com build().
+    
+    Em ambos os casos a resposta recebe ETag, Last-Modified e Cache-Control.
+    """
+    cache_control = http_cache.cache_control(closed, ttl, public=app.config['CACHE_CONTROL_PUBLICO'])
+    if http_cache.not_modified(request, etag, last_modified):
+        response = Response(status=304)
+    else:
+        with metrics.phase('serialize'):
+            response = build()
+    return http_cache.set_validators(response, etag, last_modified, cache_control)
+
+def _json_response(etag, encode):
+    """
+    Monta uma resposta JSON a partir do corpo guardado em encoded_responses para a ETag.
+    
+    O corpo é serializado (e comprimido, conforme o Accept-Encoding) uma única vez por versão
+    dos dados e representação; as requisições seguintes apenas copiam os bytes.
+    
+    Args:
+        etag (str): ETag da representação, que identifica a versão dos dados.
+        encode (callable): Função sem argumentos que retorna (JSON em bytes, cabeçalhos extras).
+    """
+    body, headers = encoded_responses.get_or_encode(etag, encode)
+    encoding = http_cache.negotiate_encoding(request) if len(body) >= app.config['COMPRESSAO_MIN_BYTES'] else None
+    if encoding is not None:
+        body = encoded_responses.get_or_compress(etag, encoding, body, lambda data: http_cache.compress_body(data, encoding))
+    response = Response(body, mimetype='application/json')
+    response.headers.update(headers)
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
+def _no_store(response):
+    """Impede que respostas de erro sejam armazenadas por caches."""
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+def _representation_key(name):
+    """Identifica a representação pedida: formato negociado e parâmetros da requisição."""
+    return name, sorted(request.args.items(multi=True))
+
+def _data_response(category, subcategory=None):
+    """
+    Monta a resposta das rotas de dados para um ano ou para um intervalo de anos.
+    
+    Os parâmetros ano_inicio e ano_fim (opcionais, um deles basta) definem um intervalo;
+    sem eles, é usado o parâmetro ano. O parâmetro layout escolhe entre uma linha por
+    dicionário ("linhas", padrão) e valores tipados por coluna ("colunas"). O parâmetro
+    formato (ou o cabeçalho Accept) permite obter os dados em NDJSON, CSV, Parquet ou Arrow.
+    
+    Os parâmetros de query.TableQuery (busca, nivel, min_/max_<coluna>, colunas, ordem,
+    limite e deslocamento) filtram, projetam, ordenam e paginam as linhas tipadas antes da
+    serialização; ordem e paginação valem apenas para consultas de um único ano.
+    
+    As respostas trazem ETag (calculada a partir do hash do conteúdo) e Last-Modified, e
+    retornam 304 quando o cliente já possui a versão atual.
+    """
+    layout = request.args.get('layout', 'linhas')
+    if layout not in ('linhas', 'colunas'):
+        return jsonify({"msg": "O parâmetro layout deve ser 'linhas' ou 'colunas'"}), 400
+    name, error = _negotiate_format()
+    if error:
+        return error
+    start_year, end_year, error = _parse_year_range()
+    if error:
+        return error
+    try:
+        query = TableQuery.from_args(request.args)
+    except QueryError as e:
+        return jsonify({"msg": str(e)}), 400
+    if subcategory not in SUBCATEGORY_OPTIONS.get(category, {}):
+        subcategory = None
+    
+    if start_year is None:
+        year = request.args.get('ano')
+        result = fetch_embrapa_table(category, year, subcategory)
+        if not isinstance(result, Table):
+            return _no_store(jsonify(result))
         
-        # Se não encontrou cabeçalhos, usar nomes genéricos
-        if not headers:
-            # Contar o número de colunas na primeira linha
-            first_row = table.find('tr')
-            if first_row:
-                num_cols = len(first_row.find_all('td'))
-                headers = [f"Coluna {i+1}" for i in range(num_cols)]
+        etag = http_cache.make_etag(result.content_hash(), _representation_key(name))
         
-        # Extrair linhas de dados
-        rows = []
-        data_rows = table.find_all('tr')[1:] if headers else table.find_all('tr')  # Pular a linha de cabeçalho se houver
+        def apply_query():
+            return query.apply(result) if query else (result, len(result.rows))
         
-        for tr in data_rows:
-            cells = tr.find_all('td')
-            if cells:  # Verificar se há células na linha
-                row = {}
-                # Usar o número mínimo entre células e cabeçalhos para evitar erros
-                for i in range(min(len(cells), len(headers))):
-                    row[headers[i]] = cells[i].text.strip()
-                rows.append(row)
+        def encode():
+            selected, total = apply_query()
+            payload = selected.to_columnar() if layout == 'colunas' else selected.to_dict()
+            headers = {}
+            if query and query.is_paged:
+                payload["pagination"] = query.pagination(total)
+                headers['X-Total-Count'] = str(total)
+            return export.dumps_json(payload, sort_keys=True), headers
         
-        return {
-            "title": title,
-            "headers": headers,
-            "data": rows,
-            "source_url": url
-        }
+        def build():
+            if name == 'json':
+                return _json_response(etag, encode)
+            selected, total = apply_query()
+            items = [((int(year) if year and year.isdigit() else None,), selected)]
+            response = _stream_response(name, ["ano"], items, f"{category}_{year or 'recente'}")
+            if query and query.is_paged:
+                response.headers['X-Total-Count'] = str(total)
+            return response
         
-    except requests.exceptions.RequestException as e:
-        return {"error": f"Erro ao acessar o site da Embrapa: {str(e)}"}
-    except Exception as e:
-        return {"error": f"Erro ao processar os dados: {str(e)}"}
+        try:
+            return _conditional_response(build, etag, result.fetched_at, _is_final_year(year), _cache_ttl(year))
+        except QueryError as e:
+            return jsonify({"msg": str(e)}), 400
+    
+    if query and any(param in request.args for param in PAGING_PARAMS):
+        return jsonify({"msg": "Os parâmetros ordem, limite e deslocamento não se aplicam a intervalos de anos"}), 400
+    
+    if name != 'json':
+        specs = ((category, str(year), subcategory) for year in range(start_year, end_year + 1))
+        items = (
+            ((int(spec[1]),), _apply_query(query, result))
+            for spec, result in iter_embrapa_tables(specs)
+        )
+        return _stream_response(name, ["ano"], items, f"{category}_{start_year}_{end_year}")
+    
+    tables, errors = _fetch_range_tables(category, start_year, end_year, subcategory)
+    if query:
+        try:
+            tables = {year: query.apply(table)[0] for year, table in tables.items()}
+        except QueryError as e:
+            return jsonify({"msg": str(e)}), 400
+    etag = http_cache.make_etag(
+        *(table.content_hash() for table in tables.values()),
+        sorted(errors.items()),
+        _representation_key(name),
+    )
+    fetched = [table.fetched_at for table in tables.values() if table.fetched_at]
+    closed = _is_final_year(end_year) and not errors
+    def encode():
+        payload = _range_payload(category, start_year, end_year, subcategory, tables, errors, layout)
+        return export.dumps_json(payload, sort_keys=True), {}
+    
+    return _conditional_response(
+        lambda: _json_response(etag, encode),
+        etag,
+        max(fetched) if fetched else None,
+        closed,
+        _cache_ttl(end_year) if not errors else 0,
+    )
 
 # Rota para obter dados de produção
 @app.route('/api/producao', methods=['GET'])
 @jwt_required()
 def get_producao():
-    year = request.args.get('ano')
-    return jsonify(fetch_embrapa_data('producao', year))
+    return _data_response('producao')
 
 # Rota para obter dados de processamento
 @app.route('/api/processamento', methods=['GET'])
 @jwt_required()
 def get_processamento():
-    year = request.args.get('ano')
     subcategory = request.args.get('subcategoria')
-    return jsonify(fetch_embrapa_data('processamento', year, subcategory))
+    return _data_response('processamento', subcategory)
 
 # Rota para obter dados de comercialização
 @app.route('/api/comercializacao', methods=['GET'])
 @jwt_required()
 def get_comercializacao():
-    year = request.args.get('ano')
-    return jsonify(fetch_embrapa_data('comercializacao', year))
+    return _data_response('comercializacao')
 
 # Rota para obter dados de importação
 @app.route('/api/importacao', methods=['GET'])
 @jwt_required()
 def get_importacao():
-    year = request.args.get('ano')
     subcategory = request.args.get('subcategoria')
-    return jsonify(fetch_embrapa_data('importacao', year, subcategory))
+    return _data_response('importacao', subcategory)
 
 # Rota para obter dados de exportação
 @app.route('/api/exportacao', methods=['GET'])
 @jwt_required()
 def get_exportacao():
-    year = request.args.get('ano')
     subcategory = request.args.get('subcategoria')
-    return jsonify(fetch_embrapa_data('exportacao', year, subcategory))
+    return _data_response('exportacao', subcategory)
+
+# Rota para exportar uma categoria inteira (todas as subcategorias e anos) em lote
+@app.route('/api/exportar/<categoria>', methods=['GET'])
+@jwt_required()
+def get_exportar(categoria):
+    if categoria not in CATEGORY_OPTIONS:
+        return jsonify({"msg": "Categoria inválida"}), 404
+    name, error = _negotiate_format(default='ndjson')
+    if error:
+        return error
+    if name == 'json':
+        name = 'ndjson'
+    start_year, end_year, error = _parse_year_range()
+    if error:
+        return error
+    
+    subcategory = request.args.get('subcategoria')
+    if subcategory:
+        if subcategory not in SUBCATEGORY_OPTIONS.get(categoria, {}):
+            return jsonify({"msg": "Subcategoria inválida"}), 400
+        subcategories = [subcategory]
+    else:
+        subcategories = list(SUBCATEGORY_OPTIONS.get(categoria, {})) or [None]
+    if start_year is None:
+        start_year, end_year = FIRST_YEAR, date.today().year
+    if any(param in request.args for param in PAGING_PARAMS):
+        return jsonify({"msg": "Os parâmetros ordem, limite e deslocamento não se aplicam à exportação em lote"}), 400
+    try:
+        query = TableQuery.from_args(request.args)
+    except QueryError as e:
+        return jsonify({"msg": str(e)}), 400
+    
+    specs = (
+        (categoria, str(year), sub)
+        for sub in subcategories
+        for year in range(start_year, end_year + 1)
+    )
+    items = (
+        ((spec[2], int(spec[1])), _apply_query(query, result))
+        for spec, result in iter_embrapa_tables(specs)
+    )
+    return _stream_response(name, ["subcategoria", "ano"], items, f"{categoria}_{start_year}_{end_year}")
+
+def _parse_batch_query(query):
+    """
+    Valida uma consulta de /api/batch ({"categoria", "ano", "subcategoria"}).
+    
+    Returns:
+        tuple: ((categoria, ano, subcategoria), None) ou (None, mensagem de erro).
+    """
+    if not isinstance(query, dict):
+        return None, "cada consulta deve ser um objeto"
+    category = query.get('categoria')
+    if category not in CATEGORY_OPTIONS:
+        return None, "Categoria inválida"
+    subcategory = query.get('subcategoria')
+    if subcategory is not None and subcategory not in SUBCATEGORY_OPTIONS.get(category, {}):
+        return None, "Subcategoria inválida"
+    year = query.get('ano')
+    if year is not None:
+        year = str(year)
+        if not year.isdigit() or not FIRST_YEAR <= int(year) <= date.today().year:
+            return None, f"O ano deve estar entre {FIRST_YEAR} e {date.today().year}"
+    return (category, year, subcategory), None
+
+def _batch_key(spec):
+    """Chave de uma consulta na resposta de /api/batch, ex.: "exportacao/2023/vinhos"."""
+    return "/".join(part for part in spec if part)
+
+def _batch_result(result, layout):
+    if not isinstance(result, Table):
+        return result
+    return result.to_columnar() if layout == 'colunas' else result.to_dict()
+
+# Rota para consultar várias tabelas em uma única requisição
+@app.route('/api/batch', methods=['POST'])
+@jwt_required()
+def post_batch():
+    body = request.get_json(silent=True)
+    queries = body.get('consultas') if isinstance(body, dict) else None
+    if not isinstance(queries, list) or not queries:
+        return jsonify({"msg": "Informe a lista de consultas no campo 'consultas'"}), 400
+    if len(queries) > app.config['BATCH_MAX_CONSULTAS']:
+        return jsonify({"msg": f"Máximo de {app.config['BATCH_MAX_CONSULTAS']} consultas por requisição"}), 400
+    layout = body.get('layout', 'linhas')
+    if layout not in ('linhas', 'colunas'):
+        return jsonify({"msg": "O parâmetro layout deve ser 'linhas' ou 'colunas'"}), 400
+    name = export.format_from_request(request)
+    if name not in ('json', 'ndjson'):
+        return jsonify({"msg": "O parâmetro formato deve ser 'json' ou 'ndjson'"}), 400
+    
+    # Consultas repetidas são resolvidas uma única vez
+    specs = {}
+    for index, query in enumerate(queries):
+        spec, error = _parse_batch_query(query)
+        if error:
+            return jsonify({"msg": f"Consulta {index}: {error}"}), 400
+        specs.setdefault(_batch_key(spec), spec)
+    
+    if name == 'ndjson':
+        # Cada resultado é enviado assim que fica pronto
+        def generate():
+            for spec, result in iter_embrapa_tables(specs.values(), ordered=False):
+                line = {"key": _batch_key(spec), "result": _batch_result(result, layout)}
+                yield export.dumps_json(line) + b"\n"
+        return Response(stream_with_context(generate()), mimetype=export.MIMETYPES['ndjson'])
+    
+    results = {}
+    errors = []
+    for spec, result in iter_embrapa_tables(specs.values()):
+        key = _batch_key(spec)
+        results[key] = _batch_result(result, layout)
+        if not isinstance(result, Table):
+            errors.append(key)
+    with metrics.phase('serialize'):
+        return jsonify({"results": results, "errors": errors})
+
+def _aggregate_subcategory(category, required=True):
+    """
+    Lê a subcategoria das rotas de agregados, obrigatória nas categorias que possuem subcategorias.
+    
+    Returns:
+        tuple: (subcategoria ou None, None) ou (None, resposta de erro 400).
+    """
+    subcategory = request.args.get('subcategoria')
+    options = SUBCATEGORY_OPTIONS.get(category, {})
+    if subcategory and subcategory not in options:
+        return None, (jsonify({"msg": "Subcategoria inválida"}), 400)
+    if required and options and not subcategory:
+        return None, (jsonify({"msg": f"Informe a subcategoria: {', '.join(options)}"}), 400)
+    return subcategory or None, None
+
+def _pick_column(columns, name, default_prefix=None):
+    """Escolhe a coluna pelo parâmetro coluna ou, sem ele, a que começa com default_prefix (ou a primeira)."""
+    if name:
+        return columns[resolve_column(columns, name)]
+    for column in columns:
+        if default_prefix and normalize(column).startswith(default_prefix):
+            return column
+    return columns[0]
+
+# Rota para a série histórica de um produto (ou país) a partir dos agregados armazenados
+@app.route('/api/series/<categoria>', methods=['GET'])
+@jwt_required()
+def get_series(categoria):
+    if categoria not in CATEGORY_OPTIONS:
+        return jsonify({"msg": "Categoria inválida"}), 404
+    subcategory, error = _aggregate_subcategory(categoria)
+    if error:
+        return error
+    product = request.args.get('produto')
+    if not product:
+        return jsonify({"msg": "Informe o produto (ou país) no parâmetro produto"}), 400
+    start_year, end_year, error = _parse_year_range()
+    if error:
+        return error
+    
+    series = data_store.get_series(
+        categoria, subcategory, normalize(product), request.args.get('grupo'), start_year, end_year
+    )
+    if not series:
+        return jsonify({"msg": "Produto não encontrado nos dados armazenados"}), 404
+    if request.args.get('coluna'):
+        try:
+            column = _pick_column(sorted({key[2] for key in series}), request.args['coluna'])
+        except QueryError as e:
+            return jsonify({"msg": str(e)}), 400
+        series = {key: value for key, value in series.items() if key[2] == column}
+    
+    return jsonify({
+        "category": categoria,
+        "subcategory": subcategory,
+        "series": [
+            {
+                "product": product_name,
+                "group": group or None,
+                "column": column_name,
+                **aggregates.series_payload(years, values, start_year, end_year),
+            }
+            for (product_name, group, column_name), (years, values) in series.items()
+        ],
+    })
+
+# Rota para os totais por ano (com crescimento ano a ano) de uma categoria
+@app.route('/api/totais/<categoria>', methods=['GET'])
+@jwt_required()
+def get_totais(categoria):
+    if categoria not in CATEGORY_OPTIONS:
+        return jsonify({"msg": "Categoria inválida"}), 404
+    subcategory, error = _aggregate_subcategory(categoria, required=False)
+    if error:
+        return error
+    start_year, end_year, error = _parse_year_range()
+    if error:
+        return error
+    
+    if subcategory:
+        subcategories = [subcategory]
+    else:
+        subcategories = list(SUBCATEGORY_OPTIONS.get(categoria, {})) or [None]
+    results = []
+    for sub in subcategories:
+        totals = data_store.get_totals(categoria, sub, start_year, end_year)
+        if not totals:
+            continue
+        years = sorted({year for column_years, _ in totals.values() for year in column_years})
+        first = start_year if start_year is not None else years[0]
+        last = end_year if end_year is not None else years[-1]
+        columns = {}
+        for column, (column_years, values) in totals.items():
+            payload = aggregates.series_payload(column_years, values, first, last)
+            columns[column] = {"values": payload["values"], "yoy": payload["yoy"]}
+        results.append({"subcategory": sub, "years": list(range(first, last + 1)), "columns": columns})
+    return jsonify({"category": categoria, "totals": results})
+
+# Rota para os maiores produtos (ou países) de um ano, com participação e crescimento
+@app.route('/api/ranking/<categoria>', methods=['GET'])
+@jwt_required()
+def get_ranking(categoria):
+    if categoria not in CATEGORY_OPTIONS:
+        return jsonify({"msg": "Categoria inválida"}), 404
+    subcategory, error = _aggregate_subcategory(categoria)
+    if error:
+        return error
+    limit = request.args.get('limite', '10')
+    if not limit.isdigit() or not 1 <= int(limit) <= 1000:
+        return jsonify({"msg": "O parâmetro limite deve estar entre 1 e 1000"}), 400
+    year = request.args.get('ano')
+    if year is not None and not year.isdigit():
+        return jsonify({"msg": "O parâmetro ano deve ser numérico"}), 400
+    if year is None:
+        years = data_store.aggregate_years(categoria, subcategory)
+        if not years:
+            return jsonify({"msg": "Não há dados armazenados para esta categoria"}), 404
+        year = years[-1]
+    year = int(year)
+    
+    totals = data_store.get_totals(categoria, subcategory, year, year)
+    if not totals:
+        return jsonify({"msg": f"Não há dados armazenados para o ano {year}"}), 404
+    try:
+        column = _pick_column(list(totals), request.args.get('coluna'), default_prefix='valor')
+    except QueryError as e:
+        return jsonify({"msg": str(e)}), 400
+    
+    entries = data_store.get_year_values(categoria, subcategory, year, column)
+    previous = {
+        (product, group): value
+        for product, group, value in data_store.get_year_values(categoria, subcategory, year - 1, column)
+    }
+    total = totals[column][1][0]
+    return jsonify({
+        "category": categoria,
+        "subcategory": subcategory,
+        "year": year,
+        "column": column,
+        "total": aggregates.json_number(total),
+        "ranking": aggregates.ranking(entries, previous, total, int(limit)),
+    })
+
+# Rota para o registro de mudanças: versões de tabelas gravadas após um número de sequência
+@app.route('/api/changes', methods=['GET'])
+@jwt_required()
+def get_changes():
+    since = request.args.get('since', '0')
+    if not since.isdigit():
+        return jsonify({"msg": "O parâmetro since deve ser um número de sequência"}), 400
+    limit = request.args.get('limite', '100')
+    if not limit.isdigit() or not 1 <= int(limit) <= 1000:
+        return jsonify({"msg": "O parâmetro limite deve estar entre 1 e 1000"}), 400
+    category = request.args.get('categoria')
+    if category is not None and category not in CATEGORY_OPTIONS:
+        return jsonify({"msg": "Categoria inválida"}), 400
+    with_diff = request.args.get('diff', '0').lower() in ('1', 'true', 'sim')
+    
+    last_seq = data_store.last_seq()
+    changes = data_store.get_changes(int(since), int(limit), category, with_diff)
+    # next é o valor de since para a próxima consulta; sem mudanças, o cliente mantém o seu
+    next_seq = changes[-1]["seq"] if changes else int(since)
+    return jsonify({
+        "since": int(since),
+        "next": next_seq,
+        "last_seq": last_seq,
+        "has_more": len(changes) == int(limit) and next_seq < last_seq,
+        "changes": changes,
+    })
 
 # Rota para listar todas as categorias disponíveis
 @app.route('/api/categorias', methods=['GET'])
@@ -214,6 +1412,201 @@ def get_categorias():
         "subcategorias": SUBCATEGORY_OPTIONS
     })
 
+# Rota para consultar as estatísticas do cache de respostas
+@app.route('/api/cache', methods=['GET'])
+@jwt_required()
+def get_cache_stats():
+    stats = {**response_cache.stats(), "responses": encoded_responses.stats()}
+    if table_snapshot is not None:
+        stats["snapshot"] = table_snapshot.stats()
+    return jsonify(stats)
+
+# Rota para consultar o estado do cliente HTTP do site da Embrapa
+@app.route('/api/upstream', methods=['GET'])
+@jwt_required()
+def get_upstream_stats():
+    stats = {**embrapa_client.stats(), "coalescing": single_flight.stats(), "parse": parse_pool.stats()}
+    if admission_controller is not None:
+        stats["admission"] = admission_controller.stats()
+    if html_archive is not None:
+        stats["archive"] = html_archive.stats()
+    if async_fetcher is not None:
+        stats["async"] = async_fetcher.stats()
+    return jsonify(stats)
+
+# Rota para consultar o estado do agendador em segundo plano
+@app.route('/api/agendador', methods=['GET'])
+@jwt_required()
+def get_scheduler_status():
+    if scheduler is None:
+        return jsonify({"running": False, "jobs": {}})
+    return jsonify(scheduler.status())
+
+# Rota para as métricas no formato do Prometheus (sem autenticação, para o coletor)
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    if not app.config['METRICAS_ATIVO']:
+        return jsonify({"msg": "Métricas desativadas"}), 404
+    return Response(metrics.registry.render(), content_type=metrics.CONTENT_TYPE)
+
+def _service_metrics():
+    """Coletor de /metrics com os contadores do cache, do cliente HTTP, da coalescência e da extração."""
+    cache = response_cache.stats()
+    shared = cache.get("shared", {})
+    encoded = encoded_responses.stats()
+    upstream = embrapa_client.stats()
+    coalescing = single_flight.stats()
+    parsing = parse_pool.stats()
+    # No modo ASGI, as tabelas das rotas de dados são buscadas pelo cliente assíncrono
+    if async_fetcher is not None:
+        fetcher = async_fetcher.stats()
+        upstream = {**upstream, **{key: upstream.get(key, 0) + fetcher[key]
+                                   for key in ('requests', 'errors', 'rejected', 'in_flight')}}
+        coalescing = {**coalescing, 'shared': coalescing['shared'] + fetcher['shared']}
+    return [
+        ("vitibrasil_cache_lookups_total", "counter", "Consultas ao cache de respostas, por resultado.", [
+            ({"result": "hit"}, cache["hits"]),
+            ({"result": "stale_hit"}, cache["stale_hits"]),
+            ({"result": "miss"}, cache["misses"]),
+        ]),
+        ("vitibrasil_cache_hit_ratio", "gauge", "Fração das consultas ao cache atendidas por ele.",
+         [({}, cache["hit_ratio"])]),
+        ("vitibrasil_cache_items", "gauge", "Itens no cache de respostas.", [({}, cache["size"])]),
+        ("vitibrasil_encoded_responses_lookups_total", "counter",
+         "Consultas aos corpos de resposta já serializados, por resultado.", [
+            ({"result": "hit"}, encoded["hits"]),
+            ({"result": "miss"}, encoded["misses"]),
+        ]),
+        ("vitibrasil_encoded_responses_bytes", "gauge", "Bytes dos corpos de resposta já serializados.",
+         [({}, encoded["bytes"])]),
+        ("vitibrasil_shared_cache_lookups_total", "counter",
+         "Consultas ao nível compartilhado do cache (entradas ausentes da memória), por resultado.", [
+            ({"result": "hit"}, shared.get("hits", 0)),
+            ({"result": "miss"}, shared.get("misses", 0)),
+            ({"result": "error"}, shared.get("errors", 0)),
+            ({"result": "skipped"}, shared.get("skipped", 0)),
+        ]),
+        ("vitibrasil_upstream_requests_total", "counter", "Requisições ao site da Embrapa.",
+         [({}, upstream["requests"])]),
+        ("vitibrasil_upstream_errors_total", "counter", "Requisições ao site da Embrapa com erro.",
+         [({}, upstream["errors"])]),
+        ("vitibrasil_upstream_rejected_total", "counter",
+         "Requisições não enviadas ao site da Embrapa (circuito aberto ou sem vaga).",
+         [({}, upstream.get("rejected", 0))]),
+        ("vitibrasil_upstream_in_flight", "gauge", "Requisições ao site da Embrapa em andamento.",
+         [({}, upstream.get("in_flight", 0))]),
+        ("vitibrasil_upstream_circuit_open", "gauge", "1 se o circuito do site da Embrapa estiver aberto.",
+         [({}, int(upstream.get("circuit_state") == "open"))]),
+        ("vitibrasil_coalesced_requests_total", "counter",
+         "Consultas que compartilharam o acesso ao site de outra consulta simultânea.",
+         [({}, coalescing["shared"] + coalescing["rechecked"])]),
+        ("vitibrasil_parse_pending", "gauge", "Páginas aguardando ou em extração no pool de processos.",
+         [({}, parsing["pending"])]),
+        ("vitibrasil_parse_rejected_total", "counter",
+         "Extrações recusadas por falta de vaga no pool de processos.", [({}, parsing["rejected"])]),
+        *_admission_metrics(),
+    ]
+
+def _admission_metrics():
+    if admission_controller is None:
+        return []
+    stats = admission_controller.stats()
+    lanes = (admission.INTERACTIVE, admission.BATCH)
+    return [
+        ("vitibrasil_admission_total", "counter",
+         "Requisições avaliadas pelo controle de admissão, por faixa e resultado.", [
+            ({"lane": lane, "result": result}, stats[f"{lane}_{result}"])
+            for lane in lanes for result in ("admitted", "limited", "shed")
+        ]),
+        ("vitibrasil_admission_active", "gauge", "Requisições admitidas em andamento, por faixa.",
+         [({"lane": lane}, stats["active"][lane]) for lane in lanes]),
+    ]
+
+metrics.registry.add_collector(_service_metrics)
+
+@app.before_request
+def start_request_timer():
+    g.request_timer = metrics.RequestTimer(request.endpoint or 'desconhecido', request.environ.get('vitibrasil.timings'))
+
+# Controle de admissão das rotas /api (após o início da medição, para que as recusas entrem nas métricas)
+@app.before_request
+def admit_request():
+    if admission_controller is None or not request.path.startswith('/api/'):
+        return None
+    # No servidor ASGI, as rotas de dados já passaram pela admissão antes da busca das tabelas
+    ticket = request.environ.get('vitibrasil.admission')
+    if ticket is None:
+        try:
+            verify_jwt_in_request(optional=True)
+            claims = get_jwt()
+        except Exception:
+            # Token inválido ou expirado: a rota responde com 401
+            return None
+        if not claims:
+            return None
+        try:
+            ticket = admit(claims, request.path)
+        except AdmissionError as e:
+            ticket = e
+    if isinstance(ticket, AdmissionError):
+        response = jsonify({"msg": str(ticket)})
+        response.status_code = ticket.status
+        response.headers['Retry-After'] = str(ticket.retry_after)
+        return response
+    g.admission_ticket = ticket
+    admission.activate(ticket)
+    return None
+
+def admit(claims, path):
+    """
+    Admite uma requisição do cliente identificado pelo token JWT.
+
+    Args:
+        claims (dict): Conteúdo do token JWT (subject e prioridade).
+        path (str): Caminho da requisição (/api/batch e /api/exportar usam a faixa de lote).
+
+    Returns:
+        admission.Ticket: Requisição admitida.
+
+    Raises:
+        AdmissionError: Se a requisição deve ser recusada (429 ou 503).
+    """
+    lane = admission.INTERACTIVE
+    if claims.get('prioridade') == admission.BATCH or path.startswith(('/api/batch', '/api/exportar/')):
+        lane = admission.BATCH
+    return admission_controller.admit(str(claims[app.config['JWT_IDENTITY_CLAIM']]), lane)
+
+@app.teardown_request
+def release_admission(exception=None):
+    ticket = g.pop('admission_ticket', None)
+    if ticket is not None:
+        admission.deactivate()
+        ticket.release()
+
+# Registrado antes de compress_response para ser executado depois dela (os hooks after_request
+# rodam em ordem inversa), de modo que o tamanho e o tempo incluem a compressão
+@app.after_request
+def record_request_metrics(response):
+    timer = g.get('request_timer')
+    if timer is None:
+        return response
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = timer.server_timing()
+    timer.record(request.method, response.status_code, None if response.is_streamed else response.content_length)
+    return response
+
+@app.teardown_request
+def finish_request_timer(exception=None):
+    timer = g.pop('request_timer', None)
+    if timer is not None:
+        timer.finish()
+
+# Comprime as respostas grandes (gzip ou brotli) conforme o Accept-Encoding do cliente
+@app.after_request
+def compress_response(response):
+    with metrics.phase('compress'):
+        return http_cache.compress(response, request, app.config['COMPRESSAO_MIN_BYTES'])
+
 # Rota para servir arquivos estáticos da documentação
 @app.route('/docs/<path:path>')
 def send_docs(path):
@@ -313,28 +1706,238 @@ def index():
             <div class="endpoint">
                 <span class="method post">POST</span>
                 <code>/auth</code>
-                <p>Endpoint para autenticação e obtenção do token JWT.</p>
+                <p>Endpoint para autenticação e obtenção do token JWT. Clientes em lote informam <code>"prioridade": "lote"</code> (opcional; padrão: interativa). Com o controle de admissão, as rotas respondem 429 ou 503 com o cabeçalho Retry-After quando o limite do cliente ou da faixa de lote é atingido.</p>
                 <h3>Corpo da Requisição:</h3>
                 <pre>
 {
     "username": "admin",
-    "password": "password"
+    "password": "password",
+    "prioridade": "interativa"
 }
                 </pre>
                 <h3>Resposta:</h3>
                 <pre>
-{
-    "access_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."
-}
+{
+    "access_token": "eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9..."
+}
+                </pre>
+            </div>
+            
+            <h2>Endpoints Disponíveis</h2>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/categorias</code>
+                <p>Retorna todas as categorias e subcategorias disponíveis na API.</p>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/producao</code>
+                <p>Retorna dados de produção de vinhos, sucos e derivados.</p>
+                <h3>Parâmetros:</h3>
+                <table>
+                    <tr>
+                        <th>Parâmetro</th>
+                        <th>Tipo</th>
+                        <th>Descrição</th>
+                    </tr>
+                    <tr>
+                        <td>ano</td>
+                        <td>string</td>
+                        <td>Ano dos dados (opcional). Exemplo: 2023</td>
+                    </tr>
+                    <tr>
+                        <td>layout</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>linhas</code> (padrão, um objeto por linha) ou <code>colunas</code> (valores numéricos tipados por coluna, com <code>types</code> e <code>levels</code>)</td>
+                    </tr>
+                    <tr>
+                        <td>formato</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>json</code> (padrão), <code>ndjson</code>, <code>csv</code>, <code>parquet</code> ou <code>arrow</code>. Também pode ser escolhido pelo cabeçalho <code>Accept</code>.</td>
+                    </tr>
+                    <tr>
+                        <td>ano_inicio / ano_fim</td>
+                        <td>string</td>
+                        <td>Intervalo de anos (opcional). Retorna as linhas de todos os anos com a coluna <code>year</code> e os erros por ano em <code>errors</code>. Exemplo: ano_inicio=1970&amp;ano_fim=2023</td>
+                    </tr>
+                    <tr>
+                        <td>busca</td>
+                        <td>string</td>
+                        <td>Apenas as linhas cuja primeira coluna (produto, país ou cultivar) contém o texto, sem diferenciar maiúsculas nem acentos (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>nivel</td>
+                        <td>string</td>
+                        <td>Apenas as linhas dos níveis informados, separados por vírgula: <code>item</code>, <code>subitem</code> ou <code>total</code>; com <code>-</code>, exclui o nível, ex.: nivel=-total (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>min_{coluna} / max_{coluna}</td>
+                        <td>número</td>
+                        <td>Limites para uma coluna numérica, indicada pelo início do cabeçalho (opcional). Exemplo: min_quantidade=1000</td>
+                    </tr>
+                    <tr>
+                        <td>colunas</td>
+                        <td>string</td>
+                        <td>Colunas retornadas, separadas por vírgula (opcional). Exemplo: colunas=paises,valor</td>
+                    </tr>
+                    <tr>
+                        <td>ordem</td>
+                        <td>string</td>
+                        <td>Coluna para ordenar as linhas; prefixo <code>-</code> para ordem decrescente (opcional). Exemplo: ordem=-valor</td>
+                    </tr>
+                    <tr>
+                        <td>limite / deslocamento</td>
+                        <td>inteiro</td>
+                        <td>Paginação (opcional). A resposta JSON traz <code>pagination</code> com o total de linhas e o próximo deslocamento</td>
+                    </tr>
+                </table>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/processamento</code>
+                <p>Retorna dados de processamento de uvas.</p>
+                <h3>Parâmetros:</h3>
+                <table>
+                    <tr>
+                        <th>Parâmetro</th>
+                        <th>Tipo</th>
+                        <th>Descrição</th>
+                    </tr>
+                    <tr>
+                        <td>ano</td>
+                        <td>string</td>
+                        <td>Ano dos dados (opcional). Exemplo: 2023</td>
+                    </tr>
+                    <tr>
+                        <td>layout</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>linhas</code> (padrão, um objeto por linha) ou <code>colunas</code> (valores numéricos tipados por coluna, com <code>types</code> e <code>levels</code>)</td>
+                    </tr>
+                    <tr>
+                        <td>formato</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>json</code> (padrão), <code>ndjson</code>, <code>csv</code>, <code>parquet</code> ou <code>arrow</code>. Também pode ser escolhido pelo cabeçalho <code>Accept</code>.</td>
+                    </tr>
+                    <tr>
+                        <td>ano_inicio / ano_fim</td>
+                        <td>string</td>
+                        <td>Intervalo de anos (opcional). Retorna as linhas de todos os anos com a coluna <code>year</code> e os erros por ano em <code>errors</code>. Exemplo: ano_inicio=1970&amp;ano_fim=2023</td>
+                    </tr>
+                    <tr>
+                        <td>busca</td>
+                        <td>string</td>
+                        <td>Apenas as linhas cuja primeira coluna (produto, país ou cultivar) contém o texto, sem diferenciar maiúsculas nem acentos (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>nivel</td>
+                        <td>string</td>
+                        <td>Apenas as linhas dos níveis informados, separados por vírgula: <code>item</code>, <code>subitem</code> ou <code>total</code>; com <code>-</code>, exclui o nível, ex.: nivel=-total (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>min_{coluna} / max_{coluna}</td>
+                        <td>número</td>
+                        <td>Limites para uma coluna numérica, indicada pelo início do cabeçalho (opcional). Exemplo: min_quantidade=1000</td>
+                    </tr>
+                    <tr>
+                        <td>colunas</td>
+                        <td>string</td>
+                        <td>Colunas retornadas, separadas por vírgula (opcional). Exemplo: colunas=paises,valor</td>
+                    </tr>
+                    <tr>
+                        <td>ordem</td>
+                        <td>string</td>
+                        <td>Coluna para ordenar as linhas; prefixo <code>-</code> para ordem decrescente (opcional). Exemplo: ordem=-valor</td>
+                    </tr>
+                    <tr>
+                        <td>limite / deslocamento</td>
+                        <td>inteiro</td>
+                        <td>Paginação (opcional). A resposta JSON traz <code>pagination</code> com o total de linhas e o próximo deslocamento</td>
+                    </tr>
+                    <tr>
+                        <td>subcategoria</td>
+                        <td>string</td>
+                        <td>Subcategoria de processamento (opcional). Valores: viniferas, americanas_hibridas, uvas_mesa, sem_classificacao</td>
+                    </tr>
+                </table>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
                 </pre>
             </div>
             
-            <h2>Endpoints Disponíveis</h2>
-            
             <div class="endpoint">
                 <span class="method get">GET</span>
-                <code>/api/categorias</code>
-                <p>Retorna todas as categorias e subcategorias disponíveis na API.</p>
+                <code>/api/comercializacao</code>
+                <p>Retorna dados de comercialização de vinhos e derivados.</p>
+                <h3>Parâmetros:</h3>
+                <table>
+                    <tr>
+                        <th>Parâmetro</th>
+                        <th>Tipo</th>
+                        <th>Descrição</th>
+                    </tr>
+                    <tr>
+                        <td>ano</td>
+                        <td>string</td>
+                        <td>Ano dos dados (opcional). Exemplo: 2023</td>
+                    </tr>
+                    <tr>
+                        <td>layout</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>linhas</code> (padrão, um objeto por linha) ou <code>colunas</code> (valores numéricos tipados por coluna, com <code>types</code> e <code>levels</code>)</td>
+                    </tr>
+                    <tr>
+                        <td>formato</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>json</code> (padrão), <code>ndjson</code>, <code>csv</code>, <code>parquet</code> ou <code>arrow</code>. Também pode ser escolhido pelo cabeçalho <code>Accept</code>.</td>
+                    </tr>
+                    <tr>
+                        <td>ano_inicio / ano_fim</td>
+                        <td>string</td>
+                        <td>Intervalo de anos (opcional). Retorna as linhas de todos os anos com a coluna <code>year</code> e os erros por ano em <code>errors</code>. Exemplo: ano_inicio=1970&amp;ano_fim=2023</td>
+                    </tr>
+                    <tr>
+                        <td>busca</td>
+                        <td>string</td>
+                        <td>Apenas as linhas cuja primeira coluna (produto, país ou cultivar) contém o texto, sem diferenciar maiúsculas nem acentos (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>nivel</td>
+                        <td>string</td>
+                        <td>Apenas as linhas dos níveis informados, separados por vírgula: <code>item</code>, <code>subitem</code> ou <code>total</code>; com <code>-</code>, exclui o nível, ex.: nivel=-total (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>min_{coluna} / max_{coluna}</td>
+                        <td>número</td>
+                        <td>Limites para uma coluna numérica, indicada pelo início do cabeçalho (opcional). Exemplo: min_quantidade=1000</td>
+                    </tr>
+                    <tr>
+                        <td>colunas</td>
+                        <td>string</td>
+                        <td>Colunas retornadas, separadas por vírgula (opcional). Exemplo: colunas=paises,valor</td>
+                    </tr>
+                    <tr>
+                        <td>ordem</td>
+                        <td>string</td>
+                        <td>Coluna para ordenar as linhas; prefixo <code>-</code> para ordem decrescente (opcional). Exemplo: ordem=-valor</td>
+                    </tr>
+                    <tr>
+                        <td>limite / deslocamento</td>
+                        <td>inteiro</td>
+                        <td>Paginação (opcional). A resposta JSON traz <code>pagination</code> com o total de linhas e o próximo deslocamento</td>
+                    </tr>
+                </table>
                 <h3>Cabeçalhos:</h3>
                 <pre>
 Authorization: Bearer {seu_token_jwt}
@@ -343,8 +1946,8 @@ Authorization: Bearer {seu_token_jwt}
             
             <div class="endpoint">
                 <span class="method get">GET</span>
-                <code>/api/producao</code>
-                <p>Retorna dados de produção de vinhos, sucos e derivados.</p>
+                <code>/api/importacao</code>
+                <p>Retorna dados de importação de produtos vitivinícolas.</p>
                 <h3>Parâmetros:</h3>
                 <table>
                     <tr>
@@ -357,6 +1960,56 @@ Authorization: Bearer {seu_token_jwt}
                         <td>string</td>
                         <td>Ano dos dados (opcional). Exemplo: 2023</td>
                     </tr>
+                    <tr>
+                        <td>layout</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>linhas</code> (padrão, um objeto por linha) ou <code>colunas</code> (valores numéricos tipados por coluna, com <code>types</code> e <code>levels</code>)</td>
+                    </tr>
+                    <tr>
+                        <td>formato</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>json</code> (padrão), <code>ndjson</code>, <code>csv</code>, <code>parquet</code> ou <code>arrow</code>. Também pode ser escolhido pelo cabeçalho <code>Accept</code>.</td>
+                    </tr>
+                    <tr>
+                        <td>ano_inicio / ano_fim</td>
+                        <td>string</td>
+                        <td>Intervalo de anos (opcional). Retorna as linhas de todos os anos com a coluna <code>year</code> e os erros por ano em <code>errors</code>. Exemplo: ano_inicio=1970&amp;ano_fim=2023</td>
+                    </tr>
+                    <tr>
+                        <td>busca</td>
+                        <td>string</td>
+                        <td>Apenas as linhas cuja primeira coluna (produto, país ou cultivar) contém o texto, sem diferenciar maiúsculas nem acentos (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>nivel</td>
+                        <td>string</td>
+                        <td>Apenas as linhas dos níveis informados, separados por vírgula: <code>item</code>, <code>subitem</code> ou <code>total</code>; com <code>-</code>, exclui o nível, ex.: nivel=-total (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>min_{coluna} / max_{coluna}</td>
+                        <td>número</td>
+                        <td>Limites para uma coluna numérica, indicada pelo início do cabeçalho (opcional). Exemplo: min_quantidade=1000</td>
+                    </tr>
+                    <tr>
+                        <td>colunas</td>
+                        <td>string</td>
+                        <td>Colunas retornadas, separadas por vírgula (opcional). Exemplo: colunas=paises,valor</td>
+                    </tr>
+                    <tr>
+                        <td>ordem</td>
+                        <td>string</td>
+                        <td>Coluna para ordenar as linhas; prefixo <code>-</code> para ordem decrescente (opcional). Exemplo: ordem=-valor</td>
+                    </tr>
+                    <tr>
+                        <td>limite / deslocamento</td>
+                        <td>inteiro</td>
+                        <td>Paginação (opcional). A resposta JSON traz <code>pagination</code> com o total de linhas e o próximo deslocamento</td>
+                    </tr>
+                    <tr>
+                        <td>subcategoria</td>
+                        <td>string</td>
+                        <td>Subcategoria de importação (opcional). Valores: vinhos, espumantes, uvas_frescas, uvas_passas, suco_uva</td>
+                    </tr>
                 </table>
                 <h3>Cabeçalhos:</h3>
                 <pre>
@@ -366,8 +2019,8 @@ Authorization: Bearer {seu_token_jwt}
             
             <div class="endpoint">
                 <span class="method get">GET</span>
-                <code>/api/processamento</code>
-                <p>Retorna dados de processamento de uvas.</p>
+                <code>/api/exportacao</code>
+                <p>Retorna dados de exportação de produtos vitivinícolas.</p>
                 <h3>Parâmetros:</h3>
                 <table>
                     <tr>
@@ -380,10 +2033,55 @@ Authorization: Bearer {seu_token_jwt}
                         <td>string</td>
                         <td>Ano dos dados (opcional). Exemplo: 2023</td>
                     </tr>
+                    <tr>
+                        <td>layout</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>linhas</code> (padrão, um objeto por linha) ou <code>colunas</code> (valores numéricos tipados por coluna, com <code>types</code> e <code>levels</code>)</td>
+                    </tr>
+                    <tr>
+                        <td>formato</td>
+                        <td>string</td>
+                        <td>Formato da resposta (opcional): <code>json</code> (padrão), <code>ndjson</code>, <code>csv</code>, <code>parquet</code> ou <code>arrow</code>. Também pode ser escolhido pelo cabeçalho <code>Accept</code>.</td>
+                    </tr>
+                    <tr>
+                        <td>ano_inicio / ano_fim</td>
+                        <td>string</td>
+                        <td>Intervalo de anos (opcional). Retorna as linhas de todos os anos com a coluna <code>year</code> e os erros por ano em <code>errors</code>. Exemplo: ano_inicio=1970&amp;ano_fim=2023</td>
+                    </tr>
+                    <tr>
+                        <td>busca</td>
+                        <td>string</td>
+                        <td>Apenas as linhas cuja primeira coluna (produto, país ou cultivar) contém o texto, sem diferenciar maiúsculas nem acentos (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>nivel</td>
+                        <td>string</td>
+                        <td>Apenas as linhas dos níveis informados, separados por vírgula: <code>item</code>, <code>subitem</code> ou <code>total</code>; com <code>-</code>, exclui o nível, ex.: nivel=-total (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>min_{coluna} / max_{coluna}</td>
+                        <td>número</td>
+                        <td>Limites para uma coluna numérica, indicada pelo início do cabeçalho (opcional). Exemplo: min_quantidade=1000</td>
+                    </tr>
+                    <tr>
+                        <td>colunas</td>
+                        <td>string</td>
+                        <td>Colunas retornadas, separadas por vírgula (opcional). Exemplo: colunas=paises,valor</td>
+                    </tr>
+                    <tr>
+                        <td>ordem</td>
+                        <td>string</td>
+                        <td>Coluna para ordenar as linhas; prefixo <code>-</code> para ordem decrescente (opcional). Exemplo: ordem=-valor</td>
+                    </tr>
+                    <tr>
+                        <td>limite / deslocamento</td>
+                        <td>inteiro</td>
+                        <td>Paginação (opcional). A resposta JSON traz <code>pagination</code> com o total de linhas e o próximo deslocamento</td>
+                    </tr>
                     <tr>
                         <td>subcategoria</td>
                         <td>string</td>
-                        <td>Subcategoria de processamento (opcional). Valores: viniferas, americanas_hibridas, uvas_mesa, sem_classificacao</td>
+                        <td>Subcategoria de exportação (opcional). Valores: vinhos, espumantes, uvas_frescas, suco_uva</td>
                     </tr>
                 </table>
                 <h3>Cabeçalhos:</h3>
@@ -394,8 +2092,8 @@ Authorization: Bearer {seu_token_jwt}
             
             <div class="endpoint">
                 <span class="method get">GET</span>
-                <code>/api/comercializacao</code>
-                <p>Retorna dados de comercialização de vinhos e derivados.</p>
+                <code>/api/exportar/{categoria}</code>
+                <p>Exporta em streaming todas as subcategorias e anos de uma categoria, uma linha por registro com as colunas <code>subcategoria</code>, <code>ano</code>, <code>nivel</code> e as colunas da tabela.</p>
                 <h3>Parâmetros:</h3>
                 <table>
                     <tr>
@@ -404,9 +2102,19 @@ Authorization: Bearer {seu_token_jwt}
                         <th>Descrição</th>
                     </tr>
                     <tr>
-                        <td>ano</td>
+                        <td>formato</td>
                         <td>string</td>
-                        <td>Ano dos dados (opcional). Exemplo: 2023</td>
+                        <td><code>ndjson</code> (padrão), <code>csv</code>, <code>parquet</code> ou <code>arrow</code></td>
+                    </tr>
+                    <tr>
+                        <td>subcategoria</td>
+                        <td>string</td>
+                        <td>Exporta apenas uma subcategoria (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>ano_inicio / ano_fim</td>
+                        <td>string</td>
+                        <td>Intervalo de anos (opcional; padrão: todos os anos)</td>
                     </tr>
                 </table>
                 <h3>Cabeçalhos:</h3>
@@ -415,10 +2123,40 @@ Authorization: Bearer {seu_token_jwt}
                 </pre>
             </div>
             
+            <div class="endpoint">
+                <span class="method post">POST</span>
+                <code>/api/batch</code>
+                <p>Consulta várias tabelas (categoria, ano e subcategoria) em uma única requisição. As consultas são resolvidas em paralelo (cache e armazenamento local primeiro, site da Embrapa depois) e os resultados são indexados pela chave da consulta, ex.: <code>exportacao/2023/vinhos</code>. Com <code>formato=ndjson</code>, cada resultado é enviado em uma linha assim que fica pronto.</p>
+                <h3>Corpo da Requisição:</h3>
+                <pre>
+{
+    "consultas": [
+        {"categoria": "exportacao", "ano": 2023, "subcategoria": "vinhos"},
+        {"categoria": "producao", "ano": 2022}
+    ],
+    "layout": "linhas"
+}
+                </pre>
+                <h3>Resposta:</h3>
+                <pre>
+{
+    "results": {
+        "exportacao/2023/vinhos": {"title": "...", "headers": [...], "data": [...]},
+        "producao/2022": {"title": "...", "headers": [...], "data": [...]}
+    },
+    "errors": []
+}
+                </pre>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
+                </pre>
+            </div>
+            
             <div class="endpoint">
                 <span class="method get">GET</span>
-                <code>/api/importacao</code>
-                <p>Retorna dados de importação de produtos vitivinícolas.</p>
+                <code>/api/series/{categoria}</code>
+                <p>Série histórica de um produto (ou país) a partir dos agregados armazenados, com os valores de cada ano e o crescimento em relação ao ano anterior (<code>yoy</code>, em %).</p>
                 <h3>Parâmetros:</h3>
                 <table>
                     <tr>
@@ -427,14 +2165,29 @@ Authorization: Bearer {seu_token_jwt}
                         <th>Descrição</th>
                     </tr>
                     <tr>
-                        <td>ano</td>
+                        <td>produto</td>
                         <td>string</td>
-                        <td>Ano dos dados (opcional). Exemplo: 2023</td>
+                        <td>Produto ou país, sem diferenciar maiúsculas nem acentos (obrigatório)</td>
                     </tr>
                     <tr>
                         <td>subcategoria</td>
                         <td>string</td>
-                        <td>Subcategoria de importação (opcional). Valores: vinhos, espumantes, uvas_frescas, uvas_passas, suco_uva</td>
+                        <td>Obrigatória nas categorias com subcategorias</td>
+                    </tr>
+                    <tr>
+                        <td>coluna</td>
+                        <td>string</td>
+                        <td>Coluna numérica, indicada pelo início do cabeçalho (opcional; padrão: todas)</td>
+                    </tr>
+                    <tr>
+                        <td>grupo</td>
+                        <td>string</td>
+                        <td>Produto ao qual o subitem pertence, ex.: VINHO DE MESA (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>ano_inicio / ano_fim</td>
+                        <td>string</td>
+                        <td>Intervalo de anos (opcional)</td>
                     </tr>
                 </table>
                 <h3>Cabeçalhos:</h3>
@@ -445,8 +2198,8 @@ Authorization: Bearer {seu_token_jwt}
             
             <div class="endpoint">
                 <span class="method get">GET</span>
-                <code>/api/exportacao</code>
-                <p>Retorna dados de exportação de produtos vitivinícolas.</p>
+                <code>/api/totais/{categoria}</code>
+                <p>Totais por ano de cada coluna numérica, com o crescimento em relação ao ano anterior.</p>
                 <h3>Parâmetros:</h3>
                 <table>
                     <tr>
@@ -455,14 +2208,90 @@ Authorization: Bearer {seu_token_jwt}
                         <th>Descrição</th>
                     </tr>
                     <tr>
-                        <td>ano</td>
+                        <td>subcategoria</td>
                         <td>string</td>
-                        <td>Ano dos dados (opcional). Exemplo: 2023</td>
+                        <td>Subcategoria (opcional; padrão: todas)</td>
+                    </tr>
+                    <tr>
+                        <td>ano_inicio / ano_fim</td>
+                        <td>string</td>
+                        <td>Intervalo de anos (opcional)</td>
+                    </tr>
+                </table>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/ranking/{categoria}</code>
+                <p>Maiores produtos (ou países) de um ano, com a participação no total e o crescimento em relação ao ano anterior.</p>
+                <h3>Parâmetros:</h3>
+                <table>
+                    <tr>
+                        <th>Parâmetro</th>
+                        <th>Tipo</th>
+                        <th>Descrição</th>
                     </tr>
                     <tr>
                         <td>subcategoria</td>
                         <td>string</td>
-                        <td>Subcategoria de exportação (opcional). Valores: vinhos, espumantes, uvas_frescas, suco_uva</td>
+                        <td>Obrigatória nas categorias com subcategorias</td>
+                    </tr>
+                    <tr>
+                        <td>ano</td>
+                        <td>string</td>
+                        <td>Ano (opcional; padrão: o último ano armazenado)</td>
+                    </tr>
+                    <tr>
+                        <td>coluna</td>
+                        <td>string</td>
+                        <td>Coluna usada na ordenação (opcional; padrão: valor, quando existir)</td>
+                    </tr>
+                    <tr>
+                        <td>limite</td>
+                        <td>inteiro</td>
+                        <td>Quantidade de posições (opcional; padrão: 10)</td>
+                    </tr>
+                </table>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/changes</code>
+                <p>Registro de mudanças: versões de tabelas gravadas após um número de sequência, para sincronizar apenas o que mudou.</p>
+                <h3>Parâmetros:</h3>
+                <table>
+                    <tr>
+                        <th>Parâmetro</th>
+                        <th>Tipo</th>
+                        <th>Descrição</th>
+                    </tr>
+                    <tr>
+                        <td>since</td>
+                        <td>inteiro</td>
+                        <td>Último número de sequência já sincronizado (opcional; padrão: 0)</td>
+                    </tr>
+                    <tr>
+                        <td>categoria</td>
+                        <td>string</td>
+                        <td>Apenas as tabelas desta categoria (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>diff</td>
+                        <td>string</td>
+                        <td>1 para incluir as linhas incluídas, removidas e alteradas (opcional)</td>
+                    </tr>
+                    <tr>
+                        <td>limite</td>
+                        <td>inteiro</td>
+                        <td>Máximo de versões (opcional; padrão: 100)</td>
                     </tr>
                 </table>
                 <h3>Cabeçalhos:</h3>
@@ -471,6 +2300,42 @@ Authorization: Bearer {seu_token_jwt}
                 </pre>
             </div>
             
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/cache</code>
+                <p>Retorna as estatísticas do cache de respostas (acertos, falhas, revalidações e tamanho).</p>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/upstream</code>
+                <p>Retorna o estado do cliente HTTP do site da Embrapa (requisições, erros, requisições em andamento, estado do disjuntor, consultas simultâneas coalescidas e fila do pool de extração).</p>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/api/agendador</code>
+                <p>Retorna o estado do agendador em segundo plano (pré-aquecimento do cache e atualização do ano corrente e do anterior), com o resultado e a duração da última execução de cada tarefa.</p>
+                <h3>Cabeçalhos:</h3>
+                <pre>
+Authorization: Bearer {seu_token_jwt}
+                </pre>
+            </div>
+            
+            <div class="endpoint">
+                <span class="method get">GET</span>
+                <code>/metrics</code>
+                <p>Métricas no formato de texto do Prometheus: requisições, duração e tamanho das respostas por rota, duração de cada fase (acesso ao site, extração, tipagem, armazenamento, serialização e compressão), taxa de acerto do cache e erros do site da Embrapa. Não requer autenticação.</p>
+            </div>
+            
             <h2>Exemplo de Uso</h2>
             <p>Exemplo de como usar a API com curl:</p>
             <pre>
@@ -501,4 +2366,7 @@ curl -X GET -H "Authorization: Bearer {seu_token_jwt}" http://localhost:5000/api
 if __name__ == '__main__':
     # Criar diretório para documentação se não existir
     os.makedirs('docs', exist_ok=True)
+    # Com o reloader do modo debug, apenas o processo filho atende as requisições
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_scheduler()
     app.run(host='0.0.0.0', port=5000, debug=True)
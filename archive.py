@@ -0,0 +1,160 @@
+"""
+Arquivo local das páginas HTML obtidas do site da Embrapa, com modo de reprodução.
+
+Cada resposta recebida pelo EmbrapaClient é gravada comprimida (gzip) em um
+armazenamento endereçado pelo conteúdo: o arquivo da página é nomeado pelo sha256
+do HTML, de modo que páginas idênticas obtidas em momentos diferentes ocupam o
+espaço de uma só. Um índice SQLite registra cada acesso (URL, momento da captura,
+hash e codificação).
+
+No modo de reprodução (replay.ReplayClient) as páginas são lidas do arquivo em vez do
+site, o que permite extrair novamente todo o histórico após uma correção no parser
+e executar testes de desempenho sem acesso à rede.
+"""
+import gzip
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+from datetime import datetime, timezone
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS capturas (
+    url TEXT NOT NULL,
+    capturado_em TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    codificacao TEXT,
+    tamanho INTEGER NOT NULL,
+    PRIMARY KEY (url, capturado_em)
+) WITHOUT ROWID;
+"""
+
+
+class ArchivedResponse:
+    """Resposta reconstruída a partir do arquivo, com a interface usada de requests.Response."""
+
+    status_code = 200
+
+    def __init__(self, url, content, encoding, fetched_at):
+        self.url = url
+        self.content = content
+        self.encoding = encoding
+        self.fetched_at = fetched_at
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self):
+        pass
+
+
+class HtmlArchive:
+    """
+    Arquivo das páginas HTML em disco.
+
+    Estrutura do diretório:
+
+        indice.db                   índice das capturas (SQLite)
+        objetos/ab/cdef….html.gz    HTML comprimido, nomeado pelo sha256 do conteúdo
+
+    Cada thread usa a sua própria conexão com o índice.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._local = threading.local()
+        os.makedirs(os.path.join(root, "objetos"), exist_ok=True)
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(os.path.join(self.root, "indice.db"), timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _object_path(self, digest):
+        return os.path.join(self.root, "objetos", digest[:2], f"{digest[2:]}.html.gz")
+
+    def save(self, url, content, encoding=None, fetched_at=None):
+        """
+        Grava uma página obtida do site.
+
+        Args:
+            url (str): URL da página.
+            content (bytes): HTML recebido, sem decodificar.
+            encoding (str, optional): Codificação informada pelo site.
+            fetched_at (datetime, optional): Momento da captura (padrão: agora, em UTC).
+
+        Returns:
+            str: sha256 do HTML, que identifica o conteúdo no arquivo.
+        """
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            os.makedirs(directory, exist_ok=True)
+            # Grava em um arquivo temporário e renomeia, para que outro processo nunca leia
+            # uma página incompleta
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as file:
+                    file.write(gzip.compress(content, compresslevel=6, mtime=0))
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+        fetched_at = fetched_at or datetime.now(timezone.utc)
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO capturas (url, capturado_em, hash, codificacao, tamanho) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (url, fetched_at.isoformat(), digest, encoding, len(content)),
+            )
+        return digest
+
+    def latest(self, url):
+        """
+        Obtém a captura mais recente de uma URL.
+
+        Returns:
+            ArchivedResponse: Página arquivada, ou None se a URL nunca foi capturada.
+        """
+        row = self._connect().execute(
+            "SELECT capturado_em, hash, codificacao FROM capturas WHERE url = ? "
+            "ORDER BY capturado_em DESC LIMIT 1",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        fetched_at, digest, encoding = row
+        with open(self._object_path(digest), "rb") as file:
+            content = gzip.decompress(file.read())
+        return ArchivedResponse(url, content, encoding, datetime.fromisoformat(fetched_at))
+
+    def stats(self):
+        """Retorna a quantidade de capturas, de páginas distintas e os tamanhos original e comprimido."""
+        conn = self._connect()
+        snapshots, urls, objects = conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT url), COUNT(DISTINCT hash) FROM capturas"
+        ).fetchone()
+        raw_bytes = conn.execute(
+            "SELECT COALESCE(SUM(tamanho), 0) FROM (SELECT DISTINCT hash, tamanho FROM capturas)"
+        ).fetchone()[0]
+        stored_bytes = 0
+        for directory, _, files in os.walk(os.path.join(self.root, "objetos")):
+            stored_bytes += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        return {
+            "path": self.root,
+            "snapshots": snapshots,
+            "urls": urls,
+            "objects": objects,
+            "raw_bytes": raw_bytes,
+            "stored_bytes": stored_bytes,
+        }
@@ -0,0 +1,515 @@
+"""
+Servidor ASGI da API, para atender muitas requisições lentas em um único processo.
+
+Nas rotas de dados (/api/producao, /api/processamento, ...) as tabelas são obtidas de
+forma assíncrona antes de a requisição chegar ao Flask: o acesso ao site da Embrapa usa
+um cliente httpx assíncrono com pool de conexões, a extração do HTML e o armazenamento
+local rodam em um pool de threads, e consultas simultâneas à mesma página compartilham
+um único acesso. Enquanto o site não responde, nenhuma thread fica bloqueada. Em
+seguida a requisição é atendida pelas mesmas rotas Flask (validação, filtros, formatos,
+ETag e compressão), que encontram as tabelas prontas em request.environ.
+
+As demais rotas (lote, exportação, agregados e operação) rodam no Flask em um pool de
+threads limitado (ASGI_THREADS).
+
+Uso:
+    uvicorn asgi:application --host 0.0.0.0 --port 5000 [--workers 2]
+"""
+import asyncio
+import contextvars
+import io
+import re
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import parse_qs
+
+import httpx
+import requests
+from flask_jwt_extended import decode_token
+
+import admission
+import app as api
+import metrics
+from admission import AdmissionError
+from models import Table
+from upstream import CircuitOpenError, UpstreamBusyError
+
+# Rotas de dados cujas tabelas são obtidas de forma assíncrona
+DATA_PATH = re.compile(r"^/api/([a-z]+)$")
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+
+def _get_stored(category, year, subcategory):
+    with metrics.phase('store'):
+        return api.get_stored_table(category, year, subcategory)
+
+
+def _save_table(category, year, subcategory, table):
+    with metrics.phase('store'):
+        api.data_store.save_table(category, year, subcategory, table)
+
+
+def _parse_table(content, encoding, url):
+    return api.parse_pool.parse(content, encoding, url, datetime.now(timezone.utc))
+
+
+class AsyncEmbrapaFetcher:
+    """
+    Obtém as tabelas do cache, do armazenamento local ou do site da Embrapa sem bloquear
+    o loop de eventos.
+
+    Segue as mesmas regras de app._cached_table e app._load_embrapa_data: anos encerrados
+    vêm do armazenamento local, entradas expiradas do cache são servidas enquanto são
+    atualizadas em segundo plano e o armazenamento é a reserva quando o site falha. O
+    disjuntor é o mesmo do cliente síncrono (app.embrapa_client).
+
+    Args:
+        connect_timeout (float): Timeout de conexão (segundos).
+        read_timeout (float): Timeout de leitura (segundos).
+        retries (int): Novas tentativas para erros 5xx e de conexão.
+        backoff_factor (float): Fator do backoff exponencial entre tentativas (segundos).
+        max_concurrency (int): Máximo de requisições simultâneas ao site.
+        workers (int): Threads para a extração do HTML e o armazenamento local.
+    """
+
+    def __init__(self, connect_timeout=5, read_timeout=30, retries=3, backoff_factor=0.5,
+                 max_concurrency=8, workers=4):
+        self.timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self.wait_timeout = connect_timeout + read_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='embrapa-parse')
+        self._client = None
+        self._semaphore = None
+        self._inflight = {}
+        self._refreshing = set()
+        self._tasks = set()
+        self._stats = {"requests": 0, "errors": 0, "rejected": 0, "in_flight": 0, "shared": 0, "waiting": 0,
+                       "archive_errors": 0}
+
+    def _ensure_client(self):
+        # O cliente e o semáforo são criados dentro do loop de eventos que os utiliza
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+        self.executor.shutdown(wait=False)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats["max_concurrency"] = self.max_concurrency
+        return stats
+
+    async def fetch_many(self, specs):
+        """
+        Obtém várias tabelas ao mesmo tempo.
+
+        Args:
+            specs (list): Tuplas (categoria, ano, subcategoria), já validadas.
+
+        Returns:
+            dict: {(categoria, ano ou None, subcategoria): models.Table | dict de erro}.
+        """
+        results = await asyncio.gather(*(self.fetch_table(*spec) for spec in specs))
+        return {(category, year or None, subcategory): result
+                for (category, year, subcategory), result in zip(specs, results)}
+
+    async def fetch_table(self, category, year=None, subcategory=None):
+        """Obtém uma tabela pelo cache de respostas (ver app._cached_table)."""
+        key = (category, year or None, subcategory)
+        value, state = api.response_cache.lookup(key)
+        if state == "stale" and key not in self._refreshing:
+            self._refreshing.add(key)
+            self._spawn(self._refresh(key, category, year, subcategory))
+        if state is not None:
+            return value
+
+        # O nível compartilhado do cache (Redis ou SQLite) é consultado e gravado fora do loop
+        if api.response_cache.shared is not None:
+            value = await self._run(api.response_cache.load_shared, key)
+            if value is not None:
+                return value
+        result = await self._load(category, year, subcategory)
+        if isinstance(result, Table):
+            await self._cache(key, result, year)
+        return result
+
+    async def _cache(self, key, table, year):
+        if api.response_cache.shared is None:
+            api.response_cache.set(key, table, ttl=api._cache_ttl(year))
+        else:
+            await self._run(api.response_cache.set, key, table, api._cache_ttl(year))
+
+    async def _refresh(self, key, category, year, subcategory):
+        try:
+            if api.response_cache.shared is not None and await self._run(api.response_cache.load_shared, key) is not None:
+                return
+            result = await self._load(category, year, subcategory)
+            if isinstance(result, Table):
+                await self._cache(key, result, year)
+        finally:
+            self._refreshing.discard(key)
+
+    def _spawn(self, coroutine):
+        # Mantém uma referência às tarefas em segundo plano até que terminem
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _load(self, category, year, subcategory):
+        """Equivalente assíncrono de app._load_embrapa_data."""
+        year_is_known = bool(year) and str(year).isdigit()
+        if year_is_known and api._is_closed_year(year):
+            stored = await self._run(_get_stored, category, year, subcategory)
+            if stored is not None:
+                return stored
+
+        url = api._embrapa_url(category, year, subcategory)
+        task = self._inflight.get(url)
+        if task is not None:
+            self._stats["shared"] += 1
+        else:
+            task = self._spawn(self._scrape_and_store(category, year, subcategory, url))
+            self._inflight[url] = task
+            task.add_done_callback(lambda _: self._inflight.pop(url, None))
+        # shield: se o cliente desistir, a consulta continua para quem também a aguarda
+        result = await asyncio.shield(task)
+
+        if year_is_known and not isinstance(result, Table):
+            stored = await self._run(_get_stored, category, year, subcategory)
+            if stored is not None:
+                return stored
+        return result
+
+    async def _scrape_and_store(self, category, year, subcategory, url):
+        try:
+            async with admission.upstream_slot_async():
+                with metrics.phase('upstream'):
+                    admission.charge_upstream()
+                    content, encoding = await self._get(url)
+        except (httpx.HTTPError, requests.exceptions.RequestException) as e:
+            return {"error": f"Erro ao acessar o site da Embrapa: {str(e)}"}
+        try:
+            table = await self._run(_parse_table, content, encoding, url)
+        except Exception as e:
+            return {"error": f"Erro ao processar os dados: {str(e)}"}
+        if table.rows and year and str(year).isdigit():
+            await self._run(_save_table, category, year, subcategory, table)
+        return table
+
+    async def _send(self, url):
+        """Faz a requisição dentro do limite de requisições simultâneas."""
+        self._stats["waiting"] += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            self._stats["rejected"] += 1
+            raise UpstreamBusyError("limite de requisições simultâneas ao site da Embrapa atingido") from None
+        finally:
+            self._stats["waiting"] -= 1
+
+        self._stats["requests"] += 1
+        self._stats["in_flight"] += 1
+        try:
+            return await self._request(url)
+        except httpx.HTTPError:
+            self._stats["errors"] += 1
+            raise
+        finally:
+            self._stats["in_flight"] -= 1
+            self._semaphore.release()
+
+    async def _get(self, url):
+        """
+        Faz a requisição ao site da Embrapa, com o limite de requisições simultâneas, novas
+        tentativas e o disjuntor do cliente síncrono.
+
+        Returns:
+            tuple: (HTML sem decodificar, codificação informada pelo site).
+        """
+        if api.app.config['EMBRAPA_REPLAY']:
+            response = await self._run(api.embrapa_client.get, url)
+            return response.content, response.encoding
+
+        self._ensure_client()
+        breaker = getattr(api.embrapa_client, 'breaker', None)
+        if breaker is not None and not breaker.allow():
+            self._stats["rejected"] += 1
+            raise CircuitOpenError("circuito aberto após falhas consecutivas no site da Embrapa")
+
+        try:
+            response = await self._send(url)
+        except httpx.HTTPError as e:
+            status = e.response.status_code if isinstance(e, httpx.HTTPStatusError) else None
+            if breaker is not None:
+                # Erros 4xx indicam problema na requisição, não indisponibilidade do site
+                if status is None or status >= 500:
+                    breaker.record_failure()
+                else:
+                    breaker.record_success()
+            raise
+        except BaseException:
+            # Sem resposta do site (sem vaga ou consulta cancelada): libera a requisição de teste
+            if breaker is not None:
+                breaker.abandon()
+            raise
+
+        if breaker is not None:
+            breaker.record_success()
+        if api.html_archive is not None:
+            self.executor.submit(self._archive, url, response.content, response.encoding)
+        return response.content, response.encoding
+
+    def _archive(self, url, content, encoding):
+        try:
+            api.html_archive.save(url, content, encoding)
+        except (OSError, sqlite3.Error):
+            # Uma falha ao arquivar não impede o uso da resposta
+            self._stats["archive_errors"] += 1
+
+    async def _request(self, url):
+        for attempt in range(self.retries + 1):
+            try:
+                response = await self._client.get(url)
+            except httpx.TransportError:
+                if attempt == self.retries:
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response
+            await asyncio.sleep(self.backoff_factor * 2 ** attempt)
+
+    async def _run(self, func, *args):
+        # O contexto é copiado para que os tempos das fases cheguem à requisição
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, contextvars.copy_context().run, func, *args)
+
+
+class AsgiApp:
+    """
+    Aplicação ASGI: busca assíncrona das tabelas das rotas de dados e execução do Flask
+    (WSGI) em um pool de threads limitado.
+
+    Args:
+        flask_app (flask.Flask): Aplicação Flask.
+        threads (int): Threads para executar as rotas Flask.
+    """
+
+    def __init__(self, flask_app, threads=32):
+        self.flask_app = flask_app
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='asgi-flask')
+        self.fetcher = None
+
+    def get_fetcher(self):
+        if self.fetcher is None:
+            config = self.flask_app.config
+            self.fetcher = AsyncEmbrapaFetcher(
+                connect_timeout=config['EMBRAPA_TIMEOUT_CONEXAO'],
+                read_timeout=config['EMBRAPA_TIMEOUT_LEITURA'],
+                retries=config['EMBRAPA_TENTATIVAS'],
+                backoff_factor=config['EMBRAPA_BACKOFF'],
+                max_concurrency=config['EMBRAPA_MAX_CONEXOES'],
+                workers=config['EMBRAPA_MAX_WORKERS'],
+            )
+            api.async_fetcher = self.fetcher
+        return self.fetcher
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+            return
+        if scope["type"] != "http":
+            return
+
+        environ = _build_environ(scope, await _read_body(receive))
+        specs = self._prefetch_specs(environ)
+        try:
+            if specs and self._admit(environ):
+                timings = {}
+                started = time.perf_counter()
+                with metrics.collect_phases(timings):
+                    environ["vitibrasil.prefetched"] = await self.get_fetcher().fetch_many(specs)
+                timings["prefetch"] = time.perf_counter() - started
+                environ["vitibrasil.timings"] = timings
+            await self._call_flask(environ, send)
+        finally:
+            # O teardown do Flask libera a vaga; se a requisição não chegou ao Flask (cliente
+            # desconectado, erro na busca), ela é liberada aqui. release() pode ser repetido.
+            ticket = environ.get("vitibrasil.admission")
+            if isinstance(ticket, admission.Ticket):
+                ticket.release()
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                api.init_services()
+                api.start_scheduler()
+                self.get_fetcher()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self.fetcher is not None:
+                    await self.fetcher.aclose()
+                api.shutdown_services()
+                self.executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _prefetch_specs(self, environ):
+        """
+        Consultas (categoria, ano, subcategoria) de uma requisição às rotas de dados, com as
+        mesmas chaves usadas pelas rotas Flask. Retorna None para as demais requisições, para
+        parâmetros inválidos (o Flask responde com o erro) e sem um token válido.
+        """
+        if environ["REQUEST_METHOD"] != "GET":
+            return None
+        match = DATA_PATH.match(environ["PATH_INFO"])
+        if not match or match.group(1) not in api.CATEGORY_OPTIONS:
+            return None
+        if self._claims(environ) is None:
+            return None
+
+        category = match.group(1)
+        args = {name: values[0] for name, values in parse_qs(environ["QUERY_STRING"]).items()}
+        subcategory = args.get("subcategoria")
+        if subcategory not in api.SUBCATEGORY_OPTIONS.get(category, {}):
+            subcategory = None
+        start_year, end_year, error = api.year_range(args.get("ano_inicio"), args.get("ano_fim"))
+        if error:
+            return None
+        if start_year is None:
+            return [(category, args.get("ano"), subcategory)]
+        return [(category, str(year), subcategory) for year in range(start_year, end_year + 1)]
+
+    def _claims(self, environ):
+        """Conteúdo do token JWT da requisição, ou None sem um token válido."""
+        scheme, _, token = environ.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if scheme != "Bearer" or not token:
+            return None
+        try:
+            with self.flask_app.app_context():
+                return decode_token(token)
+        except Exception:
+            return None
+
+    def _admit(self, environ):
+        """
+        Passa a requisição pelo controle de admissão antes da busca das tabelas, de modo que
+        as buscas no site sejam cobradas do cliente e a faixa de lote respeite a reserva de
+        conexões. A admissão (ou a recusa, respondida pelo Flask) segue em
+        environ["vitibrasil.admission"].
+
+        Returns:
+            bool: False se a requisição foi recusada.
+        """
+        if api.admission_controller is None:
+            return True
+        try:
+            ticket = api.admit(self._claims(environ), environ["PATH_INFO"])
+        except AdmissionError as e:
+            environ["vitibrasil.admission"] = e
+            return False
+        environ["vitibrasil.admission"] = ticket
+        admission.activate(ticket)
+        return True
+
+    async def _call_flask(self, environ, send):
+        """Executa o Flask em uma thread do pool, enviando a resposta pelo loop de eventos."""
+        loop = asyncio.get_running_loop()
+
+        def send_sync(*messages):
+            asyncio.run_coroutine_threadsafe(_send_all(send, messages), loop).result()
+
+        def run():
+            start = []
+
+            def start_response(status, headers, exc_info=None):
+                start[:] = [{
+                    "type": "http.response.start",
+                    "status": int(status.split(" ", 1)[0]),
+                    "headers": [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers],
+                }]
+
+            iterable = self.flask_app(environ, start_response)
+            try:
+                # Cada parte é enviada junto com o início da resposta ou com a parte seguinte, de
+                # modo que respostas de uma só parte precisam de uma única passagem pelo loop
+                started = False
+                previous = None
+                for chunk in iterable:
+                    if not chunk:
+                        continue
+                    if previous is not None:
+                        send_sync(*([] if started else start), {"type": "http.response.body", "body": previous, "more_body": True})
+                        started = True
+                    previous = chunk
+                send_sync(*([] if started else start), {"type": "http.response.body", "body": previous or b""})
+            finally:
+                close = getattr(iterable, "close", None)
+                if close is not None:
+                    close()
+
+        await loop.run_in_executor(self.executor, run)
+
+
+async def _send_all(send, messages):
+    for message in messages:
+        await send(message)
+
+
+async def _read_body(receive):
+    body = bytearray()
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            return bytes(body)
+
+
+def _build_environ(scope, body):
+    """Monta o environ WSGI de uma requisição HTTP ASGI."""
+    root_path = scope.get("root_path", "")
+    path = scope["path"]
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": root_path.encode("utf-8").decode("latin-1"),
+        "PATH_INFO": path.encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": io.StringIO(),
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": True,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        if name not in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            name = f"HTTP_{name}"
+        value = value.decode("latin-1")
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+application = AsgiApp(api.create_app(), threads=api.app.config['ASGI_THREADS'])
@@ -0,0 +1,90 @@
+"""
+Micro-benchmarks (pytest-benchmark) da extração e da serialização das tabelas, e do
+atendimento das rotas de dados com as tabelas já em cache (test_resposta_http).
+
+Usa as páginas salvas em benchmarks/fixtures. Não faz parte da suíte de testes: o
+arquivo é executado explicitamente, e os resultados podem ser gravados em JSON para
+comparação entre versões.
+
+Uso:
+    python -m pytest benchmarks/bench_micro.py --benchmark-json=benchmarks/resultados/micro.json
+    python -m pytest benchmarks/bench_micro.py --benchmark-autosave
+    python -m pytest benchmarks/bench_micro.py --benchmark-compare
+"""
+import json
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import export  # noqa: E402
+from bench_parser import load_fixtures  # noqa: E402
+from models import Table  # noqa: E402
+from parsing import BACKENDS, parse_page  # noqa: E402
+
+FIXTURES = load_fixtures()
+
+TABLES = [Table.from_parsed(parse_page(html), f"http://teste/{name}") for name, html in FIXTURES.items()]
+
+
+@pytest.mark.parametrize("backend", list(BACKENDS))
+def test_extracao(benchmark, backend):
+    """Extração das 5 páginas salvas com cada backend de parsing.py."""
+    parse = BACKENDS[backend]
+    benchmark(lambda: [parse(html) for html in FIXTURES.values()])
+
+
+def test_tipagem(benchmark):
+    """Conversão das páginas extraídas em tabelas tipadas (models.Table)."""
+    pages = [parse_page(html) for html in FIXTURES.values()]
+    benchmark(lambda: [Table.from_parsed(page, "http://teste") for page in pages])
+
+
+@pytest.mark.parametrize("encoder", ["json", "dumps_json"])
+@pytest.mark.parametrize("layout", ["linhas", "colunas"])
+def test_serializacao_json(benchmark, layout, encoder):
+    """Serialização das respostas JSON (layout de linhas ou de colunas), com o json ou export.dumps_json."""
+    to_payload = Table.to_columnar if layout == "colunas" else Table.to_dict
+    if encoder == "json":
+        benchmark(lambda: [json.dumps(to_payload(table), ensure_ascii=False) for table in TABLES])
+    else:
+        benchmark(lambda: [export.dumps_json(to_payload(table), sort_keys=True) for table in TABLES])
+
+
+@pytest.mark.parametrize("name", [name for name in ("ndjson", "csv", "parquet", "arrow") if export.available(name)])
+def test_exportacao(benchmark, name):
+    """Exportação das 5 tabelas em um único arquivo, em cada formato disponível."""
+    items = [((index,), table) for index, table in enumerate(TABLES)]
+    benchmark(lambda: b"".join(export.stream(name, ["indice"], items)))
+
+
+@pytest.fixture(scope="module")
+def api_client():
+    """Cliente da API com as tabelas de exportação de 1970 a 2023 no cache em memória."""
+    import app as api
+
+    table = TABLES[list(FIXTURES).index("exportacao_vinhos_2023.html")]
+    for year in range(1970, 2024):
+        api.response_cache.set(("exportacao", str(year), "vinhos"), table)
+    client = api.app.test_client()
+    token = client.post("/auth", json={"username": "admin", "password": "password"}).json["access_token"]
+    return client, {"Authorization": f"Bearer {token}"}
+
+
+@pytest.mark.parametrize("encoding", ["identity", "gzip"])
+@pytest.mark.parametrize("consulta", ["ano", "intervalo"])
+def test_resposta_http(benchmark, api_client, consulta, encoding):
+    """
+    Requisição a /api/exportacao com a tabela já em cache: um ano ou o intervalo de 1970 a 2023,
+    sem compressão ou com gzip. Mede o custo de montar, serializar e comprimir a resposta.
+    """
+    client, headers = api_client
+    query = "ano=2023" if consulta == "ano" else "ano_inicio=1970&ano_fim=2023"
+    headers = {**headers, "Accept-Encoding": encoding}
+
+    response = benchmark(lambda: client.get(f"/api/exportacao?{query}&subcategoria=vinhos", headers=headers))
+    assert response.status_code == 200
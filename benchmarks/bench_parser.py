@@ -0,0 +1,99 @@
+"""
+Micro-benchmark da extração de tabelas das páginas do site da Embrapa.
+
+Mede o tempo de extração por página de cada backend de parsing.py sobre as
+páginas salvas em benchmarks/fixtures, comparando com a extração original
+(BeautifulSoup com html.parser sobre a página inteira).
+
+Uso:
+    python benchmarks/bench_parser.py [--repeticoes 50]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import BACKENDS, ParsedPage  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def parse_legacy(html):
+    """
+    Extração original de fetch_embrapa_data, usada como referência.
+    """
+    soup = BeautifulSoup(html, 'html.parser')
+
+    title = "Dados não encontrados"
+    if soup.find('h3'):
+        title = soup.find('h3').text.strip()
+    elif soup.find('div', class_='conteudo') and soup.find('div', class_='conteudo').find('h3'):
+        title = soup.find('div', class_='conteudo').find('h3').text.strip()
+
+    table = None
+    if soup.find('table', class_='tabela'):
+        table = soup.find('table', class_='tabela')
+    else:
+        tables = soup.find_all('table')
+        if tables:
+            table = tables[0]
+
+    if not table:
+        return ParsedPage(title, None, [], [])
+
+    headers = []
+    header_row = table.find('tr')
+    if header_row:
+        headers = [th.text.strip() for th in header_row.find_all(['th', 'td'])]
+
+    rows = []
+    levels = []
+    data_rows = table.find_all('tr')[1:] if headers else table.find_all('tr')
+    for tr in data_rows:
+        cells = tr.find_all('td')
+        if cells:
+            rows.append([cells[i].text.strip() for i in range(min(len(cells), len(headers)))])
+            classes = cells[0].get('class') or []
+            levels.append('item' if 'tb_item' in classes else 'subitem' if 'tb_subitem' in classes else None)
+    return ParsedPage(title, headers, rows, levels)
+
+
+def load_fixtures():
+    """Retorna {nome do arquivo: conteúdo} das páginas salvas."""
+    fixtures = {}
+    for name in sorted(os.listdir(FIXTURES_DIR)):
+        if name.endswith(".html"):
+            with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+                fixtures[name] = f.read()
+    return fixtures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da extração de tabelas")
+    parser.add_argument("--repeticoes", type=int, default=50)
+    args = parser.parse_args()
+
+    backends = {"original (bs4 html.parser)": parse_legacy, **BACKENDS}
+    fixtures = load_fixtures()
+
+    print(f"{'página':<36}" + "".join(f"{name:>28}" for name in backends))
+    totals = dict.fromkeys(backends, 0.0)
+    for fixture, html in fixtures.items():
+        line = f"{fixture:<36}"
+        for name, parse in backends.items():
+            elapsed = min(timeit.repeat(lambda: parse(html), number=args.repeticoes, repeat=3)) / args.repeticoes
+            totals[name] += elapsed
+            line += f"{elapsed * 1000:>25.3f} ms"
+        print(line)
+
+    baseline = totals["original (bs4 html.parser)"]
+    print(f"{'média por página':<36}" + "".join(f"{t / len(fixtures) * 1000:>25.3f} ms" for t in totals.values()))
+    print(f"{'ganho sobre o original':<36}" + "".join(f"{baseline / t:>27.1f}x" for t in totals.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Teste de carga da API contra o servidor substituto do site da Embrapa.
+
+Sobe a API (servidor do werkzeug com threads) e o servidor substituto
+(benchmarks/stub_embrapa.py) no mesmo processo, com armazenamento e cache vazios, e
+dispara requisições com a concorrência informada em três cenários:
+
+    frio            cache e armazenamento vazios: cada requisição é uma página diferente,
+                    obtida do servidor substituto, extraída e gravada
+    armazenamento   cache em memória vazio, tabelas já gravadas no armazenamento local
+    quente          páginas já carregadas no cache em memória
+
+Para cada cenário são medidos a vazão (requisições por segundo) e as latências p50, p95 e
+p99. O resultado é gravado em JSON (benchmarks/resultados/ por padrão) e pode ser
+comparado com o de outra versão.
+
+Uso:
+    python benchmarks/load_test.py [--concorrencia 16] [--requisicoes 2000] [--latencia 0.05]
+        [--erros 0] [--saida resultado.json] [--comparar resultado_anterior.json]
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timezone
+
+import requests
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "resultados")
+
+sys.path.insert(0, ROOT_DIR)
+
+from stub_embrapa import StubEmbrapa  # noqa: E402
+
+
+def percentile(sorted_values, fraction):
+    """Percentil pelo método do posto mais próximo, sobre valores já ordenados."""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def run_scenario(base_url, headers, paths, concurrency):
+    """
+    Executa as requisições com `concurrency` threads, cada uma com a sua sessão HTTP.
+
+    Uma resposta é considerada erro se o status não for 200 ou se ela não puder ser
+    armazenada em cache (Cache-Control: no-store), como as respostas de erro da API.
+
+    Returns:
+        dict: Quantidade de requisições e erros, duração, vazão e latências (ms).
+    """
+    pending = iter(paths)
+    latencies = []
+    statuses = Counter()
+    errors = 0
+    lock = threading.Lock()
+
+    def worker():
+        nonlocal errors
+        session = requests.Session()
+        while True:
+            with lock:
+                path = next(pending, None)
+            if path is None:
+                break
+            started = time.perf_counter()
+            try:
+                response = session.get(base_url + path, headers=headers, timeout=120)
+                status = response.status_code
+                failed = status != 200 or response.headers.get("Cache-Control") == "no-store"
+            except requests.exceptions.RequestException:
+                status, failed = "exception", True
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed * 1000)
+                statuses[str(status)] += 1
+                errors += failed
+        session.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": dict(statuses),
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(latencies) / duration, 1) if duration else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+            "p50": _round(percentile(latencies, 0.50)),
+            "p95": _round(percentile(latencies, 0.95)),
+            "p99": _round(percentile(latencies, 0.99)),
+            "max": _round(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 2)
+
+
+def _version():
+    """Commit atual do repositório (com o sufixo -dirty se houver alterações não gravadas)."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _path(category, year, subcategory):
+    path = f"/api/{category}?ano={year}"
+    return path + f"&subcategoria={subcategory}" if subcategory else path
+
+
+def compare(previous, current):
+    """Imprime a variação da vazão e das latências de cada cenário em relação a um resultado anterior."""
+    print(f"\nComparação com {previous.get('version')} ({previous.get('date')}):")
+    for name, result in current["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        changes = [("req/s", before["throughput_rps"], result["throughput_rps"])]
+        changes += [(key, before["latency_ms"][key], result["latency_ms"][key]) for key in ("p50", "p95", "p99")]
+        line = "  ".join(
+            f"{label} {old} → {new} ({(new - old) / old * 100:+.1f}%)" for label, old, new in changes if old and new
+        )
+        print(f"  {name:<14} {line}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Teste de carga da API de Vitivinicultura")
+    parser.add_argument("--concorrencia", type=int, default=16, help="Requisições simultâneas")
+    parser.add_argument("--requisicoes", type=int, default=2000, help="Requisições do cenário quente")
+    parser.add_argument("--paginas", type=int, default=400, help="Páginas diferentes nos cenários frio e armazenamento")
+    parser.add_argument("--paginas-quentes", type=int, default=50, help="Páginas diferentes no cenário quente")
+    parser.add_argument("--latencia", type=float, default=0.05, help="Latência do servidor substituto (segundos)")
+    parser.add_argument("--variacao", type=float, default=0.0, help="Variação da latência (segundos)")
+    parser.add_argument("--erros", type=float, default=0.0, help="Fração das respostas do servidor substituto com 503")
+    parser.add_argument("--saida", help="Arquivo JSON do resultado (padrão: benchmarks/resultados/carga-<data>.json)")
+    parser.add_argument("--comparar", help="Resultado anterior (JSON) para comparação")
+    args = parser.parse_args()
+
+    stub = StubEmbrapa(args.latencia, args.variacao, args.erros, seed=0).start()
+
+    # A API é configurada pelas variáveis de ambiente lidas na importação de app.py:
+    # armazenamento temporário, sem arquivo de HTML nem agendador
+    data_dir = tempfile.mkdtemp(prefix="vitibrasil-carga-")
+    os.environ["EMBRAPA_DB_PATH"] = os.path.join(data_dir, "vitibrasil.db")
+    os.environ["EMBRAPA_ARQUIVO_HTML"] = ""
+    os.environ["EMBRAPA_URL_BASE"] = stub.url
+    os.environ["AGENDADOR_ATIVO"] = "0"
+    # Todas as requisições usam o mesmo token: o limite por cliente mediria apenas os 429
+    os.environ.setdefault("ADMISSAO_ATIVO", "0")
+
+    from werkzeug.serving import WSGIRequestHandler, make_server
+
+    import app as api
+    from ingestao import iter_specs
+
+    class QuietRequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server("127.0.0.1", 0, api.app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    token = requests.post(f"{base_url}/auth", json={"username": "admin", "password": "password"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    # Apenas anos encerrados, cujas tabelas são servidas pelo armazenamento depois de gravadas
+    specs = list(iter_specs(list(api.CATEGORY_OPTIONS), api.FIRST_YEAR, date.today().year - 1))
+    step = max(1, len(specs) // args.paginas)
+    cold_paths = [_path(*spec) for spec in specs[::step][:args.paginas]]
+    warm_keys = cold_paths[:args.paginas_quentes]
+    warm_paths = [warm_keys[i % len(warm_keys)] for i in range(args.requisicoes)]
+
+    scenarios = {}
+    print(f"API em {base_url}, servidor substituto em {stub.url}, concorrência {args.concorrencia}")
+
+    api.response_cache.clear()
+    upstream_before = stub.stats["requests"]
+    scenarios["frio"] = run_scenario(base_url, headers, cold_paths, args.concorrencia)
+    scenarios["frio"]["upstream_requests"] = stub.stats["requests"] - upstream_before
+
+    api.response_cache.clear()
+    upstream_before = stub.stats["requests"]
+    scenarios["armazenamento"] = run_scenario(base_url, headers, cold_paths, args.concorrencia)
+    scenarios["armazenamento"]["upstream_requests"] = stub.stats["requests"] - upstream_before
+
+    run_scenario(base_url, headers, warm_keys, args.concorrencia)
+    upstream_before = stub.stats["requests"]
+    scenarios["quente"] = run_scenario(base_url, headers, warm_paths, args.concorrencia)
+    scenarios["quente"]["upstream_requests"] = stub.stats["requests"] - upstream_before
+
+    server.shutdown()
+    stub.stop()
+
+    result = {
+        "version": _version(),
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "concurrency": args.concorrencia,
+            "upstream_latency_s": args.latencia,
+            "upstream_jitter_s": args.variacao,
+            "upstream_error_rate": args.erros,
+            "pages": len(cold_paths),
+            "warm_pages": len(warm_keys),
+        },
+        "scenarios": scenarios,
+    }
+
+    print(f"\n{'cenário':<14}{'req':>7}{'erros':>7}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'site':>7}")
+    for name, scenario in scenarios.items():
+        latency = scenario["latency_ms"]
+        print(
+            f"{name:<14}{scenario['requests']:>7}{scenario['errors']:>7}{scenario['throughput_rps']:>10}"
+            f"{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}{scenario['upstream_requests']:>7}"
+        )
+
+    output = args.saida or os.path.join(RESULTS_DIR, f"carga-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as file:
+        json.dump(result, file, indent=2, ensure_ascii=False)
+    print(f"\nResultado gravado em {output}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as file:
+            compare(json.load(file), result)
+
+
+if __name__ == "__main__":
+    main()
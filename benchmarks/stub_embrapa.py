@@ -0,0 +1,143 @@
+"""
+Servidor local que substitui o site da Embrapa em benchmarks e testes de carga.
+
+Responde às URLs do site (index.php?opcao=...&ano=...&subopcao=...) com páginas
+gravadas: a captura do arquivo local de HTML (archive.py), se houver, ou a página de
+benchmarks/fixtures da categoria. Permite injetar latência e erros 503.
+
+Uso:
+    python benchmarks/stub_embrapa.py [--porta 8081] [--latencia 0.2] [--variacao 0.05] [--erros 0.05]
+        [--arquivo dados/html]
+
+A API aponta para o servidor substituto com EMBRAPA_URL_BASE=http://127.0.0.1:8081/.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from archive import HtmlArchive  # noqa: E402
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# URL base das capturas gravadas no arquivo local
+ARCHIVE_BASE_URL = "http://vitibrasil.cnpuv.embrapa.br/"
+
+# Página de benchmarks/fixtures usada para cada opção do site
+FIXTURES = {
+    "opt_02": "producao_2023.html",
+    "opt_03": "processamento_viniferas_2023.html",
+    "opt_04": "comercializacao_2023.html",
+    "opt_05": "importacao_vinhos_2023.html",
+    "opt_06": "exportacao_vinhos_2023.html",
+}
+
+
+class StubEmbrapa:
+    """
+    Servidor HTTP em uma thread, com latência e erros configuráveis.
+
+    Args:
+        latency (float): Atraso (segundos) antes de cada resposta.
+        jitter (float): Variação aleatória (segundos) somada ou subtraída da latência.
+        error_rate (float): Fração das requisições respondidas com 503 (0 a 1).
+        archive_dir (str, optional): Diretório do arquivo local de HTML com as capturas.
+        port (int): Porta (0 escolhe uma porta livre).
+        seed (int, optional): Semente do sorteio de latência e erros, para execuções reprodutíveis.
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, archive_dir=None, port=0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.archive = HtmlArchive(archive_dir) if archive_dir else None
+        self.stats = {"requests": 0, "errors": 0, "archived": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._pages = {}
+        for option, name in FIXTURES.items():
+            with open(os.path.join(FIXTURES_DIR, name), "rb") as file:
+                self._pages[option] = file.read()
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                status, body = stub._respond(self.path)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/"
+        self._thread = None
+
+    def _respond(self, path):
+        with self._lock:
+            self.stats["requests"] += 1
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return 503, b"Servico indisponivel"
+
+        if self.archive is not None:
+            snapshot = self.archive.latest(ARCHIVE_BASE_URL + path.lstrip("/"))
+            if snapshot is not None:
+                with self._lock:
+                    self.stats["archived"] += 1
+                return 200, snapshot.content
+
+        option = parse_qs(urlsplit(path).query).get("opcao", [""])[0]
+        if option not in self._pages:
+            return 404, b"Pagina nao encontrada"
+        return 200, self._pages[option]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor substituto do site da Embrapa")
+    parser.add_argument("--porta", type=int, default=8081)
+    parser.add_argument("--latencia", type=float, default=0.0, help="Atraso por resposta (segundos)")
+    parser.add_argument("--variacao", type=float, default=0.0, help="Variação aleatória da latência (segundos)")
+    parser.add_argument("--erros", type=float, default=0.0, help="Fração das respostas com erro 503 (0 a 1)")
+    parser.add_argument("--arquivo", help="Diretório do arquivo local de HTML (EMBRAPA_ARQUIVO_HTML)")
+    args = parser.parse_args()
+
+    stub = StubEmbrapa(args.latencia, args.variacao, args.erros, args.arquivo, args.porta)
+    print(f"Servidor substituto em {stub.url} (use EMBRAPA_URL_BASE={stub.url})")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stub.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class ResponseCache:
+    """
+    Cache em memória para os dados obtidos do site da Embrapa.
+
+    Cada entrada possui um TTL próprio (``None`` significa que a entrada nunca
+    expira). O tamanho é limitado e, ao atingir o limite, a entrada usada há
+    mais tempo é descartada (LRU). Entradas expiradas continuam sendo servidas
+    durante a janela de ``stale_window`` segundos enquanto uma atualização é
+    feita em segundo plano (stale-while-revalidate).
+
+    Com ``shared`` (shared_cache.SharedCache), as entradas também são gravadas em um
+    nível compartilhado entre os processos, consultado quando a entrada não está na
+    memória: a entrada encontrada é copiada para a memória com o TTL restante.
+    """
+
+    def __init__(self, max_items=256, stale_window=86400, shared=None):
+        self.max_items = max_items
+        self.stale_window = stale_window
+        self.shared = shared
+        self._entries = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "stale_hits": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+        }
+
+    def get_or_load(self, key, loader, ttl=None, cacheable=None):
+        """
+        Retorna o valor associado a ``key``, carregando-o com ``loader`` se necessário.
+
+        Args:
+            key (hashable): Chave da entrada.
+            loader (callable): Função sem argumentos que produz o valor.
+            ttl (float, optional): Tempo de vida em segundos. None para não expirar.
+            cacheable (callable, optional): Predicado que decide se o valor carregado
+                pode ser armazenado (ex.: não armazenar respostas de erro).
+
+        Returns:
+            Valor em cache ou recém-carregado.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or now < expires_at:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value
+                if now < expires_at + self.stale_window:
+                    # Servir o valor antigo e revalidar em segundo plano
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    if key not in self._refreshing:
+                        self._refreshing.add(key)
+                        threading.Thread(
+                            target=self._refresh,
+                            args=(key, loader, ttl, cacheable),
+                            daemon=True,
+                        ).start()
+                    return value
+            self._stats["misses"] += 1
+
+        value = self.load_shared(key)
+        if value is not None:
+            return value
+        value = loader()
+        if cacheable is None or cacheable(value):
+            self.set(key, value, ttl)
+        return value
+
+    def lookup(self, key):
+        """
+        Consulta uma entrada sem carregá-la, para quem faz a carga por conta própria (ex.: asgi.py).
+
+        Apenas a memória é consultada; o nível compartilhado é consultado com load_shared.
+
+        Returns:
+            tuple: (valor, estado), com estado "fresh" (válida), "stale" (expirada, dentro da
+                janela de stale_window; cabe a quem consultou atualizá-la) ou (None, None) se a
+                entrada não existir ou estiver fora da janela.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or now < expires_at:
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return value, "fresh"
+                if now < expires_at + self.stale_window:
+                    self._entries.move_to_end(key)
+                    self._stats["stale_hits"] += 1
+                    return value, "stale"
+            self._stats["misses"] += 1
+            return None, None
+
+    def load_shared(self, key):
+        """
+        Consulta o nível compartilhado e, se a entrada existir, a copia para a memória.
+
+        Returns:
+            Valor encontrado, ou None se não houver nível compartilhado ou entrada válida nele.
+        """
+        if self.shared is None:
+            return None
+        found = self.shared.get(key)
+        if found is None:
+            return None
+        value, ttl = found
+        self._store(key, value, ttl)
+        return value
+
+    def peek(self, key):
+        """Retorna o valor armazenado para ``key``, mesmo que expirado, ou None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def set(self, key, value, ttl=None):
+        """Armazena ``value`` em ``key`` com o TTL informado (None para não expirar), também no nível compartilhado."""
+        self._store(key, value, ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, ttl)
+
+    def _store(self, key, value, ttl):
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_items:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def invalidate(self, keys):
+        """
+        Remove as entradas apenas da memória deste processo (o nível compartilhado é mantido).
+
+        Returns:
+            int: Quantidade de entradas removidas.
+        """
+        removed = 0
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    removed += 1
+        return removed
+
+    def clear(self):
+        """Remove todas as entradas do cache (inclusive do nível compartilhado)."""
+        with self._lock:
+            self._entries.clear()
+        if self.shared is not None:
+            self.shared.clear()
+
+    def stats(self):
+        """Retorna os contadores do cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats["max_items"] = self.max_items
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0
+        if self.shared is not None:
+            stats["shared"] = self.shared.stats()
+        return stats
+
+    def _refresh(self, key, loader, ttl, cacheable):
+        try:
+            # Outro processo pode já ter atualizado a entrada no nível compartilhado
+            if self.load_shared(key) is not None:
+                with self._lock:
+                    self._stats["refreshes"] += 1
+                return
+            value = loader()
+            if cacheable is None or cacheable(value):
+                self.set(key, value, ttl)
+                with self._lock:
+                    self._stats["refreshes"] += 1
+            else:
+                with self._lock:
+                    self._stats["refresh_errors"] += 1
+        except Exception:
+            with self._lock:
+                self._stats["refresh_errors"] += 1
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
+
+
+class EncodedResponseCache:
+    """
+    Cache dos corpos de resposta já serializados e das suas versões comprimidas.
+
+    As chaves identificam a versão dos dados e a representação (a ETag, calculada a
+    partir do hash do conteúdo e dos parâmetros da requisição): quando os dados mudam, a
+    chave muda, e as entradas antigas são descartadas pelo LRU. O tamanho é limitado
+    pelo total de bytes guardados; com ``max_bytes=0`` nada é guardado.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "compressions": 0, "evictions": 0}
+
+    def get_or_encode(self, key, encode):
+        """
+        Retorna o corpo serializado de ``key``, gerando-o com ``encode`` se necessário.
+
+        Args:
+            key (hashable): Versão dos dados e representação.
+            encode (callable): Função sem argumentos que retorna (corpo em bytes, cabeçalhos).
+
+        Returns:
+            tuple: (corpo, cabeçalhos).
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry["body"], entry["headers"]
+            self._stats["misses"] += 1
+
+        body, headers = encode()
+        self._store(key, {"body": body, "headers": headers, "variants": {}}, len(body))
+        return body, headers
+
+    def get_or_compress(self, key, encoding, body, compress):
+        """
+        Retorna o corpo de ``key`` comprimido com ``encoding``, comprimindo-o uma única vez.
+
+        Args:
+            key (hashable): Chave usada em get_or_encode.
+            encoding (str): Nome da compressão (ex.: "gzip" ou "br").
+            body (bytes): Corpo sem compressão.
+            compress (callable): Função que recebe o corpo e retorna os bytes comprimidos.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and encoding in entry["variants"]:
+                return entry["variants"][encoding]
+            self._stats["compressions"] += 1
+
+        compressed = compress(body)
+        with self._lock:
+            # A entrada pode ter sido descartada durante a compressão
+            entry = self._entries.get(key)
+            if entry is not None and encoding not in entry["variants"]:
+                entry["variants"][encoding] = compressed
+                self._size += len(compressed)
+                self._evict()
+        return compressed
+
+    def _store(self, key, entry, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= _entry_size(previous)
+            self._entries[key] = entry
+            self._size += size
+            self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            _, entry = self._entries.popitem(last=False)
+            self._size -= _entry_size(entry)
+            self._stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        """Retorna os contadores, o número de entradas e o total de bytes guardados."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["bytes"] = self._size
+        stats["max_bytes"] = self.max_bytes
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+def _entry_size(entry):
+    return len(entry["body"]) + sum(len(variant) for variant in entry["variants"].values())
@@ -0,0 +1,62 @@
+"""
+Diferenças entre versões de uma tabela, usadas no registro de mudanças (/api/changes).
+
+Cada linha é identificada pelo produto (ou país), pelo grupo ao qual um subitem pertence
+e pela ocorrência do mesmo nome no grupo, de modo que uma nova versão da tabela é descrita
+pelas linhas incluídas, removidas e alteradas, sem repetir as linhas iguais.
+"""
+from models import SUBITEM, TEXT
+
+
+def row_keys(table):
+    """
+    Identifica as linhas de uma tabela.
+
+    Returns:
+        list: Tuplas (grupo, produto, ocorrência), na ordem das linhas. grupo é o produto ao
+            qual um subitem pertence ("" para os demais).
+    """
+    keys = []
+    seen = {}
+    group = ""
+    for row in table.rows:
+        product = row.values[0] if row.values else ""
+        if row.level != SUBITEM:
+            group = product
+        key = (group if row.level == SUBITEM else "", product)
+        seen[key] = seen.get(key, -1) + 1
+        keys.append((*key, seen[key]))
+    return keys
+
+
+def _row_entry(key, row, **values):
+    group, product, _ = key
+    return {"product": product, "group": group or None, "level": row.level, **values}
+
+
+def diff_tables(old, new):
+    """
+    Calcula as diferenças entre duas versões de uma tabela.
+
+    Args:
+        old (models.Table): Versão anterior.
+        new (models.Table): Nova versão.
+
+    Returns:
+        dict | None: {"added": [...], "removed": [...], "changed": [...]}, com os valores
+            tipados de cada linha, ou None se os cabeçalhos mudaram ou a primeira coluna não
+            identifica as linhas (a tabela deve ser obtida por inteiro).
+    """
+    if old.headers != new.headers or not new.types or new.types[0] != TEXT:
+        return None
+    old_rows = dict(zip(row_keys(old), old.rows))
+    new_rows = dict(zip(row_keys(new), new.rows))
+
+    added = [_row_entry(key, row, values=list(row.values)) for key, row in new_rows.items() if key not in old_rows]
+    removed = [_row_entry(key, row, values=list(row.values)) for key, row in old_rows.items() if key not in new_rows]
+    changed = [
+        _row_entry(key, row, before=list(old_rows[key].values), after=list(row.values))
+        for key, row in new_rows.items()
+        if key in old_rows and (old_rows[key].values != row.values or old_rows[key].level != row.level)
+    ]
+    return {"added": added, "removed": removed, "changed": changed}
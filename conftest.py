@@ -0,0 +1,147 @@
+import fnmatch
+import os
+import socketserver
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+# Os testes usam um armazenamento local temporário, isolado do banco de dados real
+os.environ.setdefault("EMBRAPA_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="vitibrasil-testes-"), "vitibrasil.db"))
+# Os testes fazem muitas requisições com o mesmo token: o controle de admissão é testado à parte
+os.environ.setdefault("ADMISSAO_ATIVO", "0")
+
+
+@pytest.fixture
+def client():
+    import app as api
+
+    api.response_cache.clear()
+    return api.app.test_client()
+
+
+@pytest.fixture
+def auth_headers(client):
+    response = client.post("/auth", json={"username": "admin", "password": "password"})
+    return {"Authorization": f"Bearer {response.json['access_token']}"}
+
+
+@pytest.fixture
+def server():
+    """
+    Servidor HTTP local que responde com os status definidos em server.statuses, o corpo
+    server.body e o atraso server.delay (segundos).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            httpd.hits += 1
+            status = httpd.statuses.pop(0) if httpd.statuses else 200
+            time.sleep(httpd.delay)
+            self.send_response(status)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(httpd.body)))
+            self.end_headers()
+            self.wfile.write(httpd.body)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.hits = 0
+    httpd.statuses = []
+    httpd.body = b"ok"
+    httpd.delay = 0
+    httpd.url = f"http://127.0.0.1:{httpd.server_address[1]}/"
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+
+
+@pytest.fixture
+def embrapa(server, monkeypatch, tmp_path):
+    """
+    Servidor local no lugar do site da Embrapa, respondendo com uma página salva, e
+    armazenamento vazio para que as tabelas gravadas não afetem os outros testes.
+    """
+    import app as api
+    from storage import DataStore
+
+    with open(os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "exportacao_vinhos_2023.html"), "rb") as file:
+        server.body = file.read()
+    monkeypatch.setattr(api, "BASE_URL", server.url)
+    monkeypatch.setattr(api, "async_fetcher", None)
+    monkeypatch.setattr(api, "data_store", DataStore(str(tmp_path / "vitibrasil.db")))
+    api.response_cache.clear()
+    yield server
+    api.response_cache.clear()
+
+
+@pytest.fixture
+def redis_server():
+    """
+    Servidor local com o protocolo do Redis (GET, SET com PX, PTTL, DEL, SCAN e PING), com
+    as entradas em memória, no lugar de um Redis real. server.url é a URL de conexão.
+    """
+    from shared_cache import _read_reply
+
+    def reply(value):
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(reply(item) for item in value)
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    def execute(command, *args):
+        now = time.monotonic()
+        for key, (_, expires_at) in list(data.items()):
+            if expires_at is not None and expires_at <= now:
+                del data[key]
+        if command == b"PING":
+            return b"+PONG\r\n"
+        if command == b"GET":
+            return reply(data[args[0]][0] if args[0] in data else None)
+        if command == b"SET":
+            expires_at = now + int(args[3]) / 1000 if len(args) > 3 and args[2].upper() == b"PX" else None
+            data[args[0]] = (args[1], expires_at)
+            return b"+OK\r\n"
+        if command == b"PTTL":
+            if args[0] not in data:
+                return reply(-2)
+            expires_at = data[args[0]][1]
+            return reply(-1 if expires_at is None else int((expires_at - now) * 1000))
+        if command == b"DEL":
+            return reply(sum(data.pop(key, None) is not None for key in args))
+        if command == b"SCAN":
+            pattern = args[args.index(b"MATCH") + 1].decode()
+            return reply([b"0", [key for key in data if fnmatch.fnmatchcase(key.decode(), pattern)]])
+        return b"-ERR comando desconhecido\r\n"
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            while True:
+                try:
+                    command = _read_reply(self.rfile)
+                except ConnectionError:
+                    return
+                server.commands += 1
+                with lock:
+                    response = execute(command[0].upper(), *command[1:])
+                self.wfile.write(response)
+
+    data = {}
+    lock = threading.Lock()
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    server.data = data
+    server.commands = 0
+    server.url = f"redis://127.0.0.1:{server.server_address[1]}/0"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,293 @@
+"""
+Serialização das tabelas em formatos para carga em lote (NDJSON, CSV, Parquet e Arrow).
+
+Cada formato é produzido por um gerador que emite os bytes tabela a tabela, de modo
+que a memória usada não cresce com o número de tabelas exportadas. As linhas são
+planas: as colunas de contexto (ex.: subcategoria e ano), o nível da linha e as
+colunas da tabela, com os valores numéricos já tipados.
+
+As tabelas que não puderam ser obtidas não são omitidas: no NDJSON viram linhas com a
+chave ``error``; no CSV, no Parquet e no Arrow, linhas com a última coluna ``erro``
+preenchida e as colunas da tabela vazias.
+"""
+import csv
+import importlib.util
+import io
+import json
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+from models import TEXT
+
+MIMETYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Formatos que dependem do pyarrow, importado apenas na primeira exportação nesses formatos
+ARROW_FORMATS = ("parquet", "arrow")
+PYARROW_INSTALLED = importlib.util.find_spec("pyarrow") is not None
+
+# Última coluna do CSV, do Parquet e do Arrow: a mensagem de erro das tabelas não obtidas
+ERROR_COLUMN = "erro"
+
+
+def format_from_request(request, default="json"):
+    """
+    Define o formato da resposta pelo parâmetro formato ou pelo cabeçalho Accept.
+
+    Returns:
+        str | None: Nome do formato, ou None se o parâmetro formato for inválido.
+    """
+    name = request.args.get("formato")
+    if name:
+        return name if name in MIMETYPES else None
+    best = request.accept_mimetypes.best_match(
+        [MIMETYPES[default]] + [mimetype for key, mimetype in MIMETYPES.items() if key != default]
+    )
+    for key, mimetype in MIMETYPES.items():
+        if mimetype == best:
+            return key
+    return default
+
+
+def dumps_json(value, sort_keys=False):
+    """
+    Serializa um valor em JSON compacto (UTF-8), com o orjson se estiver instalado.
+
+    Args:
+        value: Valor a serializar (dicionários, listas, tuplas, textos, números e None).
+        sort_keys (bool): Ordena as chaves dos dicionários, como o jsonify do Flask.
+
+    Returns:
+        bytes: JSON codificado em UTF-8.
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_SORT_KEYS if sort_keys else 0)
+        return orjson.dumps(value, option=option)
+    return json.dumps(value, ensure_ascii=False, sort_keys=sort_keys, separators=(",", ":")).encode("utf-8")
+
+
+def available(name):
+    """Indica se o formato pode ser gerado (Parquet e Arrow dependem do pyarrow)."""
+    return name in MIMETYPES and (name not in ARROW_FORMATS or PYARROW_INSTALLED)
+
+
+def stream(name, context_columns, items):
+    """
+    Gera o conteúdo de uma exportação no formato informado.
+
+    Args:
+        name (str): ndjson, csv, parquet ou arrow.
+        context_columns (list): Nomes das colunas de contexto de cada tabela (ex.: ["subcategoria", "ano"]).
+        items (iterable): Pares (valores de contexto, models.Table | dict de erro). As colunas
+            de dados são definidas pela primeira tabela; as seguintes são alinhadas por posição.
+            No Parquet e no Arrow o tipo de cada coluna também vem da primeira tabela, e os
+            valores incompatíveis das seguintes (ex.: texto em coluna numérica) viram nulos.
+
+    Yields:
+        bytes: Partes do conteúdo.
+    """
+    generators = {"ndjson": _iter_ndjson, "csv": _iter_csv, "parquet": _iter_parquet, "arrow": _iter_arrow}
+    return generators[name](list(context_columns), iter(items))
+
+
+def _columns(context_columns, table):
+    return context_columns + ["nivel"] + list(table.headers or [])
+
+
+def _iter_records(context, table, width):
+    for row in table.rows:
+        values = row.values[:width] + (None,) * (width - len(row.values))
+        yield tuple(context) + (row.level,) + values
+
+
+def _tables(items):
+    """Repassa as tabelas com cabeçalhos e os erros (como a mensagem, no lugar da tabela)."""
+    for context, table in items:
+        if isinstance(table, dict):
+            yield context, table["error"]
+        elif table.headers is not None:
+            yield context, table
+
+
+def _iter_ndjson(context_columns, items):
+    columns = None
+    for context, table in items:
+        if isinstance(table, dict):
+            error = dict(zip(context_columns, context), error=table["error"])
+            yield dumps_json(error) + b"\n"
+            continue
+        if table.headers is None:
+            continue
+        if columns is None:
+            columns = _columns(context_columns, table)
+        width = len(columns) - len(context_columns) - 1
+        lines = [dumps_json(dict(zip(columns, record))) for record in _iter_records(context, table, width)]
+        if lines:
+            yield b"\n".join(lines) + b"\n"
+
+
+def _iter_csv(context_columns, items):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    columns = None
+    # Erros anteriores à primeira tabela, que define as colunas
+    pending = []
+    for context, table in _tables(items):
+        if isinstance(table, str):
+            if columns is None:
+                pending.append((context, table))
+                continue
+            writer.writerow(_csv_error(columns, context, table))
+        else:
+            if columns is None:
+                columns = _columns(context_columns, table) + [ERROR_COLUMN]
+                writer.writerow(columns)
+                writer.writerows(_csv_error(columns, *error) for error in pending)
+            width = len(columns) - len(context_columns) - 2
+            writer.writerows(record + (None,) for record in _iter_records(context, table, width))
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if columns is None:
+        columns = context_columns + ["nivel", ERROR_COLUMN]
+        writer.writerow(columns)
+        writer.writerows(_csv_error(columns, *error) for error in pending)
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _csv_error(columns, context, message):
+    return list(context) + [None] * (len(columns) - len(context) - 1) + [message]
+
+
+class _ChunkSink(io.RawIOBase):
+    """Arquivo somente de escrita que acumula os bytes até serem consumidos com take()."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _arrow_schema(context_columns, context, table):
+    """Define o esquema pela primeira tabela (ou só com as colunas de contexto, se não houver)."""
+    import pyarrow as pa
+
+    fields = []
+    for column, value in zip(context_columns, context or [None] * len(context_columns)):
+        fields.append(pa.field(column, pa.int32() if isinstance(value, int) else pa.string()))
+    fields.append(pa.field("nivel", pa.string()))
+    if table is not None:
+        # Colunas numéricas usam float64, pois o tipo pode variar entre os anos
+        for header, column_type in zip(table.headers, table.types):
+            fields.append(pa.field(header, pa.string() if column_type == TEXT else pa.float64()))
+    fields.append(pa.field(ERROR_COLUMN, pa.string()))
+    return pa.schema(fields)
+
+
+def _arrow_cell(value, numeric):
+    """Ajusta um valor ao tipo da coluna do esquema (valores incompatíveis viram nulos)."""
+    if value is None:
+        return None
+    if numeric:
+        return value if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+    return value if isinstance(value, str) else str(value)
+
+
+def _arrow_batch(schema, context, table):
+    import pyarrow as pa
+
+    width = len(schema) - len(context) - 2
+    records = list(_iter_records(context, table, width))
+    arrays = []
+    for i, field in enumerate(schema):
+        if field.name == ERROR_COLUMN:
+            arrays.append(pa.nulls(len(records), pa.string()))
+        elif i < len(context):
+            arrays.append(pa.array([record[i] for record in records], type=field.type))
+        else:
+            numeric = pa.types.is_floating(field.type)
+            arrays.append(pa.array([_arrow_cell(record[i], numeric) for record in records], type=field.type))
+    return pa.record_batch(arrays, schema=schema)
+
+
+def _arrow_error_batch(schema, context, message):
+    import pyarrow as pa
+
+    values = list(context) + [None] * (len(schema) - len(context) - 1) + [message]
+    arrays = [pa.array([value], type=field.type) for value, field in zip(values, schema)]
+    return pa.record_batch(arrays, schema=schema)
+
+
+def _iter_arrow_format(context_columns, items, open_writer, write):
+    sink = _ChunkSink()
+    writer = None
+    schema = None
+    # Erros anteriores à primeira tabela, que define o esquema
+    pending = []
+    for context, table in _tables(items):
+        if isinstance(table, str):
+            if writer is None:
+                pending.append((context, table))
+                continue
+            write(writer, _arrow_error_batch(schema, context, table))
+        else:
+            if writer is None:
+                schema = _arrow_schema(context_columns, context, table)
+                writer = open_writer(sink, schema)
+                for error in pending:
+                    write(writer, _arrow_error_batch(schema, *error))
+            write(writer, _arrow_batch(schema, context, table))
+        yield sink.take()
+    if writer is None:
+        schema = _arrow_schema(context_columns, pending[0][0] if pending else None, None)
+        writer = open_writer(sink, schema)
+        for error in pending:
+            write(writer, _arrow_error_batch(schema, *error))
+    writer.close()
+    yield sink.take()
+
+
+def _iter_parquet(context_columns, items):
+    import pyarrow.parquet as pq
+
+    return _iter_arrow_format(
+        context_columns,
+        items,
+        lambda sink, schema: pq.ParquetWriter(sink, schema),
+        lambda writer, batch: writer.write_batch(batch),
+    )
+
+
+def _iter_arrow(context_columns, items):
+    import pyarrow as pa
+
+    return _iter_arrow_format(
+        context_columns,
+        items,
+        lambda sink, schema: pa.ipc.new_stream(sink, schema),
+        lambda writer, batch: writer.write_batch(batch),
+    )
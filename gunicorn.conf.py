@@ -0,0 +1,47 @@
+"""
+Configuração do gunicorn para produção (gunicorn -c gunicorn.conf.py wsgi:app).
+
+Todos os valores podem ser ajustados por variáveis de ambiente. Os workers usam threads
+(gthread): as rotas passam a maior parte do tempo esperando o site da Embrapa ou lendo
+o cache, então várias threads por processo aproveitam melhor a CPU do que só processos.
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("GUNICORN_WORKERS", min(multiprocessing.cpu_count() * 2 + 1, 8)))
+worker_class = "gthread"
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+
+# Carregar a aplicação no processo mestre antes do fork economiza memória e tempo de
+# inicialização; os serviços de cada worker são recriados em post_fork
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+
+# Consultas por intervalo de anos podem levar vários segundos com o site da Embrapa lento
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 120))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 30))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+
+# Reciclar workers periodicamente limita o crescimento de memória (0 desativa)
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 0))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", 0))
+
+accesslog = os.environ.get("GUNICORN_ACCESSLOG", "-")
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOGLEVEL", "info")
+
+
+def post_fork(server, worker):
+    """Recria cache, conexões e pool de threads no worker (não sobrevivem ao fork) e inicia o agendador."""
+    import app
+
+    # Sem preload o módulo é importado aqui e os serviços já pertencem ao worker
+    app.init_services()
+    app.start_scheduler()
+
+
+def worker_exit(server, worker):
+    """Encerra o agendador, o pool de threads e as conexões HTTP do worker."""
+    import app
+
+    app.shutdown_services()
@@ -0,0 +1,118 @@
+"""
+Requisições condicionais, cabeçalhos de cache e compressão das respostas HTTP.
+"""
+import gzip
+import hashlib
+
+from werkzeug.http import is_resource_modified
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+# Tipos de conteúdo que valem a pena comprimir
+COMPRESSIBLE_MIMETYPES = frozenset([
+    "application/json",
+    "application/x-ndjson",
+    "text/csv",
+    "text/html",
+])
+
+# Dados definitivos (anos que o site não atualiza mais): um ano de validade, sem revalidação
+IMMUTABLE_MAX_AGE = 31536000
+
+
+def make_etag(*parts):
+    """
+    Calcula a ETag a partir do hash do conteúdo e dos parâmetros que alteram a representação.
+
+    Args:
+        *parts: Hashes de conteúdo, parâmetros da requisição etc.
+
+    Returns:
+        str: Valor da ETag (sem aspas).
+    """
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8"))
+    return digest.hexdigest()[:32]
+
+
+def cache_control(closed, ttl, public=False):
+    """
+    Monta o cabeçalho Cache-Control.
+
+    Args:
+        closed (bool): Se os dados são definitivos (imutáveis). O ano anterior ainda é
+            atualizado pelo agendador e não deve ser marcado como imutável.
+        ttl (int | None): Validade, em segundos, dos dados que ainda podem mudar.
+        public (bool): Permite o armazenamento por caches compartilhados (CDN, proxy reverso).
+    """
+    scope = "public" if public else "private"
+    if closed:
+        return f"{scope}, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"{scope}, max-age={ttl or 0}, must-revalidate"
+
+
+def not_modified(request, etag, last_modified=None):
+    """
+    Indica se o cliente já possui a versão atual (If-None-Match / If-Modified-Since).
+    """
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def set_validators(response, etag, last_modified=None, cache_control_value=None):
+    """Define ETag, Last-Modified, Cache-Control e Vary em uma resposta."""
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    if cache_control_value:
+        response.headers["Cache-Control"] = cache_control_value
+    response.vary.update(["Accept", "Accept-Encoding", "Authorization"])
+    return response
+
+
+def compress(response, request, min_size):
+    """
+    Comprime o corpo da resposta com brotli ou gzip, conforme o Accept-Encoding do cliente.
+
+    Apenas respostas 200 já materializadas (sem streaming), de tipos textuais e com pelo
+    menos min_size bytes são comprimidas.
+    """
+    if (
+        response.status_code != 200
+        or response.direct_passthrough
+        or response.is_streamed
+        or response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or "Content-Encoding" in response.headers
+    ):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    encoding = negotiate_encoding(request)
+    if encoding is None:
+        return response
+
+    response.set_data(compress_body(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
+def negotiate_encoding(request):
+    """Escolhe a compressão aceita pelo cliente: "br" (se o brotli estiver instalado), "gzip" ou None."""
+    encodings = request.accept_encodings
+    if brotli is not None and encodings["br"]:
+        return "br"
+    if encodings["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress_body(body, encoding):
+    """Comprime o corpo com a compressão escolhida por negotiate_encoding."""
+    if encoding == "br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
@@ -0,0 +1,130 @@
+"""
+Ingestão em lote dos dados do site da Embrapa para o armazenamento local.
+
+Percorre todas as categorias, subcategorias e anos e grava as tabelas no banco
+SQLite configurado em EMBRAPA_DB_PATH. Tabelas já armazenadas são ignoradas, o
+que permite retomar uma ingestão interrompida.
+
+Com --replay as páginas são lidas do arquivo local de HTML (archive.py) em vez do
+site, sem acesso à rede. Junto com --sobrescrever, extrai novamente todo o histórico
+arquivado, por exemplo após uma correção no parser.
+
+Com --paralelo as páginas são obtidas por várias threads e, com --processos (ou
+EMBRAPA_PARSE_PROCESSOS), extraídas em um pool de processos, usando todos os núcleos.
+
+Uso:
+    python ingestao.py [--categorias producao exportacao] [--ano-inicio 1970] [--ano-fim 2024] [--sobrescrever] [--replay]
+        [--paralelo 8] [--processos 4]
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import app as api
+from app import CATEGORY_OPTIONS, FIRST_YEAR, SUBCATEGORY_OPTIONS, _scrape_embrapa_data, data_store
+from models import Table
+from parse_pool import ParsePool
+from replay import ReplayClient
+
+
+def iter_specs(categories, start_year, end_year):
+    """
+    Gera todas as combinações (categoria, ano, subcategoria) a serem ingeridas.
+
+    Args:
+        categories (list): Categorias a percorrer.
+        start_year (int): Primeiro ano.
+        end_year (int): Último ano (inclusive).
+
+    Yields:
+        tuple: (categoria, ano, subcategoria), com subcategoria None para categorias sem subdivisão.
+    """
+    for category in categories:
+        subcategories = list(SUBCATEGORY_OPTIONS.get(category, {})) or [None]
+        for subcategory in subcategories:
+            for year in range(start_year, end_year + 1):
+                yield category, year, subcategory
+
+
+def _scrape(spec):
+    category, year, subcategory = spec
+    started = time.perf_counter()
+    result = _scrape_embrapa_data(category, str(year), subcategory)
+    return result, time.perf_counter() - started
+
+
+def ingest(categories, start_year, end_year, overwrite=False, workers=1):
+    """
+    Executa a ingestão e grava as tabelas obtidas no armazenamento local.
+
+    Args:
+        categories (list): Categorias a percorrer.
+        start_year (int): Primeiro ano.
+        end_year (int): Último ano (inclusive).
+        overwrite (bool): Regrava as tabelas já armazenadas.
+        workers (int): Páginas obtidas ao mesmo tempo (as tabelas são gravadas na ordem).
+
+    Returns:
+        dict: Contadores de tabelas gravadas, ignoradas, vazias e com erro.
+    """
+    summary = {"saved": 0, "skipped": 0, "empty": 0, "errors": 0}
+    specs = []
+    for category, year, subcategory in iter_specs(categories, start_year, end_year):
+        if not overwrite and data_store.has_table(category, year, subcategory):
+            summary["skipped"] += 1
+        else:
+            specs.append((category, year, subcategory))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingestao") as executor:
+        for spec, (result, elapsed) in zip(specs, executor.map(_scrape, specs)):
+            _record(summary, spec, result, elapsed)
+    return summary
+
+
+def _record(summary, spec, result, elapsed):
+    """Grava a tabela obtida (se não estiver vazia) e atualiza os contadores da ingestão."""
+    category, year, subcategory = spec
+    label = f"{category}/{subcategory or '-'}/{year}"
+    if not isinstance(result, Table):
+        summary["errors"] += 1
+        print(f"❌ {label}: {result['error']}")
+    elif not result.rows:
+        summary["empty"] += 1
+        print(f"⚠️  {label}: tabela vazia")
+    else:
+        data_store.save_table(category, year, subcategory, result)
+        summary["saved"] += 1
+        print(f"✅ {label}: {len(result.rows)} linhas ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingestão em lote dos dados da Embrapa Vitivinicultura")
+    parser.add_argument("--categorias", nargs="+", choices=list(CATEGORY_OPTIONS), default=list(CATEGORY_OPTIONS))
+    parser.add_argument("--ano-inicio", type=int, default=FIRST_YEAR)
+    parser.add_argument("--ano-fim", type=int, default=date.today().year)
+    parser.add_argument("--sobrescrever", action="store_true", help="Regrava tabelas já armazenadas")
+    parser.add_argument("--replay", action="store_true", help="Lê as páginas do arquivo local de HTML, sem acessar o site")
+    parser.add_argument("--paralelo", type=int, default=1, help="Páginas obtidas ao mesmo tempo")
+    parser.add_argument("--processos", type=int, help="Processos para a extração (padrão: EMBRAPA_PARSE_PROCESSOS)")
+    args = parser.parse_args()
+
+    if args.processos is not None:
+        api.parse_pool = ParsePool(args.processos)
+
+    if args.replay:
+        if api.html_archive is None:
+            parser.error("--replay requer o arquivo de páginas (EMBRAPA_ARQUIVO_HTML)")
+        api.embrapa_client = ReplayClient(api.html_archive)
+
+    summary = ingest(args.categorias, args.ano_inicio, args.ano_fim, overwrite=args.sobrescrever, workers=args.paralelo)
+    print(
+        f"\nIngestão concluída: {summary['saved']} gravadas, {summary['skipped']} já existentes, "
+        f"{summary['empty']} vazias, {summary['errors']} com erro."
+    )
+    print(f"Armazenamento: {data_store.stats()}")
+    api.parse_pool.close()
+
+
+if __name__ == "__main__":
+    main()
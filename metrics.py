@@ -0,0 +1,268 @@
+"""
+Métricas no formato de texto do Prometheus, tempo por fase das requisições e
+rastreamento opcional com OpenTelemetry.
+
+As fases (acesso ao site da Embrapa, extração do HTML, tipagem das linhas,
+armazenamento, serialização e compressão) são medidas com o gerenciador de contexto
+phase(). Cada medição alimenta o histograma vitibrasil_phase_duration_seconds e, se
+houver uma requisição em andamento (RequestTimer), o cabeçalho Server-Timing da
+resposta. Com o rastreamento ativado (enable_tracing), cada fase também é um span.
+
+As métricas são mantidas por processo: com vários workers do gunicorn, cada coleta
+de /metrics retorna os valores do worker que atendeu a requisição.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+try:
+    from opentelemetry import trace as otel_trace
+except ImportError:  # pragma: no cover - dependência opcional
+    otel_trace = None
+
+# Limites dos buckets dos histogramas de duração (segundos) e de tamanho (bytes)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Counter:
+    """Contador monotônico, com rótulos opcionais."""
+
+    type = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labelnames, key)), value
+
+
+class Histogram:
+    """Histograma com buckets cumulativos, soma e contagem, com rótulos opcionais."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**labels, "le": _format_value(float(bound))}, cumulative
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    """
+    Conjunto de métricas exportadas em /metrics.
+
+    Além das métricas registradas, aceita coletores: funções chamadas a cada coleta que
+    retornam tuplas (nome, tipo, descrição, [(rótulos, valor), ...]), usadas para expor
+    contadores mantidos por outros componentes (cache, cliente HTTP).
+    """
+
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DURATION_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        """Retorna as métricas no formato de texto do Prometheus."""
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(
+                f"{name}{_format_labels(labels)} {_format_value(value)}" for name, labels, value in metric.samples()
+            )
+        for collector in self._collectors:
+            for name, metric_type, documentation, samples in collector():
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                lines.extend(f"{name}{_format_labels(labels)} {_format_value(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    "vitibrasil_http_requests_total", "Requisições atendidas pela API.", ("endpoint", "method", "status")
+)
+REQUEST_SECONDS = registry.histogram(
+    "vitibrasil_http_request_duration_seconds", "Duração das requisições (até a resposta, sem o streaming).",
+    ("endpoint",),
+)
+RESPONSE_BYTES = registry.histogram(
+    "vitibrasil_http_response_size_bytes", "Tamanho do corpo das respostas (após a compressão).",
+    ("endpoint",), SIZE_BUCKETS,
+)
+PHASE_SECONDS = registry.histogram(
+    "vitibrasil_phase_duration_seconds", "Duração de cada fase do atendimento.", ("phase",)
+)
+
+# Tempos por fase da requisição em andamento (ver RequestTimer)
+_timings = contextvars.ContextVar("vitibrasil_timings", default=None)
+_timings_lock = threading.Lock()
+_tracer = None
+
+
+def enable_tracing(name="vitibrasil"):
+    """
+    Ativa os spans do OpenTelemetry para as requisições e as fases.
+
+    O exportador é configurado pelo SDK do OpenTelemetry (ex.: opentelemetry-instrument ou
+    variáveis OTEL_*); sem o SDK, a API do OpenTelemetry não registra nada.
+
+    Returns:
+        bool: False se o pacote opentelemetry-api não estiver instalado.
+    """
+    global _tracer
+    if otel_trace is None:
+        return False
+    _tracer = otel_trace.get_tracer(name)
+    return True
+
+
+def _span(name):
+    return _tracer.start_as_current_span(name) if _tracer is not None else nullcontext()
+
+
+def _record(name, elapsed):
+    PHASE_SECONDS.observe(elapsed, phase=name)
+    timings = _timings.get()
+    if timings is not None:
+        with _timings_lock:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+@contextmanager
+def phase(name):
+    """Mede a duração de uma fase (e cria um span, se o rastreamento estiver ativado)."""
+    started = time.perf_counter()
+    try:
+        with _span(name):
+            yield
+    finally:
+        _record(name, time.perf_counter() - started)
+
+
+@contextmanager
+def collect_phases(timings):
+    """Soma em `timings` o tempo das fases executadas dentro do bloco, no contexto atual."""
+    token = _timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _timings.reset(token)
+
+
+class RequestTimer:
+    """
+    Tempos de uma requisição: duração total e soma do tempo de cada fase.
+
+    As fases executadas em outras threads entram na soma quando a função é submetida com
+    contextvars.copy_context().run (ver app.iter_embrapa_tables), de modo que a soma pode
+    superar a duração total em consultas paralelas.
+
+    Args:
+        endpoint (str): Nome da rota, usado como rótulo das métricas.
+        timings (dict, optional): Tempos das fases medidos antes de a requisição chegar ao
+            Flask (ex.: busca assíncrona das tabelas em asgi.py).
+    """
+
+    def __init__(self, endpoint, timings=None):
+        self.endpoint = endpoint
+        self.started = time.perf_counter()
+        self.timings = dict(timings or {})
+        _timings.set(self.timings)
+        self._span = _span(endpoint)
+        self._span.__enter__()
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def server_timing(self):
+        """Valor do cabeçalho Server-Timing (durações em milissegundos)."""
+        with _timings_lock:
+            timings = dict(self.timings)
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in timings.items()]
+        entries.append(f"total;dur={self.elapsed() * 1000:.1f}")
+        return ", ".join(entries)
+
+    def record(self, method, status, size):
+        """Registra a requisição nas métricas de requisições, duração e tamanho da resposta."""
+        REQUESTS.inc(endpoint=self.endpoint, method=method, status=status)
+        REQUEST_SECONDS.observe(self.elapsed(), endpoint=self.endpoint)
+        if size is not None:
+            RESPONSE_BYTES.observe(size, endpoint=self.endpoint)
+
+    def finish(self):
+        _timings.set(None)
+        self._span.__exit__(None, None, None)
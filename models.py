@@ -0,0 +1,213 @@
+"""
+Representação tipada das tabelas do site da Embrapa.
+
+As células numéricas são convertidas uma única vez na ingestão ("1.234.567" vira
+1234567, "1.234,56" vira 1234.56 e os marcadores "-" e "nd" viram None). Cada
+linha guarda seus valores em uma tupla, sem repetir os nomes das colunas.
+"""
+import hashlib
+import json
+import re
+
+# Marcadores usados pelo site da Embrapa para valores ausentes
+NULL_MARKERS = frozenset(["", "-", "nd", "n/d", "*"])
+
+_INT_RE = re.compile(r"^-?\d{1,3}(\.\d{3})+$|^-?\d+$")
+_FLOAT_RE = re.compile(r"^-?\d{1,3}(\.\d{3})*,\d+$|^-?\d+,\d+$")
+
+TEXT = "text"
+INT = "int"
+FLOAT = "float"
+
+# Nível das linhas: produto, subitem do produto ou linha de total
+ITEM = "item"
+SUBITEM = "subitem"
+TOTAL = "total"
+
+
+def parse_number(text):
+    """
+    Converte um número no formato brasileiro.
+
+    Args:
+        text (str): Texto da célula, ex.: "1.234.567", "1.234,56", "-" ou "nd".
+
+    Returns:
+        int | float | None: Valor convertido, ou None para os marcadores de valor ausente.
+
+    Raises:
+        ValueError: Se o texto não for um número nem um marcador de valor ausente.
+    """
+    text = text.strip()
+    if text.lower() in NULL_MARKERS:
+        return None
+    if _INT_RE.match(text):
+        return int(text.replace(".", ""))
+    if _FLOAT_RE.match(text):
+        return float(text.replace(".", "").replace(",", "."))
+    raise ValueError(f"Valor numérico inválido: {text!r}")
+
+
+def format_number(value):
+    """Formata um valor no padrão brasileiro usado pelo site da Embrapa ("-" para None)."""
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        integer, _, decimals = f"{abs(value):.6f}".rstrip("0").partition(".")
+        text = f"{int(integer):,}".replace(",", ".")
+        if decimals:
+            text += "," + decimals
+        return f"-{text}" if value < 0 else text
+    return f"{value:,}".replace(",", ".")
+
+
+def _column_type(cells):
+    """Define o tipo de uma coluna: numérica se todas as células forem números ou marcadores."""
+    column_type = INT
+    for text in cells:
+        try:
+            value = parse_number(text)
+        except ValueError:
+            return TEXT
+        if isinstance(value, float):
+            column_type = FLOAT
+    return column_type
+
+
+class Row:
+    """Linha de uma tabela: valores tipados na ordem dos cabeçalhos e nível da linha."""
+
+    __slots__ = ("values", "level")
+
+    def __init__(self, values, level=None):
+        self.values = values
+        self.level = level
+
+    def __eq__(self, other):
+        return isinstance(other, Row) and self.values == other.values and self.level == other.level
+
+    def __repr__(self):
+        return f"Row({self.values!r}, level={self.level!r})"
+
+
+class Table:
+    """
+    Tabela extraída de uma página do site da Embrapa.
+
+    headers é None quando a página não possui tabela. types indica o tipo de cada
+    coluna (text, int ou float). fetched_at é o instante (UTC) em que a página foi
+    obtida do site da Embrapa.
+    """
+
+    __slots__ = ("title", "headers", "types", "rows", "source_url", "fetched_at", "_hash")
+
+    # Atributos que definem o conteúdo da tabela
+    CONTENT = ("title", "headers", "types", "rows", "source_url")
+
+    def __init__(self, title, headers, types, rows, source_url, fetched_at=None):
+        self.title = title
+        self.headers = headers
+        self.types = types
+        self.rows = rows
+        self.source_url = source_url
+        self.fetched_at = fetched_at
+        self._hash = None
+
+    @classmethod
+    def from_parsed(cls, page, source_url, fetched_at=None):
+        """
+        Cria a tabela a partir do resultado de parsing.parse_page, convertendo as colunas numéricas.
+
+        Args:
+            page (parsing.ParsedPage): Página extraída.
+            source_url (str): URL da página no site da Embrapa.
+            fetched_at (datetime, optional): Instante em que a página foi obtida.
+        """
+        if page.headers is None:
+            return cls(page.title, None, None, [], source_url, fetched_at)
+
+        types = [_column_type(cells[i] for cells in page.rows if i < len(cells)) for i in range(len(page.headers))]
+        rows = []
+        for cells, level in zip(page.rows, page.levels):
+            values = tuple(
+                parse_number(text) if column_type != TEXT else text
+                for text, column_type in zip(cells, types)
+            )
+            if level is None and cells and cells[0].lower() == "total":
+                level = TOTAL
+            rows.append(Row(values, level))
+        return cls(page.title, page.headers, types, rows, source_url, fetched_at)
+
+    def __eq__(self, other):
+        return isinstance(other, Table) and all(
+            getattr(self, name) == getattr(other, name) for name in self.CONTENT
+        )
+
+    def content_hash(self):
+        """
+        Retorna o hash (SHA-256) do conteúdo da tabela, calculado uma única vez.
+
+        Tabelas com o mesmo conteúdo têm o mesmo hash, independentemente de quando foram obtidas.
+        """
+        if self._hash is None:
+            content = [
+                self.title,
+                self.headers,
+                self.types,
+                [[row.values, row.level] for row in self.rows],
+                self.source_url,
+            ]
+            encoded = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            self._hash = hashlib.sha256(encoded).hexdigest()
+        return self._hash
+
+    def __repr__(self):
+        return f"Table({self.title!r}, {len(self.rows)} linhas)"
+
+    def row_dicts(self):
+        """
+        Retorna as linhas como dicionários {cabeçalho: texto}, no formato original da API.
+
+        Os valores numéricos são formatados no padrão brasileiro e os ausentes como "-".
+        """
+        text_columns = [column_type == TEXT for column_type in self.types or []]
+        return [
+            {
+                header: value if is_text else format_number(value)
+                for header, value, is_text in zip(self.headers, row.values, text_columns)
+            }
+            for row in self.rows
+        ]
+
+    def to_dict(self):
+        """Serializa a tabela no formato original da API (uma linha por dicionário)."""
+        if self.headers is None:
+            return {
+                "title": self.title,
+                "data": [],
+                "message": "Tabela não encontrada",
+                "source_url": self.source_url,
+            }
+        return {
+            "title": self.title,
+            "headers": self.headers,
+            "data": self.row_dicts(),
+            "source_url": self.source_url,
+        }
+
+    def to_columnar(self):
+        """
+        Serializa a tabela em colunas: uma lista de valores tipados por cabeçalho e a lista de níveis.
+        """
+        headers = self.headers or []
+        return {
+            "title": self.title,
+            "headers": headers,
+            "types": self.types or [],
+            "columns": [
+                [row.values[i] if i < len(row.values) else None for row in self.rows]
+                for i in range(len(headers))
+            ],
+            "levels": [row.level for row in self.rows],
+            "source_url": self.source_url,
+        }
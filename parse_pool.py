@@ -0,0 +1,155 @@
+"""
+Extração das páginas do site da Embrapa em um pool de processos.
+
+A extração do HTML e a conversão dos valores são código Python que mantém a GIL: em um
+worker com threads, uma página grande (exportação e importação por país) extraída em uma
+thread atrasa todas as outras requisições. Com o pool, a página é enviada a outro processo
+como bytes e volta como linhas tipadas em forma compacta (tuplas de valores e níveis), de
+modo que extrações simultâneas usam todos os núcleos.
+
+O número de páginas aguardando ou em extração é limitado: quando o pool está saturado, quem
+pede uma extração espera por uma vaga e, se ela não surgir a tempo, recebe
+ParsePoolBusyError em vez de acumular páginas na fila.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+from models import Row, Table
+from parsing import parse_page
+
+
+class ParsePoolBusyError(RuntimeError):
+    """Erro lançado quando o pool de extração não libera vaga a tempo."""
+
+
+def parse_compact(content, encoding):
+    """
+    Extrai a tabela de uma página em forma compacta, para o envio entre processos.
+
+    Args:
+        content (bytes): HTML da página.
+        encoding (str, optional): Codificação do HTML (UTF-8 se não informada).
+
+    Returns:
+        tuple: (título, cabeçalhos, tipos, valores de cada linha, nível de cada linha).
+    """
+    page = parse_page(content.decode(encoding or "utf-8", errors="replace"))
+    table = Table.from_parsed(page, None)
+    return table.title, table.headers, table.types, [row.values for row in table.rows], [row.level for row in table.rows]
+
+
+def from_compact(compact, source_url, fetched_at=None):
+    """Cria a tabela (models.Table) a partir do resultado de parse_compact."""
+    title, headers, types, values, levels = compact
+    rows = [Row(row_values, level) for row_values, level in zip(values, levels)]
+    return Table(title, headers, types, rows, source_url, fetched_at)
+
+
+def _start_method():
+    # forkserver evita o fork de um processo com threads; os filhos já partem com o parser importado
+    return "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+class ParsePool:
+    """
+    Extrai as páginas em um pool de processos, com limite de páginas pendentes.
+
+    O pool é criado na primeira extração, no processo que a pede (no gunicorn, em cada
+    worker). Com ``processes=0`` as páginas são extraídas na própria thread.
+
+    Args:
+        processes (int): Processos do pool (0 desativa o pool).
+        max_pending (int, optional): Máximo de páginas aguardando ou em extração
+            (padrão: 2 por processo).
+        wait_timeout (float): Espera máxima (segundos) por uma vaga quando o pool está saturado.
+    """
+
+    def __init__(self, processes=0, max_pending=None, wait_timeout=30):
+        self.processes = processes
+        self.max_pending = max_pending or 2 * processes
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending) if processes else None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._stats = {"parsed": 0, "pooled": 0, "pending": 0, "rejected": 0, "restarts": 0}
+
+    def parse(self, content, encoding, source_url, fetched_at=None):
+        """
+        Extrai a tabela de uma página.
+
+        Args:
+            content (bytes): HTML da página.
+            encoding (str, optional): Codificação do HTML.
+            source_url (str): URL da página no site da Embrapa.
+            fetched_at (datetime, optional): Instante em que a página foi obtida.
+
+        Returns:
+            models.Table: Tabela extraída.
+
+        Raises:
+            ParsePoolBusyError: Se o pool estiver saturado por mais de wait_timeout segundos.
+        """
+        self._count("parsed")
+        if not self.processes:
+            with metrics.phase("parse"):
+                page = parse_page(content.decode(encoding or "utf-8", errors="replace"))
+            with metrics.phase("rows"):
+                return Table.from_parsed(page, source_url, fetched_at)
+
+        # No pool, a fase "parse" inclui a espera por vaga, o envio e a conversão das linhas
+        with metrics.phase("parse"):
+            if not self._slots.acquire(timeout=self.wait_timeout):
+                self._count("rejected")
+                raise ParsePoolBusyError("limite de páginas aguardando extração atingido")
+            self._count("pending")
+            try:
+                compact = self._submit(content, encoding)
+            finally:
+                self._count("pending", -1)
+                self._slots.release()
+            self._count("pooled")
+            return from_compact(compact, source_url, fetched_at)
+
+    def _submit(self, content, encoding):
+        executor = self._get_executor()
+        try:
+            return executor.submit(parse_compact, content, encoding).result()
+        except BrokenProcessPool:
+            # Um processo do pool terminou de forma inesperada: o pool é recriado na próxima
+            # extração e esta página é extraída na própria thread
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+                    self._stats["restarts"] += 1
+            executor.shutdown(wait=False, cancel_futures=True)
+            return parse_compact(content, encoding)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(_start_method())
+                if context.get_start_method() == "forkserver":
+                    context.set_forkserver_preload(["parse_pool"])
+                self._executor = ProcessPoolExecutor(self.processes, mp_context=context)
+            return self._executor
+
+    def stats(self):
+        """Retorna os contadores de extrações, a fila e a configuração do pool."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["processes"] = self.processes
+        stats["max_pending"] = self.max_pending
+        return stats
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount
@@ -0,0 +1,179 @@
+"""
+Extração das tabelas das páginas do site da Embrapa.
+
+A extração é feita por um dos backends disponíveis, do mais rápido para o mais
+lento: selectolax, lxml e BeautifulSoup com html.parser (sempre disponível).
+Todos produzem o mesmo resultado: o título da página, os cabeçalhos, as células
+de cada linha da tabela de dados e o nível de cada linha (produto ou subitem).
+
+As bibliotecas de extração são importadas na primeira página extraída, e não na
+importação do módulo: um processo que serve apenas tabelas já armazenadas não as carrega.
+"""
+import importlib.util
+import os
+from collections import namedtuple
+
+DEFAULT_TITLE = "Dados não encontrados"
+
+# Resultado da extração: headers é None quando a página não possui tabela e levels
+# indica, para cada linha, se ela é um produto ("item"), um subitem ("subitem") ou None
+ParsedPage = namedtuple("ParsedPage", ["title", "headers", "rows", "levels"])
+
+# Classes usadas pelo site da Embrapa para distinguir produtos e subitens
+LEVEL_CLASSES = {"tb_item": "item", "tb_subitem": "subitem"}
+
+
+def _row_level(classes):
+    """Retorna o nível da linha a partir das classes (str ou lista) da sua primeira célula."""
+    if not classes:
+        return None
+    for name in classes.split() if isinstance(classes, str) else classes:
+        if name in LEVEL_CLASSES:
+            return LEVEL_CLASSES[name]
+    return None
+
+
+def _build_page(title, header_cells, data_rows):
+    """
+    Monta o resultado a partir das células já extraídas.
+
+    Args:
+        title (str | None): Texto do primeiro <h3> da página.
+        header_cells (list | None): Textos das células da primeira linha da tabela, ou None sem tabela.
+        data_rows (list): Pares (textos das células <td>, nível) das demais linhas.
+    """
+    title = title if title is not None else DEFAULT_TITLE
+    if header_cells is None:
+        return ParsedPage(title, None, [], [])
+
+    # Linhas sem células são ignoradas e as demais são limitadas ao número de cabeçalhos
+    data_rows = [(cells, level) for cells, level in data_rows if cells]
+    rows = [cells[:len(header_cells)] for cells, _ in data_rows]
+    levels = [level for _, level in data_rows]
+    return ParsedPage(title, header_cells, rows, levels)
+
+
+def _installed(module):
+    try:
+        return importlib.util.find_spec(module) is not None
+    except (ImportError, ValueError):  # pragma: no cover - instalação inconsistente
+        return False
+
+
+def _parse_selectolax(html):
+    from selectolax.lexbor import LexborHTMLParser
+
+    tree = LexborHTMLParser(html)
+    h3 = tree.css_first("h3")
+    title = h3.text().strip() if h3 is not None else None
+
+    table = tree.css_first("table.tabela") or tree.css_first("table")
+    if table is None:
+        return _build_page(title, None, [])
+
+    trs = table.css("tr")
+    if not trs:
+        return _build_page(title, [], [])
+    header_cells = [cell.text().strip() for cell in trs[0].css("th, td")]
+    body = trs[1:] if header_cells else trs
+    data_rows = []
+    for tr in body:
+        tds = tr.css("td")
+        level = _row_level(tds[0].attributes.get("class")) if tds else None
+        data_rows.append(([td.text().strip() for td in tds], level))
+    return _build_page(title, header_cells, data_rows)
+
+
+def _parse_lxml(html):
+    import lxml.html
+
+    root = lxml.html.fromstring(html)
+    title = None
+    first_table = None
+    table = None
+    # Uma única passada pelo documento localiza o título e a tabela de dados
+    for element in root.iter("h3", "table"):
+        if element.tag == "h3":
+            if title is None:
+                title = element.text_content().strip()
+        else:
+            if first_table is None:
+                first_table = element
+            if table is None and "tabela" in element.get("class", "").split():
+                table = element
+        if title is not None and table is not None:
+            break
+    table = table if table is not None else first_table
+    if table is None:
+        return _build_page(title, None, [])
+
+    header_cells = None
+    data_rows = []
+    for tr in table.iter("tr"):
+        if header_cells is None:
+            header_cells = [cell.text_content().strip() for cell in tr.iter("th", "td")]
+            if header_cells:
+                continue
+        tds = list(tr.iter("td"))
+        level = _row_level(tds[0].get("class")) if tds else None
+        data_rows.append(([td.text_content().strip() for td in tds], level))
+    return _build_page(title, header_cells if header_cells is not None else [], data_rows)
+
+
+def _parse_soup(html):
+    from bs4 import BeautifulSoup, SoupStrainer
+
+    # Somente os títulos e as tabelas são construídos na árvore
+    soup = BeautifulSoup(html, "html.parser", parse_only=SoupStrainer(["h3", "table"]))
+    h3 = soup.find("h3")
+    title = h3.get_text().strip() if h3 is not None else None
+
+    table = soup.find("table", class_="tabela") or soup.find("table")
+    if table is None:
+        return _build_page(title, None, [])
+
+    trs = table.find_all("tr")
+    if not trs:
+        return _build_page(title, [], [])
+    header_cells = [cell.get_text().strip() for cell in trs[0].find_all(["th", "td"])]
+    body = trs[1:] if header_cells else trs
+    data_rows = []
+    for tr in body:
+        tds = tr.find_all("td")
+        level = _row_level(tds[0].get("class")) if tds else None
+        data_rows.append(([td.get_text().strip() for td in tds], level))
+    return _build_page(title, header_cells, data_rows)
+
+
+BACKENDS = {"html.parser": _parse_soup}
+if _installed("lxml"):
+    BACKENDS["lxml"] = _parse_lxml
+if _installed("selectolax"):
+    BACKENDS["selectolax"] = _parse_selectolax
+
+
+def default_backend():
+    """
+    Retorna o backend padrão: o definido em EMBRAPA_PARSER ou o mais rápido disponível.
+    """
+    configured = os.environ.get("EMBRAPA_PARSER")
+    if configured in BACKENDS:
+        return configured
+    for name in ("selectolax", "lxml", "html.parser"):
+        if name in BACKENDS:
+            return name
+
+
+def parse_page(html, backend=None):
+    """
+    Extrai o título e a tabela de dados de uma página do site da Embrapa.
+
+    Args:
+        html (str | bytes): Conteúdo da página.
+        backend (str, optional): Nome do backend (selectolax, lxml ou html.parser).
+            Se None, usa default_backend().
+
+    Returns:
+        ParsedPage: Título, cabeçalhos (None se não houver tabela), células e níveis das linhas de dados.
+    """
+    return BACKENDS[backend or default_backend()](html)
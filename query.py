@@ -0,0 +1,214 @@
+"""
+Filtros, projeção, ordenação e paginação das linhas de uma tabela.
+
+Os parâmetros são aplicados às linhas já tipadas (models.Table), antes da serialização:
+
+    busca=alem                 primeira coluna (produto, país, cultivar) contendo o texto
+    nivel=item,total           apenas as linhas dos níveis informados (nivel=-total exclui o total)
+    min_quantidade=1000        coluna numérica >= 1000 (max_<coluna> para <=)
+    colunas=paises,valor       apenas as colunas informadas, na ordem informada
+    ordem=-valor               ordena pela coluna (prefixo "-" para ordem decrescente)
+    limite=10&deslocamento=20  paginação
+
+As colunas são indicadas pelo início do cabeçalho, sem diferenciar maiúsculas nem acentos
+("quantidade" corresponde a "Quantidade (Kg)" e "paises" a "Países").
+"""
+import unicodedata
+
+from models import ITEM, SUBITEM, TEXT, TOTAL, Row, Table
+
+LEVELS = (ITEM, SUBITEM, TOTAL)
+
+# Parâmetros de ordenação e paginação (não se aplicam a intervalos de anos)
+PAGING_PARAMS = ("ordem", "limite", "deslocamento")
+
+
+class QueryError(ValueError):
+    """Parâmetro de consulta inválido (resulta em uma resposta 400)."""
+
+
+def normalize(text):
+    """Converte o texto para minúsculas e remove os acentos."""
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).casefold().strip()
+
+
+def _non_negative_int(args, name):
+    value = args.get(name)
+    if value is None:
+        return None
+    if not value.isdigit():
+        raise QueryError(f"O parâmetro {name} deve ser um número inteiro não negativo")
+    return int(value)
+
+
+def _number(name, value):
+    try:
+        return float(value)
+    except ValueError:
+        raise QueryError(f"O parâmetro {name} deve ser numérico") from None
+
+
+class TableQuery:
+    """
+    Consulta sobre as linhas de uma tabela, criada a partir dos parâmetros da requisição.
+
+    Use TableQuery.from_args(request.args) e, para cada tabela, apply(table).
+    """
+
+    def __init__(self, search=None, levels=None, excluded_levels=None, bounds=(), columns=None,
+                 order=None, descending=False, limit=None, offset=0):
+        self.search = normalize(search) if search else None
+        self.levels = levels
+        self.excluded_levels = excluded_levels
+        self.bounds = list(bounds)
+        self.columns = columns
+        self.order = order
+        self.descending = descending
+        self.limit = limit
+        self.offset = offset
+
+    @classmethod
+    def from_args(cls, args):
+        """
+        Lê os parâmetros de consulta.
+
+        Args:
+            args (MultiDict): Parâmetros da requisição (request.args).
+
+        Returns:
+            TableQuery | None: Consulta, ou None se nenhum parâmetro foi informado.
+
+        Raises:
+            QueryError: Se algum parâmetro for inválido.
+        """
+        levels = excluded_levels = None
+        if args.get("nivel"):
+            names = args["nivel"].split(",")
+            if not {name.lstrip("-") for name in names} <= set(LEVELS):
+                raise QueryError(f"O parâmetro nivel deve conter apenas {', '.join(LEVELS)}")
+            levels = {name for name in names if not name.startswith("-")} or None
+            excluded_levels = {name[1:] for name in names if name.startswith("-")} or None
+
+        bounds = []
+        for name, value in args.items():
+            if name.startswith("min_") or name.startswith("max_"):
+                bounds.append((name[4:], name[:3], _number(name, value)))
+
+        columns = None
+        if args.get("colunas"):
+            columns = [column for column in args["colunas"].split(",") if column.strip()]
+
+        order = args.get("ordem") or None
+        descending = bool(order) and order.startswith("-")
+        if descending:
+            order = order[1:]
+
+        query = cls(
+            search=args.get("busca"),
+            levels=levels,
+            excluded_levels=excluded_levels,
+            bounds=bounds,
+            columns=columns,
+            order=order,
+            descending=descending,
+            limit=_non_negative_int(args, "limite"),
+            offset=_non_negative_int(args, "deslocamento") or 0,
+        )
+        return query if query.is_active else None
+
+    @property
+    def is_active(self):
+        return bool(
+            self.search or self.levels or self.excluded_levels or self.bounds or self.columns or self.order
+            or self.limit is not None or self.offset
+        )
+
+    @property
+    def is_paged(self):
+        return self.limit is not None or bool(self.offset)
+
+    def apply(self, table):
+        """
+        Aplica os filtros, a ordenação, a paginação e a projeção a uma tabela.
+
+        Returns:
+            tuple: (models.Table com as linhas selecionadas, total de linhas após os filtros).
+
+        Raises:
+            QueryError: Se uma coluna informada não existir na tabela.
+        """
+        if table.headers is None:
+            return table, 0
+
+        rows = table.rows
+        if self.search:
+            rows = [row for row in rows if row.values and self.search in normalize(str(row.values[0]))]
+        if self.levels:
+            rows = [row for row in rows if row.level in self.levels]
+        if self.excluded_levels:
+            rows = [row for row in rows if row.level not in self.excluded_levels]
+        for name, kind, limit in self.bounds:
+            index = self._numeric_column(table, name)
+            if kind == "min":
+                rows = [row for row in rows if _value(row, index) is not None and _value(row, index) >= limit]
+            else:
+                rows = [row for row in rows if _value(row, index) is not None and _value(row, index) <= limit]
+
+        if self.order:
+            index = resolve_column(table.headers, self.order)
+            present = [row for row in rows if _value(row, index) is not None]
+            missing = [row for row in rows if _value(row, index) is None]
+            if table.types[index] == TEXT:
+                key = lambda row: normalize(row.values[index])
+            else:
+                key = lambda row: row.values[index]
+            # Valores ausentes ficam sempre no final
+            rows = sorted(present, key=key, reverse=self.descending) + missing
+
+        total = len(rows)
+        end = None if self.limit is None else self.offset + self.limit
+        rows = rows[self.offset:end]
+
+        headers, types = table.headers, table.types
+        if self.columns:
+            indexes = [resolve_column(table.headers, column) for column in self.columns]
+            headers = [table.headers[i] for i in indexes]
+            types = [table.types[i] for i in indexes]
+            rows = [Row(tuple(_value(row, i) for i in indexes), row.level) for row in rows]
+
+        return Table(table.title, headers, types, list(rows), table.source_url, table.fetched_at), total
+
+    def pagination(self, total):
+        """Metadados da paginação para a resposta."""
+        end = total if self.limit is None else min(total, self.offset + self.limit)
+        return {
+            "offset": self.offset,
+            "limit": self.limit,
+            "total": total,
+            "next_offset": end if end < total else None,
+        }
+
+    def _numeric_column(self, table, name):
+        index = resolve_column(table.headers, name)
+        if table.types[index] == TEXT:
+            raise QueryError(f"A coluna '{table.headers[index]}' não é numérica")
+        return index
+
+
+def _value(row, index):
+    return row.values[index] if index < len(row.values) else None
+
+
+def resolve_column(headers, name):
+    """Encontra a coluna pelo nome completo ou pelo início do cabeçalho (sem acentos)."""
+    wanted = normalize(name)
+    normalized = [normalize(header) for header in headers]
+    if wanted in normalized:
+        return normalized.index(wanted)
+    matches = [i for i, header in enumerate(normalized) if wanted and header.startswith(wanted)]
+    if len(matches) == 1:
+        return matches[0]
+    if not matches:
+        raise QueryError(f"Coluna inexistente: '{name}'")
+    raise QueryError(f"Coluna ambígua: '{name}'")
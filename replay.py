@@ -0,0 +1,48 @@
+"""
+Modo de reprodução: cliente que lê as páginas do arquivo local (archive.HtmlArchive) em
+vez do site da Embrapa.
+
+Fica separado de archive.py porque depende do requests (os erros do modo de reprodução são
+tratados como erros de acesso ao site), que não é importado enquanto o site não é acessado.
+"""
+import threading
+
+import requests
+
+
+class SnapshotNotFoundError(requests.exceptions.RequestException):
+    """Erro lançado no modo de reprodução quando a página não está no arquivo."""
+
+
+class ReplayClient:
+    """
+    Substituto do EmbrapaClient que lê as páginas do arquivo, sem acessar a rede.
+
+    Retorna a captura mais recente de cada URL e lança SnapshotNotFoundError (um
+    requests.exceptions.RequestException, tratado como erro de acesso ao site) para
+    URLs que nunca foram capturadas.
+    """
+
+    def __init__(self, archive):
+        self.archive = archive
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0}
+
+    def get(self, url):
+        snapshot = self.archive.latest(url)
+        with self._lock:
+            self._stats["requests"] += 1
+            if snapshot is None:
+                self._stats["errors"] += 1
+        if snapshot is None:
+            raise SnapshotNotFoundError(f"página não encontrada no arquivo: {url}")
+        return snapshot
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mode"] = "replay"
+        return stats
+
+    def close(self):
+        pass
@@ -0,0 +1,211 @@
+"""
+Agendador em segundo plano para tarefas periódicas (pré-aquecimento do cache e
+atualização dos dados do site da Embrapa).
+
+As tarefas rodam em sequência em uma única thread. Tarefas exclusivas rodam em apenas
+um processo por vez: com vários workers do gunicorn, o processo que obtiver o lock
+(arquivo com fcntl.flock) executa as tarefas exclusivas e os demais apenas as comuns.
+"""
+import os
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: sem coordenação entre processos
+    fcntl = None
+
+
+class RateLimiter:
+    """
+    Garante um intervalo mínimo entre requisições (limite de taxa contra o site da Embrapa).
+    """
+
+    def __init__(self, min_interval):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self, stop_event=None):
+        """
+        Aguarda a vez da próxima requisição.
+
+        Returns:
+            bool: False se stop_event foi sinalizado durante a espera.
+        """
+        with self._lock:
+            now = time.monotonic()
+            delay = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.min_interval
+        if delay <= 0:
+            return stop_event is None or not stop_event.is_set()
+        if stop_event is None:
+            time.sleep(delay)
+            return True
+        return not stop_event.wait(delay)
+
+
+class RequestCounter:
+    """Conta os acessos a cada consulta até serem gravados no armazenamento local."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = Counter()
+
+    def add(self, key):
+        with self._lock:
+            self._counts[key] += 1
+
+    def drain(self):
+        """Retorna as contagens acumuladas e as zera."""
+        with self._lock:
+            counts, self._counts = self._counts, Counter()
+        return dict(counts)
+
+
+class Job:
+    """
+    Tarefa do agendador.
+
+    Args:
+        name (str): Nome exibido no estado do agendador.
+        func (callable): Função executada, recebe o evento de parada e retorna um resumo (dict).
+        interval (float | None): Intervalo em segundos entre execuções; None executa uma única vez.
+        run_at_start (bool): Executa assim que o agendador inicia (senão, após o primeiro intervalo).
+        exclusive (bool): Executa apenas no processo que detém o lock entre processos.
+    """
+
+    def __init__(self, name, func, interval=None, run_at_start=True, exclusive=False):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.run_at_start = run_at_start
+        self.exclusive = exclusive
+        self.next_run = None
+        self.runs = 0
+        self.errors = 0
+        self.last_start = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+
+    def status(self):
+        return {
+            "interval": self.interval,
+            "exclusive": self.exclusive,
+            "runs": self.runs,
+            "errors": self.errors,
+            "last_start": self.last_start.isoformat() if self.last_start else None,
+            "last_duration": self.last_duration,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "next_run_in": (
+                round(max(0.0, self.next_run - time.monotonic()), 1) if self.next_run is not None else None
+            ),
+        }
+
+
+class Scheduler:
+    """
+    Executa as tarefas em uma thread daemon até stop() ser chamado.
+
+    Args:
+        jobs (list): Tarefas (Job).
+        lock_path (str, optional): Arquivo de lock para as tarefas exclusivas. Sem ele, o
+            processo sempre executa as tarefas exclusivas.
+    """
+
+    # Intervalo máximo entre verificações, para tentar novamente obter o lock
+    POLL_INTERVAL = 30.0
+
+    def __init__(self, jobs, lock_path=None):
+        self.jobs = list(jobs)
+        self.lock_path = lock_path
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+        self._status_lock = threading.Lock()
+
+    def start(self):
+        now = time.monotonic()
+        for job in self.jobs:
+            job.next_run = now if job.run_at_start else now + (job.interval or 0)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="agendador", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        """Sinaliza a parada, aguarda a tarefa em andamento (até timeout) e libera o lock."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    @property
+    def is_leader(self):
+        return self.lock_path is None or self._lock_file is not None
+
+    def _try_lock(self):
+        if self.is_leader:
+            return True
+        if fcntl is None:
+            self.lock_path = None
+            return True
+        directory = os.path.dirname(self.lock_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        lock_file = open(self.lock_path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            leader = self._try_lock()
+            now = time.monotonic()
+            for job in self.jobs:
+                if self._stop.is_set():
+                    return
+                if job.next_run is None or job.next_run > now or (job.exclusive and not leader):
+                    continue
+                self._run_job(job)
+                job.next_run = time.monotonic() + job.interval if job.interval else None
+            pending = [
+                job.next_run for job in self.jobs
+                if job.next_run is not None and (leader or not job.exclusive)
+            ]
+            delay = min(pending) - time.monotonic() if pending else self.POLL_INTERVAL
+            self._stop.wait(min(max(delay, 0.0), self.POLL_INTERVAL))
+
+    def _run_job(self, job):
+        start = time.monotonic()
+        with self._status_lock:
+            job.last_start = datetime.now(timezone.utc)
+        try:
+            result, error = job.func(self._stop), None
+        except Exception as e:
+            result, error = None, str(e)
+        with self._status_lock:
+            job.runs += 1
+            job.last_duration = round(time.monotonic() - start, 3)
+            job.last_result = result
+            job.last_error = error
+            if error is not None:
+                job.errors += 1
+
+    def status(self):
+        """Retorna o estado do agendador e o resultado e a duração da última execução de cada tarefa."""
+        with self._status_lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "leader": self.is_leader,
+                "jobs": {job.name: job.status() for job in self.jobs},
+            }
@@ -0,0 +1,488 @@
+"""
+Nível compartilhado do cache de tabelas, entre workers, contêineres e reinícios.
+
+O cache em memória (cache.ResponseCache) é de cada processo: com vários workers do
+gunicorn, cada um obteria e extrairia as mesmas páginas. Com um nível compartilhado, a
+tabela carregada por um worker fica disponível para os demais, e sobrevive ao reinício
+da API. Há dois backends:
+
+    RedisBackend    servidor com o protocolo do Redis (RESP), por um cliente mínimo
+                    sem dependências (RespClient)
+    DiskBackend     banco SQLite com leitura mapeada em memória, em um volume
+                    compartilhado (ex.: /app/dados no docker-compose)
+
+As tabelas são gravadas em JSON comprimido com zlib. O conteúdo lido do backend é tratado
+como não confiável (o Redis é acessado pela rede): o JSON é validado antes de virar uma
+tabela, e uma entrada inválida é tratada como ausente. Falhas do backend nunca interrompem
+uma requisição: a consulta é tratada como ausente e o backend deixa de ser consultado por
+alguns segundos.
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from urllib.parse import unquote, urlsplit
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+from export import dumps_json
+from models import Row, Table
+
+# Versão do formato das entradas, parte das chaves: uma mudança no formato não lê entradas antigas
+FORMAT_VERSION = 2
+
+
+# Tamanho máximo de uma entrada após a descompressão (limita entradas maliciosas)
+MAX_ENTRY_BYTES = 32 * 1024 * 1024
+
+_CELL_TYPES = frozenset([str, int, float, type(None)])
+
+
+def encode_table(table):
+    """
+    Serializa uma tabela (models.Table) para o cache compartilhado: JSON comprimido com zlib,
+    com as colunas, os níveis das linhas, o instante da obtenção e o hash do conteúdo (para
+    que quem a lê não precise recalculá-lo).
+    """
+    fetched_at = table.fetched_at.timestamp() if table.fetched_at is not None else None
+    return zlib.compress(dumps_json([
+        table.title,
+        table.headers,
+        table.types,
+        [row.values for row in table.rows],
+        [row.level for row in table.rows],
+        table.source_url,
+        fetched_at,
+        table.content_hash(),
+    ]), 1)
+
+
+def decode_table(data):
+    """
+    Recria a tabela serializada por encode_table.
+
+    As entradas vêm de um servidor na rede (Redis) e são validadas antes do uso: o tamanho
+    descomprimido é limitado e a estrutura e os tipos de cada campo são conferidos.
+
+    Raises:
+        ValueError: Se a entrada estiver corrompida ou não tiver o formato esperado.
+    """
+    decompressor = zlib.decompressobj()
+    raw = decompressor.decompress(data, MAX_ENTRY_BYTES)
+    if decompressor.unconsumed_tail:
+        raise ValueError("entrada do cache compartilhado maior que o limite")
+    payload = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    if not isinstance(payload, list) or len(payload) != 8:
+        raise ValueError("entrada do cache compartilhado com formato inválido")
+    title, headers, types, values, levels, source_url, fetched_at, content_hash = payload
+    if not (
+        _is_optional(title, str)
+        and _is_text_list(headers)
+        and _is_text_list(types)
+        and isinstance(values, list)
+        and isinstance(levels, list)
+        and len(values) == len(levels)
+        and _is_optional(source_url, str)
+        and _is_optional(fetched_at, (int, float))
+        and isinstance(content_hash, str)
+    ):
+        raise ValueError("entrada do cache compartilhado com formato inválido")
+    rows = []
+    for row_values, level in zip(values, levels):
+        if type(row_values) is not list or not _CELL_TYPES.issuperset(map(type, row_values)) or not (
+            level is None or type(level) is str
+        ):
+            raise ValueError("entrada do cache compartilhado com formato inválido")
+        rows.append(Row(tuple(row_values), level))
+    if fetched_at is not None:
+        fetched_at = datetime.fromtimestamp(fetched_at, timezone.utc)
+    table = Table(title, headers, types, rows, source_url, fetched_at)
+    table._hash = content_hash
+    return table
+
+
+def _is_optional(value, types):
+    return value is None or (isinstance(value, types) and not isinstance(value, bool))
+
+
+def _is_text_list(value):
+    return value is None or (isinstance(value, list) and all(isinstance(item, str) for item in value))
+
+
+class RespError(Exception):
+    """Resposta de erro do servidor Redis."""
+
+
+class RespClient:
+    """
+    Cliente mínimo do protocolo do Redis (RESP2), com um pool de conexões.
+
+    Permite enviar vários comandos em uma única ida e volta (pipeline).
+
+    Args:
+        host (str): Endereço do servidor.
+        port (int): Porta do servidor.
+        db (int): Banco selecionado em cada conexão.
+        password (str, optional): Senha (comando AUTH).
+        timeout (float): Timeout de conexão e de leitura (segundos).
+    """
+
+    def __init__(self, host="127.0.0.1", port=6379, db=0, password=None, timeout=0.5):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.password = password
+        self.timeout = timeout
+        self._pool = []
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url, timeout=0.5):
+        """Cria o cliente a partir de uma URL redis://[:senha@]host[:porta][/banco]."""
+        parts = urlsplit(url)
+        db = parts.path.strip("/")
+        password = unquote(parts.password) if parts.password else None
+        return cls(parts.hostname or "127.0.0.1", parts.port or 6379, int(db or 0), password, timeout)
+
+    def execute(self, *commands):
+        """
+        Envia os comandos em sequência e retorna as respostas, na mesma ordem.
+
+        Args:
+            commands (list): Cada comando é uma lista de argumentos (str, bytes ou números).
+
+        Returns:
+            list: Respostas (bytes, int, list ou None).
+
+        Raises:
+            OSError: Em caso de erro de conexão ou timeout.
+            RespError: Se o servidor responder com erro.
+        """
+        conn = self._acquire()
+        try:
+            sock, reader = conn
+            sock.sendall(b"".join(_encode_command(command) for command in commands))
+            replies = [_read_reply(reader) for _ in commands]
+        except BaseException:
+            sock.close()
+            raise
+        self._release(conn)
+        for reply in replies:
+            if isinstance(reply, RespError):
+                raise reply
+        return replies
+
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, []
+        for sock, _ in pool:
+            sock.close()
+
+    def _acquire(self):
+        with self._lock:
+            if self._pool:
+                return self._pool.pop()
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        conn = (sock, sock.makefile("rb"))
+        setup = []
+        if self.password:
+            setup.append(["AUTH", self.password])
+        if self.db:
+            setup.append(["SELECT", self.db])
+        if setup:
+            sock.sendall(b"".join(_encode_command(command) for command in setup))
+            for _ in setup:
+                reply = _read_reply(conn[1])
+                if isinstance(reply, RespError):
+                    sock.close()
+                    raise reply
+        return conn
+
+    def _release(self, conn):
+        with self._lock:
+            self._pool.append(conn)
+
+
+def _encode_command(args):
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def _read_reply(reader):
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("conexão com o servidor Redis encerrada")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload
+    if kind == b"-":
+        return RespError(payload.decode("utf-8", errors="replace"))
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        size = int(payload)
+        if size < 0:
+            return None
+        data = reader.read(size + 2)
+        if len(data) != size + 2:
+            raise ConnectionError("conexão com o servidor Redis encerrada")
+        return data[:-2]
+    if kind == b"*":
+        size = int(payload)
+        return None if size < 0 else [_read_reply(reader) for _ in range(size)]
+    raise ConnectionError(f"resposta inválida do servidor Redis: {line[:20]!r}")
+
+
+class RedisBackend:
+    """Backend em um servidor Redis (ou compatível), com o TTL das entradas no próprio servidor."""
+
+    name = "redis"
+    errors = (OSError, RespError)
+
+    def __init__(self, url, timeout=0.5):
+        self.client = RespClient.from_url(url, timeout)
+
+    def get(self, key):
+        """Retorna (dados, TTL restante em segundos ou None) ou None se a chave não existir."""
+        data, pttl = self.client.execute(["GET", key], ["PTTL", key])
+        if data is None:
+            return None
+        return data, pttl / 1000 if pttl >= 0 else None
+
+    def set(self, key, data, ttl=None):
+        if ttl:
+            self.client.execute(["SET", key, data, "PX", max(1, int(ttl * 1000))])
+        else:
+            self.client.execute(["SET", key, data])
+
+    def clear(self, prefix):
+        cursor = b"0"
+        while True:
+            cursor, keys = self.client.execute(["SCAN", cursor, "MATCH", prefix + "*", "COUNT", 500])[0]
+            if keys:
+                self.client.execute(["DEL", *keys])
+            if cursor == b"0":
+                return
+
+    def stats(self):
+        return {"backend": self.name, "server": f"{self.client.host}:{self.client.port}/{self.client.db}"}
+
+    def close(self):
+        self.client.close()
+
+
+DISK_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entradas (
+    chave TEXT PRIMARY KEY,
+    valor BLOB NOT NULL,
+    expira_em REAL,
+    gravado_em REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entradas_gravado_em ON entradas (gravado_em);
+"""
+
+
+class DiskBackend:
+    """
+    Backend em um banco SQLite (WAL, leitura mapeada em memória), compartilhado pelos
+    processos que acessam o mesmo arquivo.
+
+    Entradas expiradas são removidas periodicamente, assim como as mais antigas quando o
+    número de entradas passa de ``max_items``. Cada thread usa a sua própria conexão.
+    """
+
+    name = "disco"
+    errors = (OSError, sqlite3.Error)
+
+    # Gravações entre duas limpezas das entradas expiradas e excedentes
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, max_items=10000):
+        self.path = path
+        self.max_items = max_items
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connect().executescript(DISK_SCHEMA)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        """Retorna (dados, TTL restante em segundos ou None) ou None se a chave não existir ou tiver expirado."""
+        row = self._connect().execute("SELECT valor, expira_em FROM entradas WHERE chave = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        data, expires_at = row
+        if expires_at is None:
+            return data, None
+        remaining = expires_at - time.time()
+        return (data, remaining) if remaining > 0 else None
+
+    def set(self, key, data, ttl=None):
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entradas (chave, valor, expira_em, gravado_em) VALUES (?, ?, ?, ?)",
+                (key, data, now + ttl if ttl else None, now),
+            )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._prune(conn, now)
+
+    def _prune(self, conn, now):
+        with conn:
+            conn.execute("DELETE FROM entradas WHERE expira_em IS NOT NULL AND expira_em <= ?", (now,))
+            conn.execute(
+                "DELETE FROM entradas WHERE chave IN "
+                "(SELECT chave FROM entradas ORDER BY gravado_em DESC LIMIT -1 OFFSET ?)",
+                (self.max_items,),
+            )
+
+    def clear(self, prefix):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM entradas WHERE substr(chave, 1, ?) = ?", (len(prefix), prefix))
+
+    def stats(self):
+        items = self._connect().execute("SELECT COUNT(*) FROM entradas").fetchone()[0]
+        return {"backend": self.name, "path": self.path, "items": items, "max_items": self.max_items}
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_backend(spec, max_items=10000, timeout=0.5):
+    """
+    Cria o backend a partir da configuração (CACHE_COMPARTILHADO).
+
+    Args:
+        spec (str): URL redis://... ou caminho do banco SQLite.
+        max_items (int): Máximo de entradas no banco SQLite.
+        timeout (float): Timeout das operações no servidor Redis (segundos).
+    """
+    if spec.startswith(("redis://", "rediss://")):
+        if spec.startswith("rediss://"):
+            raise ValueError("Conexões TLS (rediss://) não são suportadas")
+        return RedisBackend(spec, timeout)
+    return DiskBackend(spec, max_items)
+
+
+class SharedCache:
+    """
+    Nível compartilhado do cache de respostas: converte as chaves e os valores e isola as
+    falhas do backend.
+
+    Args:
+        backend (RedisBackend | DiskBackend): Onde as entradas são gravadas.
+        retry_interval (float): Após uma falha, segundos sem consultar o backend.
+    """
+
+    def __init__(self, backend, retry_interval=5):
+        self.backend = backend
+        self.retry_interval = retry_interval
+        self.prefix = f"vitibrasil:v{FORMAT_VERSION}:"
+        self._down_until = 0.0
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "sets": 0, "errors": 0, "skipped": 0}
+
+    def _key(self, key):
+        return self.prefix + "/".join("" if part is None else str(part) for part in key)
+
+    def get(self, key):
+        """
+        Consulta uma entrada.
+
+        Returns:
+            tuple: (valor, TTL restante em segundos ou None), ou None se a entrada não existir
+                ou o backend estiver indisponível.
+        """
+        if not self._available():
+            return None
+        try:
+            found = self.backend.get(self._key(key))
+            if found is None:
+                self._count("misses")
+                return None
+            data, ttl = found
+            value = decode_table(data)
+        except self.backend.errors:
+            self._failed()
+            return None
+        except (ValueError, TypeError, RecursionError, zlib.error):
+            # Entrada corrompida ou de outro formato: tratada como ausente
+            self._count("errors")
+            return None
+        self._count("hits")
+        return value, ttl
+
+    def set(self, key, value, ttl=None):
+        if not self._available():
+            return
+        try:
+            self.backend.set(self._key(key), encode_table(value), ttl)
+        except self.backend.errors:
+            self._failed()
+            return
+        self._count("sets")
+
+    def clear(self):
+        try:
+            self.backend.clear(self.prefix)
+        except self.backend.errors:
+            self._failed()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        try:
+            stats.update(self.backend.stats())
+        except self.backend.errors:
+            stats["backend"] = self.backend.name
+        stats["available"] = time.monotonic() >= self._down_until
+        return stats
+
+    def close(self):
+        self.backend.close()
+
+    def _available(self):
+        if time.monotonic() < self._down_until:
+            self._count("skipped")
+            return False
+        return True
+
+    def _failed(self):
+        with self._lock:
+            self._stats["errors"] += 1
+            self._down_until = time.monotonic() + self.retry_interval
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
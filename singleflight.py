@@ -0,0 +1,134 @@
+"""
+Coalescência de requisições (single-flight): chamadas concorrentes com a mesma chave
+compartilham uma única execução.
+
+Dentro de um processo, a primeira thread executa a função e as demais aguardam o seu
+resultado. Entre processos (workers do gunicorn), a execução é protegida por um lock
+em arquivo (fcntl.flock) por chave: o worker que precisou esperar pelo lock consulta
+primeiro o armazenamento compartilhado (função recheck) antes de executar a função.
+"""
+import hashlib
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: coalescência apenas dentro do processo
+    fcntl = None
+
+
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Agrupa chamadas concorrentes com a mesma chave em uma única execução.
+
+    Args:
+        lock_dir (str, optional): Diretório dos arquivos de lock entre processos. Sem ele,
+            a coalescência é feita apenas entre as threads do processo.
+        lock_timeout (float): Tempo máximo (segundos) de espera pelo lock de outro processo;
+            depois disso a função é executada mesmo assim.
+    """
+
+    # Intervalo entre as tentativas de obter o lock de outro processo
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, lock_dir=None, lock_timeout=30.0):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.lock_timeout = lock_timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {"calls": 0, "executions": 0, "shared": 0, "rechecked": 0, "lock_timeouts": 0}
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+    def do(self, key, func, recheck=None):
+        """
+        Executa func() uma única vez para as chamadas concorrentes com a mesma chave.
+
+        Args:
+            key (str): Chave da chamada (ex.: a URL da página no site da Embrapa).
+            func (callable): Função sem argumentos que produz o valor.
+            recheck (callable, optional): Chamada após esperar pelo lock de outro processo;
+                se retornar um valor diferente de None, ele é usado no lugar de func().
+
+        Returns:
+            Valor produzido por func() (ou por recheck()).
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self._stats["shared"] += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = self._run(key, func, recheck)
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def _run(self, key, func, recheck):
+        if not self.lock_dir:
+            return self._execute(func)
+
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()
+        with open(os.path.join(self.lock_dir, f"{digest}.lock"), "a") as lock_file:
+            waited = False
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except OSError:
+                    if time.monotonic() >= deadline:
+                        self._count("lock_timeouts")
+                        return self._execute(func)
+                    waited = True
+                    time.sleep(self.POLL_INTERVAL)
+            try:
+                if waited and recheck is not None:
+                    value = recheck()
+                    if value is not None:
+                        self._count("rechecked")
+                        return value
+                return self._execute(func)
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _execute(self, func):
+        self._count("executions")
+        return func()
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def stats(self):
+        """Retorna os contadores: chamadas, execuções, chamadas atendidas por outra thread ou processo."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["cross_process"] = self.lock_dir is not None
+        return stats
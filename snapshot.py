@@ -0,0 +1,243 @@
+"""
+Snapshot das tabelas armazenadas em um arquivo binário, mapeado em memória na inicialização.
+
+O snapshot é gerado a partir do armazenamento local (após a ingestão, por exemplo na
+construção da imagem Docker) e permite que um processo recém-iniciado sirva as tabelas sem
+acessar o site da Embrapa e sem carregar as bibliotecas de acesso e extração.
+
+Formato do arquivo (inteiros little-endian):
+
+    cabeçalho   "VITISNAP", versão do formato, número de tabelas, posição e tamanho do
+                índice, instante da geração e última versão de tabela do armazenamento
+                local (storage.DataStore.last_seq) incluída no snapshot
+    tabelas     cada tabela serializada com pack_table (marshal), em sequência
+    índice      marshal de {(categoria, subcategoria, ano): (posição, tamanho)}
+
+O arquivo é aberto com mmap: cada tabela é lida diretamente das páginas mapeadas, sem
+cópia para um buffer do processo, e essas páginas ficam no cache do sistema operacional,
+compartilhadas entre os workers do gunicorn.
+
+As tabelas regravadas no armazenamento local depois da geração (versões posteriores à do
+cabeçalho, por exemplo após ``python ingestao.py --replay --sobrescrever``) são descartadas
+do snapshot com discard() e passam a ser lidas do armazenamento (ver app.get_stored_table).
+
+O marshal não é seguro para dados malformados ou maliciosos: o snapshot deve ser gerado
+localmente (ex.: na construção da imagem) e não pode vir de uma fonte não confiável. O cache
+compartilhado, que pode estar na rede, usa um formato validado (shared_cache.encode_table).
+
+Uso:
+    python snapshot.py [--banco dados/vitibrasil.db] [--saida dados/snapshot.bin]
+"""
+import argparse
+import marshal
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+from models import Row, Table
+from storage import DataStore
+
+MAGIC = b"VITISNAP"
+
+# Versão do formato: muda junto com o cabeçalho, o índice ou pack_table
+FORMAT_VERSION = 2
+
+HEADER = struct.Struct("<8sIIQQdQ")
+
+
+class SnapshotFormatError(ValueError):
+    """Erro lançado quando o arquivo não é um snapshot ou tem outra versão do formato."""
+
+
+def pack_table(table):
+    """
+    Serializa uma tabela (models.Table) em bytes com marshal: colunas, níveis das linhas,
+    instante da obtenção e hash do conteúdo (para que quem a lê não precise recalculá-lo).
+    """
+    fetched_at = table.fetched_at.timestamp() if table.fetched_at is not None else None
+    return marshal.dumps((
+        table.title,
+        table.headers,
+        table.types,
+        [row.values for row in table.rows],
+        [row.level for row in table.rows],
+        table.source_url,
+        fetched_at,
+        table.content_hash(),
+    ))
+
+
+def unpack_table(data):
+    """Recria a tabela serializada por pack_table (data pode ser um memoryview)."""
+    title, headers, types, values, levels, source_url, fetched_at, content_hash = marshal.loads(data)
+    rows = [Row(row_values, level) for row_values, level in zip(values, levels)]
+    if fetched_at is not None:
+        fetched_at = datetime.fromtimestamp(fetched_at, timezone.utc)
+    table = Table(title, headers, types, rows, source_url, fetched_at)
+    table._hash = content_hash
+    return table
+
+
+def build(store, path):
+    """
+    Grava o snapshot com todas as tabelas do armazenamento local.
+
+    O arquivo é escrito em um temporário no mesmo diretório e substituído de uma vez, de
+    modo que processos em execução continuam com o snapshot que já mapearam.
+
+    Args:
+        store (storage.DataStore): Armazenamento local.
+        path (str): Caminho do snapshot.
+
+    Returns:
+        dict: Número de tabelas e tamanho do arquivo (bytes).
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    index = {}
+    # Lida antes das tabelas: uma tabela regravada durante a geração fica com versão posterior
+    version = store.last_seq()
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(b"\0" * HEADER.size)
+            for category, year, subcategory in store.list_tables():
+                table = store.get_table(category, year, subcategory)
+                if table is None:
+                    continue
+                data = pack_table(table)
+                index[(category, subcategory or "", int(year))] = (file.tell(), len(data))
+                file.write(data)
+            index_offset = file.tell()
+            index_data = marshal.dumps(index)
+            file.write(index_data)
+            file.seek(0)
+            file.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(index), index_offset, len(index_data), time.time(), version))
+            file.flush()
+            os.fsync(file.fileno())
+        # mkstemp cria o arquivo só com permissão para o dono; os workers podem usar outro usuário
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return {"tables": len(index), "bytes": os.path.getsize(path)}
+
+
+class TableSnapshot:
+    """
+    Snapshot das tabelas mapeado em memória (somente leitura).
+
+    Args:
+        path (str): Caminho do arquivo gerado por build().
+
+    Raises:
+        OSError: Se o arquivo não puder ser aberto.
+        SnapshotFormatError: Se o arquivo não for um snapshot desta versão do formato.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size < HEADER.size:
+                raise SnapshotFormatError(f"arquivo de snapshot truncado: {path}")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, count, index_offset, index_length, created_at, store_version = HEADER.unpack_from(self._mmap, 0)
+            if magic != MAGIC:
+                raise SnapshotFormatError(f"arquivo não é um snapshot: {path}")
+            if version != FORMAT_VERSION:
+                raise SnapshotFormatError(f"versão do snapshot {version} diferente da esperada ({FORMAT_VERSION})")
+            self._index = marshal.loads(self._mmap[index_offset:index_offset + index_length])
+            if len(self._index) != count:
+                raise SnapshotFormatError(f"índice do snapshot incompleto: {path}")
+        except (SnapshotFormatError, ValueError, EOFError, struct.error) as e:
+            self._mmap.close()
+            if isinstance(e, SnapshotFormatError):
+                raise
+            raise SnapshotFormatError(f"snapshot corrompido: {path}") from e
+        self._view = memoryview(self._mmap)
+        self.created_at = datetime.fromtimestamp(created_at, timezone.utc)
+        # Última versão do armazenamento local incluída no snapshot
+        self.version = store_version
+        self._outdated = set()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def __len__(self):
+        return len(self._index)
+
+    def discard(self, tables):
+        """
+        Descarta tabelas regravadas no armazenamento local depois da geração do snapshot.
+
+        Args:
+            tables (iterable): Tuplas (categoria, ano, subcategoria).
+        """
+        keys = {(category, subcategory or "", int(year)) for category, year, subcategory in tables}
+        with self._lock:
+            self._outdated.update(keys & self._index.keys())
+
+    def get_table(self, category, year, subcategory=None):
+        """
+        Lê uma tabela do snapshot.
+
+        Returns:
+            models.Table | None: A tabela, ou None se ela não estiver no snapshot ou tiver
+                sido descartada.
+        """
+        key = (category, subcategory or "", int(year))
+        entry = self._index.get(key) if key not in self._outdated else None
+        with self._lock:
+            self._stats["hits" if entry is not None else "misses"] += 1
+        if entry is None:
+            return None
+        offset, length = entry
+        return unpack_table(self._view[offset:offset + length])
+
+    def stats(self):
+        """Retorna o arquivo, a data de geração, o número de tabelas e os acessos."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["outdated"] = len(self._outdated)
+        stats.update(
+            path=self.path,
+            created_at=self.created_at.isoformat(),
+            version=self.version,
+            tables=len(self._index),
+            bytes=len(self._mmap),
+        )
+        return stats
+
+    def close(self):
+        self._view.release()
+        self._mmap.close()
+
+
+def main():
+    default_db = os.environ.get("EMBRAPA_DB_PATH", os.path.join("dados", "vitibrasil.db"))
+    parser = argparse.ArgumentParser(description="Gera o snapshot das tabelas do armazenamento local")
+    parser.add_argument("--banco", default=default_db, help="Banco SQLite do armazenamento local")
+    parser.add_argument(
+        "--saida",
+        default=os.environ.get("EMBRAPA_SNAPSHOT", os.path.join(os.path.dirname(default_db), "snapshot.bin")),
+        help="Arquivo do snapshot",
+    )
+    args = parser.parse_args()
+
+    if not os.path.exists(args.banco):
+        parser.error(f"armazenamento local não encontrado: {args.banco} (execute python ingestao.py antes)")
+    started = time.perf_counter()
+    summary = build(DataStore(args.banco), args.saida)
+    print(
+        f"Snapshot gravado em {args.saida}: {summary['tables']} tabelas, "
+        f"{summary['bytes'] / 1024:.0f} KB ({time.perf_counter() - started:.1f}s)"
+    )
+
+
+if __name__ == "__main__":
+    main()
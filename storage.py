@@ -0,0 +1,545 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+import aggregates
+from changes import diff_tables
+from models import Row, Table
+from parsing import ParsedPage
+
+# Versão do esquema, registrada em PRAGMA user_version
+SCHEMA_VERSION = 5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tabelas (
+    id INTEGER PRIMARY KEY,
+    categoria TEXT NOT NULL,
+    subcategoria TEXT NOT NULL DEFAULT '',
+    ano INTEGER NOT NULL,
+    titulo TEXT,
+    cabecalhos TEXT NOT NULL,
+    tipos TEXT NOT NULL,
+    source_url TEXT,
+    atualizado_em TEXT NOT NULL,
+    hash_conteudo TEXT,
+    hash_html TEXT,
+    UNIQUE (categoria, subcategoria, ano)
+);
+CREATE INDEX IF NOT EXISTS idx_tabelas_ano ON tabelas (ano, categoria);
+
+CREATE TABLE IF NOT EXISTS linhas (
+    tabela_id INTEGER NOT NULL REFERENCES tabelas (id) ON DELETE CASCADE,
+    posicao INTEGER NOT NULL,
+    produto TEXT,
+    nivel TEXT,
+    valores TEXT NOT NULL,
+    PRIMARY KEY (tabela_id, posicao)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_linhas_produto ON linhas (produto, tabela_id);
+
+CREATE TABLE IF NOT EXISTS acessos (
+    categoria TEXT NOT NULL,
+    subcategoria TEXT NOT NULL DEFAULT '',
+    ano INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL,
+    PRIMARY KEY (categoria, subcategoria, ano)
+) WITHOUT ROWID;
+
+-- Agregados mantidos a cada gravação de tabela (ver aggregates.summarize)
+CREATE TABLE IF NOT EXISTS series (
+    categoria TEXT NOT NULL,
+    subcategoria TEXT NOT NULL DEFAULT '',
+    chave TEXT NOT NULL,
+    grupo TEXT NOT NULL DEFAULT '',
+    coluna TEXT NOT NULL,
+    ano INTEGER NOT NULL,
+    produto TEXT NOT NULL,
+    nivel TEXT,
+    valor REAL,
+    PRIMARY KEY (categoria, subcategoria, chave, grupo, coluna, ano)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_series_ano ON series (categoria, subcategoria, ano, coluna);
+
+CREATE TABLE IF NOT EXISTS totais (
+    categoria TEXT NOT NULL,
+    subcategoria TEXT NOT NULL DEFAULT '',
+    coluna TEXT NOT NULL,
+    ano INTEGER NOT NULL,
+    valor REAL,
+    PRIMARY KEY (categoria, subcategoria, coluna, ano)
+) WITHOUT ROWID;
+
+-- Registro de mudanças: uma entrada por versão gravada de cada tabela, com número de
+-- sequência crescente (nunca reutilizado) e as diferenças em relação à versão anterior
+CREATE TABLE IF NOT EXISTS versoes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    categoria TEXT NOT NULL,
+    subcategoria TEXT NOT NULL DEFAULT '',
+    ano INTEGER NOT NULL,
+    hash_conteudo TEXT NOT NULL,
+    hash_anterior TEXT,
+    linhas INTEGER NOT NULL,
+    diferencas TEXT,
+    registrado_em TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_versoes_categoria ON versoes (categoria, seq);
+"""
+
+
+class DataStore:
+    """
+    Armazenamento local (SQLite) das tabelas extraídas do site da Embrapa.
+
+    Cada tabela é identificada por (categoria, subcategoria, ano) e suas linhas
+    são gravadas em ordem, com os valores já tipados e o primeiro campo (produto
+    ou país) indexado. Cada thread usa a sua própria conexão.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._migrate(self._connect())
+
+    def _migrate(self, conn):
+        """Cria o esquema ou atualiza um banco criado por uma versão anterior."""
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'tabelas'").fetchone()
+        if exists and version < 2:
+            _migrate_typed_rows(conn)
+        if exists and version < 3:
+            with conn:
+                conn.execute("ALTER TABLE tabelas ADD COLUMN hash_conteudo TEXT")
+                conn.execute("ALTER TABLE tabelas ADD COLUMN hash_html TEXT")
+        conn.executescript(SCHEMA)
+        if exists and version < 4:
+            _rebuild_aggregates(conn)
+        if exists and version < 5:
+            _seed_versions(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    def get_table(self, category, year, subcategory=None):
+        """
+        Obtém uma tabela armazenada.
+
+        Args:
+            category (str): Categoria de dados.
+            year (int | str): Ano dos dados.
+            subcategory (str, optional): Subcategoria dentro da categoria principal.
+
+        Returns:
+            models.Table: Tabela armazenada, ou None se a tabela não estiver armazenada.
+        """
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT id, titulo, cabecalhos, tipos, source_url, atualizado_em FROM tabelas "
+            "WHERE categoria = ? AND subcategoria = ? AND ano = ?",
+            (category, subcategory or "", int(year)),
+        ).fetchone()
+        if row is None:
+            return None
+
+        table_id, title, headers_json, types_json, source_url, updated_at = row
+        return Table(
+            title,
+            json.loads(headers_json),
+            json.loads(types_json),
+            _read_rows(conn, table_id),
+            source_url,
+            datetime.fromisoformat(updated_at),
+        )
+
+    def has_table(self, category, year, subcategory=None):
+        """Indica se a tabela (categoria, ano, subcategoria) já está armazenada."""
+        row = self._connect().execute(
+            "SELECT 1 FROM tabelas WHERE categoria = ? AND subcategoria = ? AND ano = ?",
+            (category, subcategory or "", int(year)),
+        ).fetchone()
+        return row is not None
+
+    def list_tables(self):
+        """Retorna as chaves (categoria, ano, subcategoria) de todas as tabelas armazenadas."""
+        return [
+            (category, year, subcategory or None)
+            for category, year, subcategory in self._connect().execute(
+                "SELECT categoria, ano, subcategoria FROM tabelas ORDER BY categoria, subcategoria, ano"
+            )
+        ]
+
+    def get_hashes(self, category, year, subcategory=None):
+        """
+        Retorna os hashes da tabela armazenada, usados para detectar mudanças no site.
+
+        Returns:
+            tuple: (hash do conteúdo, hash do HTML da página), ou (None, None) se a tabela
+                não estiver armazenada.
+        """
+        row = self._connect().execute(
+            "SELECT hash_conteudo, hash_html FROM tabelas WHERE categoria = ? AND subcategoria = ? AND ano = ?",
+            (category, subcategory or "", int(year)),
+        ).fetchone()
+        return tuple(row) if row is not None else (None, None)
+
+    def set_html_hash(self, category, year, subcategory, html_hash):
+        """Atualiza o hash do HTML de uma tabela cujo conteúdo não mudou."""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "UPDATE tabelas SET hash_html = ? WHERE categoria = ? AND subcategoria = ? AND ano = ?",
+                (html_hash, category, subcategory or "", int(year)),
+            )
+
+    def save_table(self, category, year, subcategory, table, html_hash=None):
+        """
+        Grava (ou substitui) uma tabela extraída do site da Embrapa.
+
+        Args:
+            category (str): Categoria de dados.
+            year (int | str): Ano dos dados.
+            subcategory (str | None): Subcategoria dentro da categoria principal.
+            table (models.Table): Tabela com cabeçalhos.
+            html_hash (str, optional): Hash do HTML da página de onde a tabela foi extraída.
+
+        Se o conteúdo mudou (ou a tabela é nova), a versão é registrada em versoes, com as
+        diferenças em relação à versão anterior.
+        """
+        conn = self._connect()
+        content_hash = table.content_hash()
+        with conn:
+            # Bloqueia a escrita desde a leitura da versão anterior, para que gravações
+            # simultâneas da mesma tabela (outros workers) registrem diferenças consistentes
+            conn.execute("BEGIN IMMEDIATE")
+            previous = conn.execute(
+                "SELECT id, titulo, cabecalhos, tipos, source_url, hash_conteudo FROM tabelas "
+                "WHERE categoria = ? AND subcategoria = ? AND ano = ?",
+                (category, subcategory or "", int(year)),
+            ).fetchone()
+            if previous is None or previous[5] != content_hash:
+                _insert_version(conn, category, subcategory, year, table, previous)
+            conn.execute(
+                "DELETE FROM tabelas WHERE categoria = ? AND subcategoria = ? AND ano = ?",
+                (category, subcategory or "", int(year)),
+            )
+            cursor = conn.execute(
+                "INSERT INTO tabelas (categoria, subcategoria, ano, titulo, cabecalhos, tipos, source_url, "
+                "atualizado_em, hash_conteudo, hash_html) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    category,
+                    subcategory or "",
+                    int(year),
+                    table.title,
+                    json.dumps(table.headers, ensure_ascii=False),
+                    json.dumps(table.types),
+                    table.source_url,
+                    (table.fetched_at or datetime.now(timezone.utc)).isoformat(),
+                    content_hash,
+                    html_hash,
+                ),
+            )
+            _insert_rows(conn, cursor.lastrowid, table.rows)
+            _replace_aggregates(conn, category, subcategory, year, table)
+
+    def add_request_counts(self, counts):
+        """
+        Soma contagens de acesso às consultas (usadas para escolher o que pré-aquecer).
+
+        Args:
+            counts (dict): {(categoria, ano ou None, subcategoria ou None): quantidade}.
+        """
+        if not counts:
+            return
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO acessos (categoria, subcategoria, ano, total) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (categoria, subcategoria, ano) DO UPDATE SET total = total + excluded.total",
+                (
+                    (category, subcategory or "", int(year or 0), total)
+                    for (category, year, subcategory), total in counts.items()
+                ),
+            )
+
+    def top_requested(self, limit):
+        """
+        Retorna as consultas mais acessadas.
+
+        Returns:
+            list: Tuplas (categoria, ano ou None, subcategoria ou None), da mais acessada para a menos.
+        """
+        rows = self._connect().execute(
+            "SELECT categoria, ano, subcategoria FROM acessos ORDER BY total DESC LIMIT ?", (limit,)
+        )
+        return [(category, str(year) if year else None, subcategory or None) for category, year, subcategory in rows]
+
+    def get_series(self, category, subcategory, product_key, group=None, start_year=None, end_year=None):
+        """
+        Obtém as séries históricas de um produto (ou país).
+
+        Args:
+            category (str): Categoria de dados.
+            subcategory (str | None): Subcategoria dentro da categoria principal.
+            product_key (str): Nome do produto normalizado (query.normalize).
+            group (str, optional): Produto ao qual o subitem pertence.
+            start_year (int, optional): Primeiro ano.
+            end_year (int, optional): Último ano.
+
+        Returns:
+            dict: {(nome do produto, grupo, coluna): ([anos], [valores])}, em ordem de ano.
+        """
+        sql = (
+            "SELECT produto, grupo, coluna, ano, valor FROM series "
+            "WHERE categoria = ? AND subcategoria = ? AND chave = ?"
+        )
+        params = [category, subcategory or "", product_key]
+        if group is not None:
+            sql += " AND grupo = ?"
+            params.append(group)
+        sql += _year_filter(start_year, end_year, params) + " ORDER BY grupo, coluna, ano"
+        series = {}
+        for product, group_name, column, year, value in self._connect().execute(sql, params):
+            years, values = series.setdefault((product, group_name, column), ([], []))
+            years.append(year)
+            values.append(value)
+        return series
+
+    def get_totals(self, category, subcategory, start_year=None, end_year=None):
+        """
+        Obtém os totais por ano de cada coluna numérica.
+
+        Returns:
+            dict: {coluna: ([anos], [valores])}, em ordem de ano.
+        """
+        params = [category, subcategory or ""]
+        sql = (
+            "SELECT coluna, ano, valor FROM totais WHERE categoria = ? AND subcategoria = ?"
+            + _year_filter(start_year, end_year, params) + " ORDER BY coluna, ano"
+        )
+        totals = {}
+        for column, year, value in self._connect().execute(sql, params):
+            years, values = totals.setdefault(column, ([], []))
+            years.append(year)
+            values.append(value)
+        return totals
+
+    def get_year_values(self, category, subcategory, year, column):
+        """
+        Obtém os valores de uma coluna de todos os produtos de um ano (sem os subitens).
+
+        Returns:
+            list: Tuplas (produto, grupo, valor).
+        """
+        return self._connect().execute(
+            "SELECT produto, grupo, valor FROM series WHERE categoria = ? AND subcategoria = ? "
+            "AND ano = ? AND coluna = ? AND grupo = ''",
+            (category, subcategory or "", int(year), column),
+        ).fetchall()
+
+    def aggregate_years(self, category, subcategory):
+        """Retorna os anos com agregados de uma categoria e subcategoria, em ordem crescente."""
+        rows = self._connect().execute(
+            "SELECT DISTINCT ano FROM totais WHERE categoria = ? AND subcategoria = ? ORDER BY ano",
+            (category, subcategory or ""),
+        )
+        return [year for (year,) in rows]
+
+    def get_changes(self, since=0, limit=100, category=None, with_diff=False):
+        """
+        Lista as versões de tabelas gravadas após o número de sequência ``since``.
+
+        Args:
+            since (int): Último número de sequência já conhecido pelo cliente.
+            limit (int): Máximo de versões retornadas.
+            category (str, optional): Apenas as tabelas desta categoria.
+            with_diff (bool): Inclui as diferenças de linhas em relação à versão anterior.
+
+        Returns:
+            list: Dicionários com seq, categoria, subcategoria, ano, hashes, número de linhas,
+                data do registro e, com with_diff, as diferenças (None para a primeira versão
+                ou quando a tabela deve ser obtida por inteiro).
+        """
+        sql = (
+            "SELECT seq, categoria, subcategoria, ano, hash_conteudo, hash_anterior, linhas, registrado_em"
+            + (", diferencas" if with_diff else "")
+            + " FROM versoes WHERE seq > ?"
+        )
+        params = [int(since)]
+        if category:
+            sql += " AND categoria = ?"
+            params.append(category)
+        sql += " ORDER BY seq LIMIT ?"
+        params.append(int(limit))
+        changes = []
+        for row in self._connect().execute(sql, params):
+            change = {
+                "seq": row[0],
+                "category": row[1],
+                "subcategory": row[2] or None,
+                "year": row[3],
+                "content_hash": row[4],
+                "previous_hash": row[5],
+                "rows": row[6],
+                "recorded_at": row[7],
+            }
+            if with_diff:
+                change["diff"] = json.loads(row[8]) if row[8] else None
+            changes.append(change)
+        return changes
+
+    def last_seq(self):
+        """Retorna o número de sequência da versão mais recente (0 se não houver versões)."""
+        return self._connect().execute("SELECT COALESCE(MAX(seq), 0) FROM versoes").fetchone()[0]
+
+    def stats(self):
+        """Retorna a quantidade de tabelas e linhas armazenadas."""
+        conn = self._connect()
+        tables = conn.execute("SELECT COUNT(*) FROM tabelas").fetchone()[0]
+        rows = conn.execute("SELECT COUNT(*) FROM linhas").fetchone()[0]
+        return {"path": self.path, "tables": tables, "rows": rows}
+
+
+def _read_rows(conn, table_id):
+    return [
+        Row(tuple(json.loads(values)), level)
+        for values, level in conn.execute(
+            "SELECT valores, nivel FROM linhas WHERE tabela_id = ? ORDER BY posicao", (table_id,)
+        )
+    ]
+
+
+def _insert_version(conn, category, subcategory, year, table, previous):
+    """
+    Registra uma nova versão da tabela, com as diferenças em relação à anterior.
+
+    Args:
+        previous (tuple | None): (id, título, cabeçalhos, tipos, source_url, hash) da versão
+            gravada, ou None se a tabela é nova.
+    """
+    diff = None
+    if previous is not None:
+        table_id, title, headers_json, types_json, source_url, _ = previous
+        old = Table(title, json.loads(headers_json), json.loads(types_json), _read_rows(conn, table_id), source_url)
+        diff = diff_tables(old, table)
+    conn.execute(
+        "INSERT INTO versoes (categoria, subcategoria, ano, hash_conteudo, hash_anterior, linhas, diferencas, "
+        "registrado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        (
+            category,
+            subcategory or "",
+            int(year),
+            table.content_hash(),
+            previous[5] if previous is not None else None,
+            len(table.rows),
+            json.dumps(diff, ensure_ascii=False) if diff is not None else None,
+            datetime.now(timezone.utc).isoformat(),
+        ),
+    )
+
+
+def _seed_versions(conn):
+    """Registra a versão atual das tabelas gravadas por uma versão anterior do esquema."""
+    with conn:
+        conn.execute(
+            "INSERT INTO versoes (categoria, subcategoria, ano, hash_conteudo, linhas, registrado_em) "
+            "SELECT t.categoria, t.subcategoria, t.ano, COALESCE(t.hash_conteudo, ''), "
+            "(SELECT COUNT(*) FROM linhas WHERE tabela_id = t.id), t.atualizado_em "
+            "FROM tabelas t ORDER BY t.atualizado_em, t.id"
+        )
+
+
+def _insert_rows(conn, table_id, rows):
+    conn.executemany(
+        "INSERT INTO linhas (tabela_id, posicao, produto, nivel, valores) VALUES (?, ?, ?, ?, ?)",
+        (
+            (
+                table_id,
+                position,
+                row.values[0] if row.values else None,
+                row.level,
+                json.dumps(row.values, ensure_ascii=False),
+            )
+            for position, row in enumerate(rows)
+        ),
+    )
+
+
+def _year_filter(start_year, end_year, params):
+    sql = ""
+    if start_year is not None:
+        sql += " AND ano >= ?"
+        params.append(int(start_year))
+    if end_year is not None:
+        sql += " AND ano <= ?"
+        params.append(int(end_year))
+    return sql
+
+
+def _replace_aggregates(conn, category, subcategory, year, table):
+    """Substitui os agregados (séries e totais) de uma tabela gravada."""
+    key = (category, subcategory or "", int(year))
+    conn.execute("DELETE FROM series WHERE categoria = ? AND subcategoria = ? AND ano = ?", key)
+    conn.execute("DELETE FROM totais WHERE categoria = ? AND subcategoria = ? AND ano = ?", key)
+    entries, totals = aggregates.summarize(table)
+    # Produtos repetidos na mesma tabela (mesmo nome e grupo) têm os valores somados
+    conn.executemany(
+        "INSERT INTO series (categoria, subcategoria, chave, grupo, coluna, ano, produto, nivel, valor) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (categoria, subcategoria, chave, grupo, coluna, ano) DO UPDATE SET valor = "
+        "CASE WHEN valor IS NULL THEN excluded.valor WHEN excluded.valor IS NULL THEN valor "
+        "ELSE valor + excluded.valor END",
+        (
+            (key[0], key[1], product_key, group, column, key[2], product, level, value)
+            for product, product_key, group, level, column, value in entries
+        ),
+    )
+    conn.executemany(
+        "INSERT INTO totais (categoria, subcategoria, coluna, ano, valor) VALUES (?, ?, ?, ?, ?)",
+        ((key[0], key[1], column, key[2], value) for column, value in totals.items()),
+    )
+
+
+def _rebuild_aggregates(conn):
+    """Calcula os agregados de todas as tabelas gravadas por uma versão anterior."""
+    with conn:
+        for table_id, category, subcategory, year, title, headers_json, types_json, source_url in conn.execute(
+            "SELECT id, categoria, subcategoria, ano, titulo, cabecalhos, tipos, source_url FROM tabelas"
+        ).fetchall():
+            rows = _read_rows(conn, table_id)
+            table = Table(title, json.loads(headers_json), json.loads(types_json), rows, source_url)
+            _replace_aggregates(conn, category, subcategory, year, table)
+
+
+def _migrate_typed_rows(conn):
+    """
+    Converte um banco da versão 1 (células gravadas como texto) para valores tipados.
+    """
+    with conn:
+        conn.execute("ALTER TABLE tabelas ADD COLUMN tipos TEXT NOT NULL DEFAULT '[]'")
+        conn.execute("ALTER TABLE linhas ADD COLUMN nivel TEXT")
+        for table_id, title, headers_json, source_url in conn.execute(
+            "SELECT id, titulo, cabecalhos, source_url FROM tabelas"
+        ).fetchall():
+            cells = [
+                json.loads(values)
+                for (values,) in conn.execute(
+                    "SELECT valores FROM linhas WHERE tabela_id = ? ORDER BY posicao", (table_id,)
+                )
+            ]
+            page = ParsedPage(title, json.loads(headers_json), cells, [None] * len(cells))
+            table = Table.from_parsed(page, source_url)
+            conn.execute("UPDATE tabelas SET tipos = ? WHERE id = ?", (json.dumps(table.types), table_id))
+            conn.execute("DELETE FROM linhas WHERE tabela_id = ?", (table_id,))
+            _insert_rows(conn, table_id, table.rows)
@@ -0,0 +1,106 @@
+import pytest
+
+import admission
+import app as api
+from admission import BATCH, INTERACTIVE, AdmissionController, AdmissionError
+from upstream import UpstreamBusyError
+
+
+def test_limite_por_cliente_e_por_faixa():
+    """
+    Verifica o balde de cada cliente (429) e os limites de requisições simultâneas (503).
+    """
+    controller = AdmissionController(rate=0.5, burst=2, max_concurrent=3, batch_concurrent=1)
+    primeira = controller.admit("ana")
+    controller.admit("ana")
+    with pytest.raises(AdmissionError) as erro:
+        controller.admit("ana")
+    assert (erro.value.status, erro.value.retry_after) == (429, 2)
+
+    # Outro cliente tem o próprio balde; a faixa de lote admite uma requisição por vez
+    controller.admit("bia", BATCH)
+    with pytest.raises(AdmissionError) as erro:
+        controller.admit("caio", BATCH)
+    assert erro.value.status == 503
+    # Três requisições em andamento: o processo está saturado para ambas as faixas
+    with pytest.raises(AdmissionError) as erro:
+        controller.admit("caio")
+    assert erro.value.status == 503
+
+    primeira.release()
+    primeira.release()
+    assert controller.admit("caio").lane == INTERACTIVE
+    stats = controller.stats()
+    assert stats["active"] == {INTERACTIVE: 2, BATCH: 1}
+    assert (stats["interativa_admitted"], stats["interativa_limited"], stats["interativa_shed"]) == (3, 1, 1)
+    assert (stats["lote_admitted"], stats["lote_shed"]) == (1, 1)
+
+
+def test_acesso_ao_site_custa_mais_que_o_cache():
+    """
+    Verifica que as buscas no site são cobradas da requisição em andamento, com saldo negativo.
+    """
+    controller = AdmissionController(rate=0.5, burst=10, upstream_cost=4)
+    admission.charge_upstream()  # fora de uma requisição: não cobra nada
+
+    ticket = controller.admit("ana")
+    admission.activate(ticket)
+    try:
+        for _ in range(3):
+            admission.charge_upstream()
+    finally:
+        admission.deactivate()
+    assert ticket.upstream == 3
+    # 10 - 1 - 3 * 4 = -3: são necessários 8 s para a próxima ficha
+    with pytest.raises(AdmissionError) as erro:
+        controller.admit("ana")
+    assert erro.value.retry_after == 8
+
+
+def test_faixa_de_lote_nao_usa_as_conexoes_reservadas():
+    controller = AdmissionController(batch_upstream=1, upstream_wait=0.05)
+    lote = controller.admit("bia", BATCH)
+    admission.activate(lote)
+    try:
+        with admission.upstream_slot():
+            with pytest.raises(UpstreamBusyError):
+                with admission.upstream_slot():
+                    pass
+        admission.activate(controller.admit("ana"))
+        with admission.upstream_slot():
+            with admission.upstream_slot():
+                pass
+    finally:
+        admission.deactivate()
+
+
+def test_rotas_respondem_429_e_503_com_retry_after(client, auth_headers, embrapa, monkeypatch):
+    """
+    Verifica a admissão nas rotas: custo do acesso ao site, 429 com Retry-After, faixa de lote
+    pelo token ou pela rota e liberação das vagas ao fim de cada requisição.
+    """
+    controller = AdmissionController(rate=0.1, burst=12, upstream_cost=10, batch_concurrent=0)
+    monkeypatch.setattr(api, "admission_controller", controller)
+    url = "/api/exportacao?ano=2019&subcategoria=uvas_frescas"
+
+    # 1 ficha + 10 pela busca no site; a segunda consulta vem do cache e custa 1
+    assert client.get(url, headers=auth_headers).status_code == 200
+    assert client.get(url, headers=auth_headers).status_code == 200
+    assert embrapa.hits == 1
+    recusada = client.get(url, headers=auth_headers)
+    assert recusada.status_code == 429
+    assert recusada.headers["Retry-After"] == "10"
+    assert "msg" in recusada.json
+
+    lote = client.post("/auth", json={"username": "admin", "password": "password", "prioridade": "lote"})
+    headers = {"Authorization": f"Bearer {lote.json['access_token']}"}
+    monkeypatch.setattr(api, "admission_controller", AdmissionController(batch_concurrent=0))
+    assert client.get(url, headers=headers).status_code == 503
+    assert client.post("/api/batch", json={"consultas": []}, headers=auth_headers).status_code == 503
+    assert client.get(url, headers=auth_headers).status_code == 200
+    assert api.admission_controller.stats()["active"] == {INTERACTIVE: 0, BATCH: 0}
+
+    # Sem token válido, a rota responde com 401 sem passar pela admissão
+    assert client.get(url).status_code == 401
+    invalida = client.post("/auth", json={"username": "admin", "password": "password", "prioridade": "maxima"})
+    assert invalida.status_code == 400
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+
+import aggregates
+import app as api
+from models import Table
+from parsing import ParsedPage
+from storage import DataStore
+
+
+def exportacao(year, alemanha, paraguai):
+    total = sum(value for value in (alemanha, paraguai) if value is not None)
+    return Table.from_parsed(
+        ParsedPage(
+            f"Exportação de vinhos - {year}",
+            ["Países", "Quantidade (Kg)", "Valor (US$)"],
+            [
+                ["Alemanha", str(alemanha or "-"), str((alemanha or 0) * 2 or "-")],
+                ["Paraguai", str(paraguai or "-"), str((paraguai or 0) * 2 or "-")],
+                ["Total", str(total), str(total * 2)],
+            ],
+            [None, None, None],
+        ),
+        f"http://teste/{year}",
+    )
+
+
+PRODUCAO = Table.from_parsed(
+    ParsedPage(
+        "Produção - 2020",
+        ["Produto", "Quantidade (L.)"],
+        [["VINHO DE MESA", "300"], ["Tinto", "200"], ["Branco", "100"], ["SUCO", "50"], ["Tinto", "7"]],
+        ["item", "subitem", "subitem", "item", "subitem"],
+    ),
+    "http://teste/producao",
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = DataStore(str(tmp_path / "agregados.db"))
+    store.save_table("exportacao", 2019, "vinhos", exportacao(2019, 100, 50))
+    store.save_table("exportacao", 2021, "vinhos", exportacao(2021, 150, None))
+    store.save_table("exportacao", 2020, "vinhos", exportacao(2020, 120, 40))
+    return store
+
+
+def test_resumo_da_tabela_com_subitens():
+    """
+    Verifica a decomposição por produto, o grupo dos subitens e o total sem linha de total.
+    """
+    entries, totals = aggregates.summarize(PRODUCAO)
+
+    assert totals == {"Quantidade (L.)": 350}
+    assert ("Tinto", "tinto", "VINHO DE MESA", "subitem", "Quantidade (L.)", 200.0) in entries
+    assert ("Tinto", "tinto", "SUCO", "subitem", "Quantidade (L.)", 7.0) in entries
+
+
+def test_series_e_crescimento(store):
+    """
+    Verifica a série de um país em todos os anos e o crescimento ano a ano.
+    """
+    series = store.get_series("exportacao", "vinhos", "alemanha")
+    years, values = series[("Alemanha", "", "Valor (US$)")]
+    assert years == [2019, 2020, 2021]
+
+    payload = aggregates.series_payload(years, values, 2018, 2021)
+    assert payload["values"] == [None, 200, 240, 300]
+    assert payload["yoy"] == [None, None, 20.0, 25.0]
+
+
+def test_gravacao_substitui_agregados_do_ano(store):
+    store.save_table("exportacao", 2020, "vinhos", exportacao(2020, 10, 40))
+
+    years, values = store.get_totals("exportacao", "vinhos")["Quantidade (Kg)"]
+    assert years == [2019, 2020, 2021]
+    assert values == [150, 50, 150]
+
+
+def test_ranking_com_participacao_e_crescimento(store):
+    entries = store.get_year_values("exportacao", "vinhos", 2020, "Valor (US$)")
+    previous = {(p, g): v for p, g, v in store.get_year_values("exportacao", "vinhos", 2019, "Valor (US$)")}
+
+    ranking = aggregates.ranking(entries, previous, 320, 1)
+
+    assert ranking == [
+        {"position": 1, "product": "Alemanha", "group": None, "value": 240, "share": 75.0, "yoy": 20.0}
+    ]
+
+
+def test_crescimento_com_zero_e_ausentes():
+    assert aggregates.growth(np.array([0, 10, np.nan, 5])) == [None, None, None, None]
+
+
+def test_rotas_de_agregados(client, auth_headers):
+    """
+    Verifica as rotas de séries, totais e ranking a partir dos dados armazenados.
+    """
+    for year, alemanha, paraguai in ((1995, 10, 30), (1996, 20, 15)):
+        api.data_store.save_table("importacao", year, "suco_uva", exportacao(year, alemanha, paraguai))
+
+    serie = client.get(
+        "/api/series/importacao?subcategoria=suco_uva&produto=alemanha&coluna=quantidade", headers=auth_headers
+    ).json
+    assert serie["series"] == [{
+        "product": "Alemanha", "group": None, "column": "Quantidade (Kg)",
+        "years": [1995, 1996], "values": [10, 20], "yoy": [None, 100.0],
+    }]
+
+    totais = client.get("/api/totais/importacao?subcategoria=suco_uva", headers=auth_headers).json
+    assert totais["totals"][0]["columns"]["Valor (US$)"]["values"] == [80, 70]
+
+    ranking = client.get("/api/ranking/importacao?subcategoria=suco_uva&ano=1996", headers=auth_headers).json
+    assert ranking["column"] == "Valor (US$)"
+    assert [item["product"] for item in ranking["ranking"]] == ["Alemanha", "Paraguai"]
+    assert ranking["ranking"][1]["yoy"] == -50.0
+
+    assert client.get("/api/series/importacao?produto=alemanha", headers=auth_headers).status_code == 400
+    assert client.get(
+        "/api/series/importacao?subcategoria=suco_uva&produto=inexistente", headers=auth_headers
+    ).status_code == 404
@@ -0,0 +1,54 @@
+import os
+
+import pytest
+
+import app as api
+from archive import HtmlArchive
+from models import Table
+from replay import ReplayClient, SnapshotNotFoundError
+from upstream import EmbrapaClient
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "exportacao_vinhos_2023.html")
+
+
+def test_paginas_identicas_compartilham_o_conteudo(tmp_path):
+    """
+    Verifica que cada captura é registrada e que conteúdos iguais são gravados uma única vez.
+    """
+    archive = HtmlArchive(str(tmp_path))
+    archive.save("http://teste/a", "<p>versão 1</p>".encode("latin-1"), "latin-1")
+    archive.save("http://teste/a", "<p>versão 2</p>".encode("latin-1"), "latin-1")
+    archive.save("http://teste/b", "<p>versão 2</p>".encode("latin-1"), "latin-1")
+
+    stats = archive.stats()
+    assert (stats["snapshots"], stats["urls"], stats["objects"]) == (3, 2, 2)
+    assert archive.latest("http://teste/a").text == "<p>versão 2</p>"
+    assert archive.latest("http://teste/c") is None
+
+
+def test_cliente_grava_respostas_no_arquivo(server, tmp_path):
+    archive = HtmlArchive(str(tmp_path))
+    client = EmbrapaClient(retries=0, archive=archive)
+
+    client.get(server.url)
+
+    assert archive.latest(server.url).content == b"ok"
+
+
+def test_replay_sem_acesso_a_rede(tmp_path, monkeypatch):
+    """
+    Verifica que no modo de reprodução a tabela é extraída da página arquivada.
+    """
+    archive = HtmlArchive(str(tmp_path))
+    url = api._embrapa_url("exportacao", "2023", "vinhos")
+    with open(FIXTURE, "rb") as file:
+        archive.save(url, file.read(), "utf-8")
+    monkeypatch.setattr(api, "embrapa_client", ReplayClient(archive))
+
+    table = api._scrape_embrapa_data("exportacao", "2023", "vinhos")
+    assert isinstance(table, Table)
+    assert table.rows
+
+    with pytest.raises(SnapshotNotFoundError):
+        api.embrapa_client.get(api._embrapa_url("exportacao", "2022", "vinhos"))
+    assert "error" in api._scrape_embrapa_data("exportacao", "2022", "vinhos")
@@ -0,0 +1,113 @@
+import asyncio
+import sqlite3
+import time
+
+import httpx
+import pytest
+
+import app as api
+import asgi
+
+
+def request_all(paths, headers=None, **config):
+    """Envia as requisições ao mesmo tempo para uma nova instância da aplicação ASGI."""
+    async def run():
+        application = asgi.AsgiApp(api.app, threads=2)
+        application.get_fetcher().max_concurrency = config.get("max_concurrency", 8)
+        transport = httpx.ASGITransport(app=application)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://teste") as client:
+                responses = await asyncio.gather(*(client.get(path, headers=headers) for path in paths))
+        finally:
+            await application.fetcher.aclose()
+        return responses, application.fetcher.stats()
+
+    return asyncio.run(run())
+
+
+def test_requisicoes_lentas_nao_ocupam_threads(embrapa, auth_headers):
+    """
+    Verifica que 40 requisições simultâneas a um site lento são atendidas com apenas 2
+    threads para o Flask, sem esperar uma pela outra.
+    """
+    embrapa.delay = 0.3
+    paths = [f"/api/exportacao?ano={year}&subcategoria=uvas_frescas" for year in range(1980, 2020)]
+
+    started = time.perf_counter()
+    responses, stats = request_all(paths, auth_headers, max_concurrency=40)
+    elapsed = time.perf_counter() - started
+
+    assert [response.status_code for response in responses] == [200] * 40
+    assert all(response.json()["data"] for response in responses)
+    assert "prefetch;dur=" in responses[0].headers["Server-Timing"]
+    assert embrapa.hits == 40
+    assert stats["requests"] == 40
+    # Com as 2 threads bloqueadas pelo site, seriam pelo menos 40 * 0,3 / 2 = 6 s
+    assert elapsed < 3
+
+
+def test_consultas_simultaneas_compartilham_o_acesso(embrapa, auth_headers):
+    embrapa.delay = 0.2
+    responses, stats = request_all(["/api/exportacao?ano=1979&subcategoria=uvas_frescas"] * 10, auth_headers)
+
+    assert {response.status_code for response in responses} == {200}
+    assert embrapa.hits == 1
+    assert stats["shared"] == 9
+
+
+def test_sem_token_nao_acessa_o_site(embrapa):
+    responses, _ = request_all(["/api/exportacao?ano=1978&subcategoria=uvas_frescas"])
+
+    assert responses[0].status_code == 401
+    assert embrapa.hits == 0
+
+
+def test_demais_rotas_e_streaming(embrapa, auth_headers):
+    """
+    Verifica as rotas sem busca assíncrona e as respostas em streaming pelo Flask.
+    """
+    responses, _ = request_all(
+        ["/api/categorias", "/api/exportacao?ano_inicio=2000&ano_fim=2003&subcategoria=uvas_frescas&formato=csv"],
+        auth_headers,
+    )
+
+    assert "exportacao" in responses[0].json()["categorias"]
+    lines = responses[1].text.strip().splitlines()
+    assert lines[0].startswith("ano,")
+    assert {line.split(",")[0] for line in lines[1:]} == {"2000", "2001", "2002", "2003"}
+
+
+def test_admissao_antes_da_busca(embrapa, auth_headers, monkeypatch):
+    """
+    Verifica que a busca assíncrona é cobrada do cliente (1 + 10 fichas esgotam o saldo) e
+    que a requisição recusada não chega ao site.
+    """
+    from admission import AdmissionController
+
+    monkeypatch.setattr(api, "admission_controller", AdmissionController(rate=0.1, burst=11, upstream_cost=10))
+    paths = [f"/api/exportacao?ano={year}&subcategoria=uvas_frescas" for year in (1990, 1991)]
+    responses = [request_all([path], auth_headers)[0][0] for path in paths]
+
+    assert [response.status_code for response in responses] == [200, 429]
+    assert responses[1].headers["Retry-After"]
+    assert embrapa.hits == 1
+    assert api.admission_controller.stats()["active"]["interativa"] == 0
+
+
+def test_vaga_liberada_quando_a_busca_falha(embrapa, auth_headers, monkeypatch):
+    """
+    Verifica que a admissão é liberada quando a requisição não chega ao Flask.
+    """
+    from admission import AdmissionController
+
+    async def falha(self, specs):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(api, "admission_controller", AdmissionController())
+    monkeypatch.setattr(asgi.AsyncEmbrapaFetcher, "fetch_many", falha)
+    with pytest.raises(sqlite3.OperationalError):
+        request_all(["/api/exportacao?ano=1990&subcategoria=uvas_frescas"], auth_headers)
+
+    stats = api.admission_controller.stats()
+    assert stats["interativa_admitted"] == 1
+    assert stats["active"]["interativa"] == 0
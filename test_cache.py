@@ -0,0 +1,79 @@
+import threading
+import time
+
+import app as api
+from cache import ResponseCache
+from models import Table
+
+
+def test_lru_descarta_entrada_menos_usada():
+    """
+    Verifica o descarte LRU ao atingir o limite de tamanho.
+    """
+    cache = ResponseCache(max_items=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get_or_load("a", lambda: None) == 1
+    cache.set("c", 3)
+
+    assert cache.peek("b") is None
+    assert cache.peek("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_stale_while_revalidate():
+    """
+    Verifica que a entrada expirada é servida enquanto a atualização ocorre em segundo plano.
+    """
+    cache = ResponseCache(stale_window=60)
+    cache.set("k", "antigo", ttl=0.01)
+    time.sleep(0.02)
+
+    atualizado = threading.Event()
+
+    def loader():
+        atualizado.set()
+        return "novo"
+
+    assert cache.get_or_load("k", loader, ttl=60) == "antigo"
+    assert atualizado.wait(1)
+    for _ in range(100):
+        if cache.stats()["refreshes"]:
+            break
+        time.sleep(0.01)
+    assert cache.get_or_load("k", loader) == "novo"
+    stats = cache.stats()
+    assert stats["stale_hits"] == 1
+    assert stats["hits"] == 1
+
+
+def test_respostas_de_erro_nao_sao_armazenadas():
+    """
+    Verifica que o predicado cacheable impede o armazenamento de erros.
+    """
+    cache = ResponseCache()
+    cache.get_or_load("k", lambda: {"error": "falha"}, cacheable=lambda r: "error" not in r)
+    assert cache.peek("k") is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_fetch_embrapa_data_usa_cache(monkeypatch):
+    """
+    Verifica que consultas repetidas não acessam o site da Embrapa novamente.
+    """
+    chamadas = []
+
+    def fake_scrape(category, year=None, subcategory=None):
+        chamadas.append((category, year, subcategory))
+        return Table("Teste", [], [], [], "")
+
+    api.response_cache.clear()
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    api.fetch_embrapa_data("exportacao", "2020", "vinhos")
+    api.fetch_embrapa_data("exportacao", "2020", "vinhos")
+    # Subcategoria inválida é equivalente a não informar subcategoria
+    api.fetch_embrapa_data("producao", "2020", "inexistente")
+    api.fetch_embrapa_data("producao", "2020")
+
+    assert chamadas == [("exportacao", "2020", "vinhos"), ("producao", "2020", None)]
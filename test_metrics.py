@@ -0,0 +1,59 @@
+import app as api
+import metrics
+from models import Table
+
+
+def test_formato_prometheus():
+    registry = metrics.Registry()
+    counter = registry.counter("teste_total", "Contador de teste.", ("rota",))
+    histogram = registry.histogram("teste_segundos", "Histograma de teste.", buckets=(0.1, 1))
+    counter.inc(rota='a"b')
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    registry.add_collector(lambda: [("teste_itens", "gauge", "Itens.", [({}, 3)])])
+
+    text = registry.render()
+
+    assert '# TYPE teste_total counter\nteste_total{rota="a\\"b"} 1\n' in text
+    assert 'teste_segundos_bucket{le="0.1"} 1\n' in text
+    assert 'teste_segundos_bucket{le="+Inf"} 2\n' in text
+    assert "teste_segundos_count 2\n" in text
+    assert "teste_itens 3\n" in text
+
+
+def test_fases_da_requisicao():
+    timer = metrics.RequestTimer("teste")
+    with metrics.phase("parse"):
+        pass
+    with metrics.phase("parse"):
+        pass
+    header = timer.server_timing()
+    timer.finish()
+
+    assert header.startswith("parse;dur=")
+    assert "total;dur=" in header
+    # Fora de uma requisição as fases alimentam apenas o histograma
+    with metrics.phase("parse"):
+        pass
+    assert set(timer.timings) == {"parse"}
+
+
+def test_server_timing_e_metricas(client, auth_headers, monkeypatch):
+    """
+    Verifica o cabeçalho Server-Timing com as fases da consulta e a rota /metrics.
+    """
+    def fake_scrape(category, year=None, subcategory=None):
+        with metrics.phase("upstream"):
+            pass
+        return Table("Teste", ["País"], ["text"], [], "")
+
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+    response = client.get("/api/exportacao?subcategoria=espumantes", headers=auth_headers)
+
+    assert "upstream;dur=" in response.headers["Server-Timing"]
+    assert "serialize;dur=" in response.headers["Server-Timing"]
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'vitibrasil_http_requests_total{endpoint="get_exportacao",method="GET",status="200"}' in text
+    assert 'vitibrasil_phase_duration_seconds_count{phase="upstream"}' in text
+    assert "vitibrasil_cache_hit_ratio" in text
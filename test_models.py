@@ -0,0 +1,57 @@
+import pytest
+
+from benchmarks.bench_parser import load_fixtures
+from models import Table, format_number, parse_number
+from parsing import parse_page
+
+
+@pytest.mark.parametrize("text,value", [
+    ("1.234.567", 1234567),
+    ("0", 0),
+    ("123", 123),
+    ("1.234,56", 1234.56),
+    ("12,5", 12.5),
+    ("-", None),
+    ("nd", None),
+    ("", None),
+])
+def test_conversao_de_numeros(text, value):
+    assert parse_number(text) == value
+    if text not in ("", "nd"):
+        assert format_number(value) == text
+
+
+def test_texto_nao_numerico():
+    with pytest.raises(ValueError):
+        parse_number("Alemanha")
+
+
+@pytest.mark.parametrize("name", sorted(load_fixtures()))
+def test_formato_original_preservado(name):
+    """
+    Verifica que a serialização por linhas reproduz os textos das células (com "nd" como "-").
+    """
+    page = parse_page(load_fixtures()[name])
+    table = Table.from_parsed(page, "http://teste")
+
+    expected = [
+        {header: "-" if cell == "nd" else cell for header, cell in zip(page.headers, cells)}
+        for cells in page.rows
+    ]
+    assert table.to_dict()["data"] == expected
+
+
+def test_tabela_tipada_e_colunar():
+    """
+    Verifica os tipos das colunas, os níveis das linhas e a serialização em colunas.
+    """
+    table = Table.from_parsed(parse_page(load_fixtures()["producao_2023.html"]), "http://teste")
+
+    assert table.types == ["text", "int"]
+    assert [row.level for row in table.rows[:2]] == ["item", "subitem"]
+    assert table.rows[-1].level == "total"
+
+    columnar = table.to_columnar()
+    assert columnar["columns"][0][:2] == ["VINHO DE MESA", "Tinto"]
+    assert all(value is None or isinstance(value, int) for value in columnar["columns"][1])
+    assert len(columnar["levels"]) == len(table.rows)
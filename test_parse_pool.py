@@ -0,0 +1,47 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from models import Table
+from parse_pool import ParsePool, ParsePoolBusyError, from_compact, parse_compact
+from parsing import parse_page
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "exportacao_vinhos_2023.html")
+URL = "http://teste/index.php?opcao=opt_06"
+
+with open(FIXTURE, "rb") as f:
+    HTML = f.read()
+
+
+def test_forma_compacta_preserva_a_tabela():
+    esperada = Table.from_parsed(parse_page(HTML.decode("utf-8")), URL)
+
+    assert from_compact(parse_compact(HTML, "utf-8"), URL) == esperada
+
+
+def test_extracao_no_pool_de_processos():
+    """
+    Verifica que extrações simultâneas no pool retornam as mesmas tabelas da extração na thread.
+    """
+    esperada = ParsePool(0).parse(HTML, "utf-8", URL)
+    pool = ParsePool(2)
+    try:
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            tabelas = list(executor.map(lambda _: pool.parse(HTML, "utf-8", URL), range(6)))
+    finally:
+        pool.close()
+
+    assert tabelas == [esperada] * 6
+    assert pool.stats()["pooled"] == 6
+    assert pool.stats()["pending"] == 0
+
+
+def test_pool_saturado_recusa_extracao():
+    pool = ParsePool(1, max_pending=1, wait_timeout=0.05)
+    pool._slots.acquire()
+
+    with pytest.raises(ParsePoolBusyError):
+        pool.parse(HTML, "utf-8", URL)
+    assert pool.stats()["rejected"] == 1
+    assert pool._executor is None
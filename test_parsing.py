@@ -0,0 +1,52 @@
+import pytest
+
+from benchmarks.bench_parser import load_fixtures, parse_legacy
+from parsing import BACKENDS, DEFAULT_TITLE, parse_page
+
+PAGINAS_ESPECIAIS = {
+    "sem_tabela": "<html><body><h3>Título</h3><p>Sem dados</p></body></html>",
+    "sem_titulo": "<html><body><table><tr><th>A</th><th>B</th></tr><tr><td>1</td></tr></table></body></html>",
+    "tabela_sem_classe_antes": (
+        "<html><body><table><tr><td>menu</td></tr></table><div class='conteudo'><h3> Título </h3>"
+        "<table class='tb_base tabela'><tr><th>Produto</th><th>Qtd</th></tr>"
+        "<tr><td class='tb_item'>VINHO</td><td>1.000</td><td>extra</td></tr><tr></tr></table></div></body></html>"
+    ),
+    "primeira_linha_vazia": "<table><tr></tr><tr><td>1</td><td>2</td></tr></table>",
+}
+
+
+@pytest.mark.parametrize("backend", sorted(BACKENDS))
+@pytest.mark.parametrize("name,html", sorted({**load_fixtures(), **PAGINAS_ESPECIAIS}.items()))
+def test_backends_equivalentes_a_extracao_original(backend, name, html):
+    """
+    Verifica que todos os backends produzem o mesmo resultado da extração original.
+    """
+    assert parse_page(html, backend) == parse_legacy(html)
+
+
+def test_extracao_da_pagina_de_exportacao():
+    """
+    Verifica o conteúdo extraído de uma página salva.
+    """
+    page = parse_page(load_fixtures()["exportacao_vinhos_2023.html"])
+
+    assert page.title == "Exportação de vinhos de mesa - 2023"
+    assert page.headers == ["Países", "Quantidade (Kg)", "Valor (US$)"]
+    assert page.rows[0][0] == "Afeganistão"
+    assert page.rows[-1][0] == "Total"
+    assert set(page.levels) == {None}
+
+
+def test_niveis_de_produto_e_subitem():
+    """
+    Verifica a identificação das linhas de produto e de subitem.
+    """
+    page = parse_page(load_fixtures()["producao_2023.html"])
+
+    assert page.rows[0][0] == "VINHO DE MESA" and page.levels[0] == "item"
+    assert page.rows[1][0] == "Tinto" and page.levels[1] == "subitem"
+    assert page.levels[-1] is None
+
+
+def test_pagina_sem_tabela():
+    assert parse_page("<html><body></body></html>") == (DEFAULT_TITLE, None, [], [])
@@ -0,0 +1,77 @@
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from models import Table
+from parsing import ParsedPage
+from query import QueryError, TableQuery
+
+TABELA = Table.from_parsed(
+    ParsedPage(
+        "Exportação de vinhos - 2023",
+        ["Países", "Quantidade (Kg)", "Valor (US$)"],
+        [
+            ["Alemanha", "1.000", "5.000"],
+            ["África do Sul", "-", "-"],
+            ["Paraguai", "250.000", "800.000"],
+            ["Estados Unidos", "40.000", "120.000"],
+            ["Total", "291.000", "925.000"],
+        ],
+        [None] * 5,
+    ),
+    "http://teste",
+)
+
+
+def consultar(**args):
+    return TableQuery.from_args(MultiDict(args)).apply(TABELA)
+
+
+def test_sem_parametros_nao_cria_consulta():
+    assert TableQuery.from_args(MultiDict({"ano": "2023"})) is None
+
+
+def test_busca_sem_acentos_e_nivel():
+    tabela, total = consultar(busca="AFRICA")
+    assert [row.values[0] for row in tabela.rows] == ["África do Sul"]
+    assert total == 1
+
+    tabela, _ = consultar(nivel="total")
+    assert [row.values[0] for row in tabela.rows] == ["Total"]
+
+    tabela, _ = consultar(nivel="-total")
+    assert len(tabela.rows) == 4
+
+
+def test_limites_numericos_ignoram_valores_ausentes():
+    tabela, _ = consultar(min_quantidade="1000", max_valor="200000")
+    assert [row.values[0] for row in tabela.rows] == ["Alemanha", "Estados Unidos"]
+
+
+def test_projecao_ordenacao_e_paginacao():
+    query = TableQuery.from_args(MultiDict({"colunas": "valor,paises", "ordem": "-valor", "limite": "2", "deslocamento": "1"}))
+    tabela, total = query.apply(TABELA)
+    assert tabela.headers == ["Valor (US$)", "Países"]
+    assert tabela.types == ["int", "text"]
+    assert [row.values for row in tabela.rows] == [(800000, "Paraguai"), (120000, "Estados Unidos")]
+    assert total == 5
+    assert query.pagination(total) == {"offset": 1, "limit": 2, "total": 5, "next_offset": 3}
+
+
+def test_valores_ausentes_ficam_no_final():
+    tabela, _ = consultar(ordem="quantidade")
+    assert [row.values[0] for row in tabela.rows][-1] == "África do Sul"
+
+
+@pytest.mark.parametrize("args", [
+    {"colunas": "inexistente"},
+    {"min_paises": "10"},
+])
+def test_colunas_invalidas(args):
+    with pytest.raises(QueryError):
+        consultar(**args)
+
+
+@pytest.mark.parametrize("args", [{"limite": "-1"}, {"min_valor": "muito"}, {"nivel": "produto"}])
+def test_parametros_invalidos(args):
+    with pytest.raises(QueryError):
+        TableQuery.from_args(MultiDict(args))
@@ -0,0 +1,346 @@
+import gzip
+import io
+import json
+from datetime import date
+
+import pytest
+
+import app as api
+from models import Table
+from parsing import ParsedPage
+from storage import DataStore
+
+
+def fake_scrape(category, year=None, subcategory=None):
+    if year == "2001":
+        return {"error": "Erro ao acessar o site da Embrapa: timeout"}
+    page = ParsedPage(f"Exportação - {year}", ["Países", "Quantidade (Kg)"], [["Alemanha", year]], [None])
+    return Table.from_parsed(page, f"http://teste/{year}")
+
+
+def test_intervalo_de_anos(client, auth_headers, monkeypatch):
+    """
+    Verifica a combinação de vários anos e o relato de falhas por ano.
+    """
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    response = client.get("/api/exportacao?ano_inicio=2000&ano_fim=2002&subcategoria=vinhos", headers=auth_headers)
+
+    assert response.status_code == 200
+    body = response.json
+    assert body["headers"] == ["year", "Países", "Quantidade (Kg)"]
+    assert [row["year"] for row in body["data"]] == [2000, 2002]
+    assert list(body["errors"]) == ["2001"]
+
+
+def test_intervalo_de_anos_em_colunas(client, auth_headers, monkeypatch):
+    """
+    Verifica o formato em colunas, com valores tipados, para um intervalo de anos.
+    """
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    response = client.get("/api/producao?ano_inicio=2002&ano_fim=2003&layout=colunas", headers=auth_headers)
+
+    body = response.json
+    assert body["types"] == ["int", "text", "int"]
+    assert body["columns"] == [[2002, 2003], ["Alemanha", "Alemanha"], [2002, 2003]]
+
+
+@pytest.mark.parametrize("query", ["ano_inicio=abc", "ano_inicio=2010&ano_fim=2000", "ano_inicio=1900"])
+def test_intervalo_invalido(client, auth_headers, query):
+    """
+    Verifica a validação dos parâmetros ano_inicio e ano_fim.
+    """
+    response = client.get(f"/api/producao?{query}", headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_formato_csv_por_parametro_e_accept(client, auth_headers, monkeypatch):
+    """
+    Verifica a escolha do formato CSV pelo parâmetro formato e pelo cabeçalho Accept.
+    """
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    with client.get("/api/producao?ano_inicio=2000&ano_fim=2002&formato=csv", headers=auth_headers) as response:
+        assert response.mimetype == "text/csv"
+        por_parametro = response.data
+    with client.get("/api/producao?ano_inicio=2000&ano_fim=2002", headers={**auth_headers, "Accept": "text/csv"}) as response:
+        por_accept = response.data
+
+    assert por_parametro == por_accept
+    assert por_parametro.decode().splitlines() == [
+        "ano,nivel,Países,Quantidade (Kg),erro",
+        "2000,,Alemanha,2000,",
+        "2001,,,,Erro ao acessar o site da Embrapa: timeout",
+        "2002,,Alemanha,2002,",
+    ]
+    assert client.get("/api/producao?formato=xml", headers=auth_headers).status_code == 400
+
+
+def test_exportacao_em_lote(client, auth_headers, monkeypatch):
+    """
+    Verifica a exportação de todas as subcategorias em NDJSON, com as falhas como linhas de erro.
+    """
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    response = client.get("/api/exportar/exportacao?ano_inicio=2000&ano_fim=2001", headers=auth_headers)
+
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.data.decode().splitlines()]
+    subcategorias = list(api.SUBCATEGORY_OPTIONS["exportacao"])
+    assert [line["subcategoria"] for line in lines if "error" not in line] == subcategorias
+    assert [line["ano"] for line in lines if "error" in line] == [2001] * len(subcategorias)
+    assert lines[0] == {"subcategoria": "vinhos", "ano": 2000, "nivel": None, "Países": "Alemanha", "Quantidade (Kg)": 2000}
+
+
+def test_exportacao_em_parquet(client, auth_headers, monkeypatch):
+    """
+    Verifica que o Parquet gerado em streaming pode ser lido diretamente.
+    """
+    pq = pytest.importorskip("pyarrow.parquet")
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    response = client.get("/api/exportar/producao?ano_inicio=2002&ano_fim=2004&formato=parquet", headers=auth_headers)
+
+    table = pq.read_table(io.BytesIO(response.data)).to_pydict()
+    assert table["ano"] == [2002, 2003, 2004]
+    assert table["Quantidade (Kg)"] == [2002.0, 2003.0, 2004.0]
+
+
+def test_exportacao_em_arrow_com_tipos_diferentes_e_erros(client, auth_headers, monkeypatch, tmp_path):
+    """
+    Verifica que texto em uma coluna numérica do esquema vira nulo, sem interromper o
+    streaming, e que as tabelas não obtidas aparecem na coluna erro.
+    """
+    pa = pytest.importorskip("pyarrow")
+
+    def scrape(category, year=None, subcategory=None):
+        if year == "2001":
+            return {"error": "Erro ao acessar o site da Embrapa: timeout"}
+        valor = "nd" if year == "2002" else year
+        page = ParsedPage(f"Produção - {year}", ["Produto", "Quantidade (L.)"], [["Vinho", valor]], [None])
+        return Table.from_parsed(page, f"http://teste/{year}")
+
+    monkeypatch.setattr(api, "_scrape_embrapa_data", scrape)
+    monkeypatch.setattr(api, "data_store", DataStore(str(tmp_path / "vitibrasil.db")))
+    api.response_cache.clear()
+
+    response = client.get("/api/exportar/producao?ano_inicio=2000&ano_fim=2002&formato=arrow", headers=auth_headers)
+    api.response_cache.clear()
+
+    table = pa.ipc.open_stream(response.data).read_all().to_pydict()
+    assert table["ano"] == [2000, 2001, 2002]
+    assert table["Quantidade (L.)"] == [2000.0, None, None]
+    assert table["erro"] == [None, "Erro ao acessar o site da Embrapa: timeout", None]
+
+
+def test_etag_e_304(client, auth_headers, monkeypatch):
+    """
+    Verifica a ETag, o Cache-Control de anos encerrados e a resposta 304.
+    """
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    response = client.get("/api/exportacao?ano=2000&subcategoria=vinhos", headers=auth_headers)
+    etag = response.headers["ETag"]
+
+    assert "immutable" in response.headers["Cache-Control"]
+    assert response.headers["Last-Modified"]
+
+    repetida = client.get(
+        "/api/exportacao?ano=2000&subcategoria=vinhos", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert repetida.status_code == 304
+    assert repetida.data == b""
+
+    outro_layout = client.get(
+        "/api/exportacao?ano=2000&subcategoria=vinhos&layout=colunas", headers={**auth_headers, "If-None-Match": etag}
+    )
+    assert outro_layout.status_code == 200
+    assert outro_layout.headers["ETag"] != etag
+
+    # O ano anterior ainda é atualizado pelo agendador: revalidado, sem immutable
+    ano_anterior = client.get(f"/api/exportacao?ano={date.today().year - 1}&subcategoria=vinhos", headers=auth_headers)
+    assert "immutable" not in ano_anterior.headers["Cache-Control"]
+    assert "must-revalidate" in ano_anterior.headers["Cache-Control"]
+
+
+def test_erros_nao_sao_armazenados_em_cache(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    response = client.get("/api/producao?ano=2001", headers=auth_headers)
+
+    assert "error" in response.json
+    assert response.headers["Cache-Control"] == "no-store"
+
+
+def test_compressao_gzip(client, auth_headers, monkeypatch):
+    """
+    Verifica a compressão das respostas grandes conforme o Accept-Encoding.
+    """
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+    url = "/api/producao?ano_inicio=1970&ano_fim=2000"
+
+    sem_compressao = client.get(url, headers=auth_headers)
+    comprimida = client.get(url, headers={**auth_headers, "Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in sem_compressao.headers
+    assert comprimida.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(comprimida.data) == sem_compressao.data
+
+
+def test_corpo_serializado_reutilizado(client, auth_headers, monkeypatch):
+    """
+    Verifica que o corpo JSON (e a versão comprimida) é gerado uma única vez por versão dos
+    dados e que uma nova versão gera um novo corpo.
+    """
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+    url = "/api/producao?ano_inicio=1970&ano_fim=1990"
+    gzip_headers = {**auth_headers, "Accept-Encoding": "gzip"}
+    antes = api.encoded_responses.stats()
+
+    primeira = client.get(url, headers=gzip_headers)
+    segunda = client.get(url, headers=gzip_headers)
+    sem_compressao = client.get(url, headers=auth_headers)
+
+    depois = api.encoded_responses.stats()
+    assert depois["misses"] - antes["misses"] == 1
+    assert depois["hits"] - antes["hits"] == 2
+    assert depois["compressions"] - antes["compressions"] == 1
+    assert segunda.data == primeira.data
+    assert json.loads(gzip.decompress(segunda.data)) == sem_compressao.json
+    assert sem_compressao.json["titles"]["1980"] == "Exportação - 1980"
+
+    atualizada = fake_scrape("producao", "1980")
+    atualizada.title = "Atualizada"
+    api.response_cache.set(("producao", "1980", None), atualizada)
+    atualizada = client.get(url, headers=auth_headers)
+
+    assert atualizada.headers["ETag"] != sem_compressao.headers["ETag"]
+    assert atualizada.json["titles"]["1980"] == "Atualizada"
+
+
+def test_servicos_recriados_apos_fork(monkeypatch):
+    """
+    Verifica que create_app recria os serviços em um novo processo e os mantém no mesmo processo.
+    """
+    for name in ("response_cache", "data_store", "embrapa_client", "fetch_executor", "request_counter"):
+        monkeypatch.setattr(api, name, getattr(api, name))
+    anterior = api.response_cache
+
+    assert api.create_app() is api.app
+    assert api.response_cache is anterior
+
+    # Simula o worker do gunicorn após o fork: o processo atual não criou os serviços
+    monkeypatch.setattr(api, "_services_pid", -1)
+    api.create_app()
+    try:
+        assert api.response_cache is not anterior
+        assert api.fetch_executor.submit(lambda: 42).result() == 42
+    finally:
+        api.shutdown_services()
+
+
+def test_consultas_em_lote(client, auth_headers, monkeypatch):
+    """
+    Verifica /api/batch: resultados por chave, consultas repetidas e erros individuais.
+    """
+    chamadas = []
+
+    def contar_scrape(category, year=None, subcategory=None):
+        chamadas.append((category, year, subcategory))
+        return fake_scrape(category, year, subcategory)
+
+    api.response_cache.clear()
+    monkeypatch.setattr(api, "_scrape_embrapa_data", contar_scrape)
+    consultas = [
+        {"categoria": "importacao", "ano": 2005, "subcategoria": "espumantes"},
+        {"categoria": "importacao", "ano": "2005", "subcategoria": "espumantes"},
+        {"categoria": "comercializacao", "ano": 2001},
+    ]
+
+    response = client.post("/api/batch", json={"consultas": consultas}, headers=auth_headers)
+
+    assert response.status_code == 200
+    assert sorted(response.json["results"]) == ["comercializacao/2001", "importacao/2005/espumantes"]
+    assert response.json["results"]["importacao/2005/espumantes"]["data"] == [
+        {"Países": "Alemanha", "Quantidade (Kg)": "2.005"}
+    ]
+    assert response.json["errors"] == ["comercializacao/2001"]
+    assert chamadas.count(("importacao", "2005", "espumantes")) == 1
+
+
+def test_consultas_em_lote_ndjson(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+    consultas = [{"categoria": "producao", "ano": ano} for ano in (1990, 1991, 1992)]
+
+    with client.post(
+        "/api/batch?formato=ndjson", json={"consultas": consultas, "layout": "colunas"}, headers=auth_headers
+    ) as response:
+        linhas = [json.loads(linha) for linha in response.data.decode("utf-8").splitlines()]
+
+    assert response.mimetype == "application/x-ndjson"
+    assert sorted(linha["key"] for linha in linhas) == ["producao/1990", "producao/1991", "producao/1992"]
+    assert all(linha["result"]["columns"][1] == [int(linha["key"][-4:])] for linha in linhas)
+
+
+@pytest.mark.parametrize("corpo", [
+    {},
+    {"consultas": []},
+    {"consultas": [{"categoria": "inexistente"}]},
+    {"consultas": [{"categoria": "producao", "subcategoria": "vinhos"}]},
+    {"consultas": [{"categoria": "producao", "ano": 1900}]},
+])
+def test_consultas_em_lote_invalidas(client, auth_headers, corpo):
+    response = client.post("/api/batch", json=corpo, headers=auth_headers)
+    assert response.status_code == 400
+
+
+def test_filtros_e_paginacao(client, auth_headers, monkeypatch):
+    """
+    Verifica os parâmetros de consulta nas rotas de dados.
+    """
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    response = client.get(
+        "/api/importacao?ano=2010&subcategoria=vinhos&colunas=quantidade&limite=1", headers=auth_headers
+    )
+    assert response.json["headers"] == ["Quantidade (Kg)"]
+    assert response.json["data"] == [{"Quantidade (Kg)": "2.010"}]
+    assert response.json["pagination"]["total"] == 1
+    assert response.headers["X-Total-Count"] == "1"
+
+    vazio = client.get("/api/importacao?ano=2010&subcategoria=vinhos&min_quantidade=5000", headers=auth_headers)
+    assert vazio.json["data"] == []
+
+    intervalo = client.get(
+        "/api/importacao?ano_inicio=2010&ano_fim=2011&subcategoria=vinhos&max_quantidade=2010", headers=auth_headers
+    )
+    assert [linha["year"] for linha in intervalo.json["data"]] == [2010]
+
+    assert client.get("/api/importacao?ano=2010&colunas=inexistente", headers=auth_headers).status_code == 400
+    assert client.get("/api/importacao?ano_inicio=2010&limite=1", headers=auth_headers).status_code == 400
+
+
+def test_registro_de_mudancas_paginado(client, auth_headers, monkeypatch, tmp_path):
+    """
+    Verifica /api/changes: paginação por since/limite e validação dos parâmetros.
+    """
+    store = DataStore(str(tmp_path / "mudancas.db"))
+    monkeypatch.setattr(api, "data_store", store)
+    for year in (2020, 2021, 2022):
+        store.save_table("producao", year, None, fake_scrape("producao", str(year)))
+
+    primeira = client.get("/api/changes?limite=2", headers=auth_headers).json
+    assert [c["year"] for c in primeira["changes"]] == [2020, 2021]
+    assert primeira["has_more"] and primeira["last_seq"] == 3
+
+    segunda = client.get(f"/api/changes?since={primeira['next']}&limite=2&diff=1", headers=auth_headers).json
+    assert [c["seq"] for c in segunda["changes"]] == [3]
+    assert segunda["changes"][0]["diff"] is None
+    assert not segunda["has_more"]
+
+    vazia = client.get(f"/api/changes?since={segunda['next']}", headers=auth_headers).json
+    assert vazia["changes"] == [] and vazia["next"] == 3
+
+    assert client.get("/api/changes?since=-1", headers=auth_headers).status_code == 400
+    assert client.get("/api/changes?categoria=vinhos", headers=auth_headers).status_code == 400
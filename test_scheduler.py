@@ -0,0 +1,163 @@
+import os
+import threading
+import time
+from datetime import date
+
+import app as api
+import parse_pool
+from models import Row, Table
+from scheduler import Job, RateLimiter, RequestCounter, Scheduler
+from storage import DataStore
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "exportacao_vinhos_2023.html")
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode("utf-8")
+        self.encoding = "utf-8"
+
+
+def test_rate_limiter_espaca_requisicoes():
+    """
+    Verifica o intervalo mínimo entre requisições.
+    """
+    limiter = RateLimiter(0.05)
+    inicio = time.monotonic()
+    for _ in range(3):
+        assert limiter.wait()
+    assert time.monotonic() - inicio >= 0.1
+
+
+def test_agendador_executa_tarefas_e_registra_estado():
+    """
+    Verifica a execução das tarefas e o estado exposto (resultado, duração e erros).
+    """
+    executou = threading.Event()
+
+    def tarefa(stop_event):
+        executou.set()
+        return {"ok": 1}
+
+    def falha(stop_event):
+        raise RuntimeError("falhou")
+
+    agendador = Scheduler([Job("tarefa", tarefa), Job("falha", falha), Job("depois", tarefa, 60, run_at_start=False)])
+    agendador.start()
+    try:
+        assert executou.wait(1)
+        for _ in range(100):
+            if agendador.status()["jobs"]["falha"]["runs"]:
+                break
+            time.sleep(0.01)
+        status = agendador.status()
+    finally:
+        agendador.stop()
+
+    assert status["running"] and status["leader"]
+    assert status["jobs"]["tarefa"]["last_result"] == {"ok": 1}
+    assert status["jobs"]["tarefa"]["next_run_in"] is None
+    assert status["jobs"]["falha"]["errors"] == 1
+    assert status["jobs"]["falha"]["last_error"] == "falhou"
+    assert status["jobs"]["depois"]["runs"] == 0
+
+
+def test_tarefas_exclusivas_em_um_processo(tmp_path):
+    """
+    Verifica que apenas o detentor do lock executa as tarefas exclusivas.
+    """
+    execucoes = []
+    lock_path = str(tmp_path / "agendador.lock")
+    agendadores = [
+        Scheduler([Job("atualizacao", lambda stop, i=i: execucoes.append(i), exclusive=True)], lock_path)
+        for i in range(2)
+    ]
+    for agendador in agendadores:
+        agendador.start()
+    time.sleep(0.2)
+    lideres = [agendador.status()["leader"] for agendador in agendadores]
+    for agendador in agendadores:
+        agendador.stop()
+
+    assert sorted(lideres) == [False, True]
+    assert len(execucoes) == 1
+
+
+def test_atualizacao_detecta_mudancas_por_hash(monkeypatch):
+    """
+    Verifica que páginas sem mudança não são extraídas nem regravadas.
+    """
+    with open(FIXTURE, encoding="utf-8") as f:
+        html = f.read()
+    pagina = {"html": html}
+    extracoes = []
+    parse_page = parse_pool.parse_page
+
+    def contar_extracao(text):
+        extracoes.append(1)
+        return parse_page(text)
+
+    monkeypatch.setattr(api.embrapa_client, "get", lambda url: FakeResponse(pagina["html"]))
+    monkeypatch.setattr(parse_pool, "parse_page", contar_extracao)
+
+    assert api.refresh_embrapa_table("exportacao", "2019", "vinhos") == "changed"
+    assert api.response_cache.peek(("exportacao", "2019", "vinhos")) is not None
+    assert api.refresh_embrapa_table("exportacao", "2019", "vinhos") == "unchanged"
+    assert len(extracoes) == 1
+
+    # HTML diferente com o mesmo conteúdo: extraído, mas não regravado
+    atualizado_em = api.data_store.get_table("exportacao", "2019", "vinhos").fetched_at
+    pagina["html"] = html + "<!-- rodapé -->"
+    assert api.refresh_embrapa_table("exportacao", "2019", "vinhos") == "unchanged"
+    assert len(extracoes) == 2
+    assert api.data_store.get_table("exportacao", "2019", "vinhos").fetched_at == atualizado_em
+    assert api.refresh_embrapa_table("exportacao", "2019", "vinhos") == "unchanged"
+    assert len(extracoes) == 2
+
+
+def test_contadores_e_preaquecimento(monkeypatch):
+    """
+    Verifica a gravação dos contadores de acesso e o pré-aquecimento das consultas mais acessadas.
+    """
+    monkeypatch.setattr(api, "request_counter", RequestCounter())
+    monkeypatch.setattr(api, "_scrape_embrapa_data", lambda *args: Table("Teste", ["A"], ["text"], [], ""))
+    api.response_cache.clear()
+    for _ in range(3):
+        api.fetch_embrapa_table("importacao", "2021", "espumantes")
+    api.fetch_embrapa_table("producao")
+    api._flush_request_counts()
+
+    top = api.data_store.top_requested(2)
+    assert top[0] == ("importacao", "2021", "espumantes")
+    assert ("producao", None, None) in top
+
+    api.response_cache.clear()
+    resumo = api._prewarm_cache(RateLimiter(0), threading.Event())
+    assert resumo["loaded"] >= 2
+    assert api.response_cache.peek(("importacao", "2021", "espumantes")) is not None
+
+
+def test_invalidacao_das_tabelas_regravadas_por_outro_worker(monkeypatch, tmp_path):
+    """
+    Verifica que o ano anterior expira no cache e que as tabelas regravadas por outro
+    processo (registro de mudanças) são descartadas da memória deste.
+    """
+    ano_anterior = str(date.today().year - 1)
+    assert api._cache_ttl(ano_anterior) == api.app.config['CACHE_TTL_ANO_CORRENTE']
+    assert api._cache_ttl("2000") is None
+
+    monkeypatch.setattr(api, "data_store", DataStore(str(tmp_path / "vitibrasil.db")))
+    monkeypatch.setattr(api, "seen_version", 0)
+    antiga = Table("Antiga", ["A"], ["text"], [Row(("x",))], "")
+    api.response_cache.set(("producao", ano_anterior, None), antiga)
+    api.response_cache.set(("producao", "2000", None), antiga)
+
+    # Outro worker regrava a tabela no armazenamento local
+    api.data_store.save_table("producao", ano_anterior, None, Table("Nova", ["A"], ["text"], [Row(("y",))], ""))
+
+    assert api._invalidate_changed_tables() == {"changes": 1, "invalidated": 1}
+    assert api.response_cache.peek(("producao", ano_anterior, None)) is None
+    assert api.response_cache.peek(("producao", "2000", None)) is antiga
+    assert api._invalidate_changed_tables() == {"changes": 0, "invalidated": 0}
+    api.response_cache.clear()
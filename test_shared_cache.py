@@ -0,0 +1,131 @@
+import json
+import os
+import socket
+import time
+import zlib
+from datetime import datetime, timezone
+
+from cache import ResponseCache
+from models import Table
+from parsing import parse_page
+from shared_cache import MAX_ENTRY_BYTES, DiskBackend, RedisBackend, SharedCache, decode_table, encode_table
+
+FIXTURE = os.path.join(os.path.dirname(__file__), "benchmarks", "fixtures", "exportacao_vinhos_2023.html")
+
+with open(FIXTURE, encoding="utf-8") as f:
+    TABELA = Table.from_parsed(parse_page(f.read()), "http://teste", datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc))
+
+CHAVE = ("exportacao", "2023", "vinhos")
+
+
+def carregar_uma_vez():
+    chamadas = []
+
+    def loader():
+        chamadas.append(1)
+        return TABELA
+
+    return loader, chamadas
+
+
+def test_formato_das_entradas():
+    """
+    Verifica que a tabela serializada volta igual, com a data de obtenção e o hash, e é
+    menor que o JSON sem compressão da mesma tabela.
+    """
+    data = encode_table(TABELA)
+    tabela = decode_table(data)
+
+    assert tabela == TABELA
+    assert tabela.fetched_at == TABELA.fetched_at
+    assert tabela._hash == TABELA.content_hash()
+    assert len(data) < len(json.dumps(TABELA.to_columnar()).encode()) / 2
+
+
+def test_disco_compartilhado_entre_processos(tmp_path):
+    """
+    Verifica que dois caches (como dois workers) sobre o mesmo banco compartilham as
+    entradas, com o TTL restante e sem carregar a tabela novamente.
+    """
+    caminho = str(tmp_path / "cache.db")
+    worker_a = ResponseCache(shared=SharedCache(DiskBackend(caminho)))
+    worker_b = ResponseCache(shared=SharedCache(DiskBackend(caminho)))
+    loader, chamadas = carregar_uma_vez()
+
+    worker_a.get_or_load(CHAVE, loader, ttl=60)
+    assert worker_b.get_or_load(CHAVE, loader, ttl=60) == TABELA
+    assert len(chamadas) == 1
+    assert worker_b.stats()["shared"]["hits"] == 1
+
+    worker_a.set(("producao", None, None), TABELA, ttl=0.05)
+    time.sleep(0.1)
+    assert worker_b.load_shared(("producao", None, None)) is None
+
+    # O banco sobrevive ao reinício
+    reiniciado = ResponseCache(shared=SharedCache(DiskBackend(caminho)))
+    assert reiniciado.get_or_load(CHAVE, loader, ttl=60) == TABELA
+    assert len(chamadas) == 1
+
+
+def test_redis(redis_server):
+    shared = SharedCache(RedisBackend(redis_server.url))
+    worker_a = ResponseCache(shared=shared)
+    worker_b = ResponseCache(shared=SharedCache(RedisBackend(redis_server.url)))
+    loader, chamadas = carregar_uma_vez()
+
+    worker_a.get_or_load(CHAVE, loader, ttl=60)
+    assert worker_b.get_or_load(CHAVE, loader, ttl=60) == TABELA
+    assert len(chamadas) == 1
+    assert 59 < shared.get(CHAVE)[1] <= 60
+
+    worker_a.clear()
+    assert redis_server.data == {}
+
+
+def test_falha_do_backend_nao_interrompe():
+    """
+    Verifica que, com o servidor indisponível, a tabela é carregada normalmente e o
+    servidor deixa de ser consultado por alguns segundos.
+    """
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        porta = sock.getsockname()[1]
+    cache = ResponseCache(shared=SharedCache(RedisBackend(f"redis://127.0.0.1:{porta}/0", timeout=0.2)))
+    loader, chamadas = carregar_uma_vez()
+
+    assert cache.get_or_load(CHAVE, loader, ttl=60) == TABELA
+    assert cache.get_or_load(("producao", None, None), loader, ttl=60) == TABELA
+    stats = cache.stats()["shared"]
+    assert len(chamadas) == 2
+    assert stats["errors"] == 1
+    assert stats["skipped"] == 3  # gravação da primeira tabela, consulta e gravação da segunda
+    assert stats["available"] is False
+
+
+def test_entrada_corrompida_tratada_como_ausente(tmp_path):
+    backend = DiskBackend(str(tmp_path / "cache.db"))
+    shared = SharedCache(backend)
+    backend.set(shared._key(CHAVE), b"invalido")
+
+    assert shared.get(CHAVE) is None
+    assert shared.stats()["errors"] == 1
+
+
+def test_entrada_com_formato_invalido_tratada_como_ausente(tmp_path):
+    """
+    Verifica a validação das entradas lidas do backend: estrutura, tipos das células e
+    tamanho descomprimido.
+    """
+    backend = DiskBackend(str(tmp_path / "cache.db"))
+    shared = SharedCache(backend)
+    celula_invalida = ["T", ["A"], ["text"], [[{"a": 1}]], [None], "http://teste", None, "hash"]
+    entradas = [
+        zlib.compress(json.dumps(["x"] * 8).encode()),
+        zlib.compress(json.dumps(celula_invalida).encode()),
+        zlib.compress(b" " * (MAX_ENTRY_BYTES + 1)),
+    ]
+    for entrada in entradas:
+        backend.set(shared._key(CHAVE), entrada)
+        assert shared.get(CHAVE) is None
+
+    assert shared.stats()["errors"] == len(entradas)
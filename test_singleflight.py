@@ -0,0 +1,107 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app as api
+from models import Table
+from singleflight import SingleFlight
+
+
+def test_chamadas_simultaneas_compartilham_execucao():
+    """
+    Verifica que threads concorrentes com a mesma chave executam a função uma única vez.
+    """
+    flight = SingleFlight()
+    execucoes = []
+    liberar = threading.Event()
+
+    def carregar():
+        execucoes.append(1)
+        liberar.wait(1)
+        return "valor"
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        futures = [executor.submit(flight.do, "url", carregar) for _ in range(8)]
+        while flight.stats()["calls"] < 8:
+            time.sleep(0.01)
+        liberar.set()
+        resultados = [future.result() for future in futures]
+
+    assert resultados == ["valor"] * 8
+    assert len(execucoes) == 1
+    assert flight.stats()["shared"] == 7
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_erro_repassado_a_quem_aguardava():
+    """
+    Verifica que a exceção da execução compartilhada chega a todas as chamadas.
+    """
+    flight = SingleFlight()
+    liberar = threading.Event()
+
+    def falhar():
+        liberar.wait(1)
+        raise RuntimeError("falhou")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(flight.do, "url", falhar) for _ in range(2)]
+        while flight.stats()["calls"] < 2:
+            time.sleep(0.01)
+        liberar.set()
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+
+
+def test_coalescencia_entre_processos(tmp_path):
+    """
+    Verifica que o segundo processo espera o lock e usa o resultado gravado pelo primeiro.
+    """
+    primeiro = SingleFlight(lock_dir=str(tmp_path))
+    segundo = SingleFlight(lock_dir=str(tmp_path))
+    armazenado = {}
+    iniciou = threading.Event()
+    execucoes = []
+
+    def carregar_primeiro():
+        iniciou.set()
+        time.sleep(0.2)
+        armazenado["url"] = "do primeiro"
+        return "do primeiro"
+
+    def carregar_segundo():
+        execucoes.append(1)
+        return "do segundo"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        future = executor.submit(primeiro.do, "url", carregar_primeiro)
+        assert iniciou.wait(1)
+        resultado = segundo.do("url", carregar_segundo, recheck=lambda: armazenado.get("url"))
+        assert future.result() == "do primeiro"
+
+    assert resultado == "do primeiro"
+    assert execucoes == []
+    assert segundo.stats()["rechecked"] == 1
+
+
+def test_consultas_simultaneas_acessam_o_site_uma_vez(monkeypatch):
+    """
+    Verifica que requisições simultâneas à mesma página geram um único acesso ao site da Embrapa.
+    """
+    chamadas = []
+
+    def fake_scrape(category, year=None, subcategory=None):
+        chamadas.append((category, year, subcategory))
+        time.sleep(0.1)
+        return Table("Teste", ["País"], ["text"], [], "")
+
+    api.response_cache.clear()
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+    with ThreadPoolExecutor(max_workers=10) as executor:
+        resultados = list(executor.map(lambda _: api.fetch_embrapa_table("exportacao", None, "vinhos"), range(10)))
+
+    assert chamadas == [("exportacao", None, "vinhos")]
+    assert all(isinstance(resultado, Table) for resultado in resultados)
@@ -0,0 +1,129 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+import pytest
+
+import app as api
+from models import Table
+from parsing import ParsedPage
+from snapshot import FORMAT_VERSION, HEADER, SnapshotFormatError, TableSnapshot, build
+from storage import DataStore
+
+
+def tabela(year, valor):
+    page = ParsedPage(f"Exportação - {year}", ["Países", "Quantidade (Kg)"], [["Alemanha", valor], ["Total", valor]], [None, None])
+    return Table.from_parsed(page, f"http://teste/{year}", datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+
+@pytest.fixture
+def snapshot_path(tmp_path):
+    store = DataStore(str(tmp_path / "origem.db"))
+    store.save_table("exportacao", 2000, "vinhos", tabela(2000, "1.000"))
+    store.save_table("exportacao", 2001, "vinhos", tabela(2001, "2.000"))
+    store.save_table("producao", 2000, None, tabela(2000, "3.000"))
+    path = str(tmp_path / "snapshot.bin")
+    assert build(store, path) == {"tables": 3, "bytes": os.path.getsize(path)}
+    return path
+
+
+def test_gera_e_le_snapshot(snapshot_path):
+    """
+    Verifica que as tabelas lidas do snapshot são iguais às gravadas, com o hash e a data da obtenção.
+    """
+    snapshot = TableSnapshot(snapshot_path)
+    try:
+        lida = snapshot.get_table("exportacao", "2001", "vinhos")
+        assert lida == tabela(2001, "2.000")
+        assert lida.content_hash() == tabela(2001, "2.000").content_hash()
+        assert lida.fetched_at == datetime(2024, 1, 1, tzinfo=timezone.utc)
+        assert snapshot.get_table("producao", 2000) == tabela(2000, "3.000")
+        assert snapshot.get_table("producao", 2001) is None
+        assert len(snapshot) == 3
+        assert (snapshot.stats()["hits"], snapshot.stats()["misses"]) == (2, 1)
+    finally:
+        snapshot.close()
+
+
+def test_snapshot_invalido(snapshot_path, tmp_path):
+    with open(snapshot_path, "r+b") as file:
+        header = bytearray(file.read(HEADER.size))
+        header[8:12] = (FORMAT_VERSION + 1).to_bytes(4, "little")
+        file.seek(0)
+        file.write(header)
+    with pytest.raises(SnapshotFormatError):
+        TableSnapshot(snapshot_path)
+
+    vazio = tmp_path / "vazio.bin"
+    vazio.write_bytes(b"")
+    with pytest.raises(SnapshotFormatError):
+        TableSnapshot(str(vazio))
+    # Na inicialização, um snapshot inválido é ignorado
+    assert api._open_snapshot(snapshot_path) is None
+    assert api._open_snapshot(str(tmp_path / "inexistente.bin")) is None
+
+
+def test_ano_fechado_servido_do_snapshot(client, auth_headers, snapshot_path, tmp_path, monkeypatch):
+    """
+    Verifica que, com o armazenamento local vazio, o ano encerrado vem do snapshot sem acessar o site.
+    """
+    snapshot = TableSnapshot(snapshot_path)
+    monkeypatch.setattr(api, "table_snapshot", snapshot)
+    monkeypatch.setattr(api, "data_store", DataStore(str(tmp_path / "vazio.db")))
+
+    def sem_acesso(*args):
+        raise AssertionError("o site não deveria ser acessado")
+
+    monkeypatch.setattr(api, "_scrape_embrapa_data", sem_acesso)
+    try:
+        response = client.get("/api/exportacao?ano=2000&subcategoria=vinhos", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json["data"] == [{"Países": "Alemanha", "Quantidade (Kg)": "1.000"}, {"Países": "Total", "Quantidade (Kg)": "1.000"}]
+        assert client.get("/api/cache", headers=auth_headers).json["snapshot"]["hits"] == 1
+    finally:
+        api.response_cache.clear()
+        snapshot.close()
+
+
+def test_tabela_regravada_depois_do_snapshot(client, auth_headers, snapshot_path, tmp_path, monkeypatch):
+    """
+    Verifica que uma tabela regravada por uma nova ingestão depois da geração do snapshot é
+    servida do armazenamento local, na inicialização e durante a execução.
+    """
+    store = DataStore(str(tmp_path / "origem.db"))
+    store.save_table("exportacao", 2000, "vinhos", tabela(2000, "1.500"))
+    monkeypatch.setattr(api, "data_store", store)
+    monkeypatch.setattr(api, "seen_version", store.last_seq())
+    snapshot = api._open_snapshot(snapshot_path)
+    monkeypatch.setattr(api, "table_snapshot", snapshot)
+    try:
+        response = client.get("/api/exportacao?ano=2000&subcategoria=vinhos", headers=auth_headers)
+        assert response.json["data"][0]["Quantidade (Kg)"] == "1.500"
+        assert snapshot.stats()["outdated"] == 1
+
+        # Regravada com o serviço em execução: descartada pela tarefa de invalidação
+        store.save_table("exportacao", 2001, "vinhos", tabela(2001, "2.500"))
+        assert api._invalidate_changed_tables()["changes"] == 1
+        response = client.get("/api/exportacao?ano=2001&subcategoria=vinhos", headers=auth_headers)
+        assert response.json["data"][0]["Quantidade (Kg)"] == "2.500"
+        assert snapshot.get_table("producao", 2000) == tabela(2000, "3.000")
+    finally:
+        api.response_cache.clear()
+        snapshot.close()
+
+
+def test_bibliotecas_de_acesso_importadas_sob_demanda(tmp_path):
+    """
+    Verifica que a inicialização da API não importa o requests, as bibliotecas de extração nem o numpy.
+    """
+    code = (
+        "import sys, app; "
+        "print(sorted(m for m in ('requests', 'urllib3', 'bs4', 'lxml', 'selectolax', 'pyarrow', 'numpy') if m in sys.modules))"
+    )
+    env = {**os.environ, "EMBRAPA_DB_PATH": str(tmp_path / "vitibrasil.db"), "AGENDADOR_ATIVO": "0"}
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env, capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip() == "[]"
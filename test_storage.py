@@ -0,0 +1,125 @@
+import json
+import sqlite3
+
+import app as api
+from models import Table
+from parsing import ParsedPage
+from storage import DataStore
+
+TABELA = Table.from_parsed(
+    ParsedPage(
+        "Exportação de vinhos de mesa - 2020",
+        ["Países", "Quantidade (Kg)", "Valor (US$)"],
+        [["Alemanha", "1.234", "5.678"], ["Paraguai", "-", "-"], ["Total", "1.234", "5.678"]],
+        [None, None, None],
+    ),
+    "http://vitibrasil.cnpuv.embrapa.br/index.php?opcao=opt_06&ano=2020&subopcao=10",
+)
+
+
+def test_grava_e_le_tabela(tmp_path):
+    """
+    Verifica que a tabela gravada é lida no mesmo formato de fetch_embrapa_data.
+    """
+    store = DataStore(str(tmp_path / "teste.db"))
+    assert store.get_table("exportacao", 2020, "vinhos") is None
+
+    store.save_table("exportacao", 2020, "vinhos", TABELA)
+    store.save_table("exportacao", "2020", "vinhos", TABELA)
+
+    assert store.get_table("exportacao", "2020", "vinhos") == TABELA
+    assert store.has_table("exportacao", 2020, "vinhos")
+    assert not store.has_table("exportacao", 2020, None)
+    assert store.stats()["tables"] == 1
+    assert store.stats()["rows"] == 3
+
+
+def test_migra_banco_com_celulas_em_texto(tmp_path):
+    """
+    Verifica a conversão de um banco da versão 1, com as células gravadas como texto.
+    """
+    path = str(tmp_path / "v1.db")
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE tabelas (id INTEGER PRIMARY KEY, categoria TEXT NOT NULL, subcategoria TEXT NOT NULL DEFAULT '',
+            ano INTEGER NOT NULL, titulo TEXT, cabecalhos TEXT NOT NULL, source_url TEXT, atualizado_em TEXT NOT NULL,
+            UNIQUE (categoria, subcategoria, ano));
+        CREATE TABLE linhas (tabela_id INTEGER NOT NULL, posicao INTEGER NOT NULL, produto TEXT, valores TEXT NOT NULL,
+            PRIMARY KEY (tabela_id, posicao)) WITHOUT ROWID;
+    """)
+    conn.execute("INSERT INTO tabelas VALUES (1, 'exportacao', 'vinhos', 2020, ?, ?, ?, '2024-01-01T00:00:00+00:00')",
+                 (TABELA.title, json.dumps(TABELA.headers), TABELA.source_url))
+    for position, cells in enumerate([["Alemanha", "1.234", "5.678"], ["Paraguai", "-", "-"], ["Total", "1.234", "5.678"]]):
+        conn.execute("INSERT INTO linhas VALUES (1, ?, ?, ?)", (position, cells[0], json.dumps(cells)))
+    conn.commit()
+    conn.close()
+
+    store = DataStore(path)
+    assert store.get_table("exportacao", 2020, "vinhos") == TABELA
+    # Os agregados das tabelas existentes são calculados na migração
+    assert store.get_totals("exportacao", "vinhos") == {"Quantidade (Kg)": ([2020], [1234.0]), "Valor (US$)": ([2020], [5678.0])}
+    # As tabelas existentes entram no registro de mudanças como primeira versão
+    assert [(c["seq"], c["year"], c["rows"]) for c in store.get_changes()] == [(1, 2020, 3)]
+
+
+def test_registro_de_mudancas(tmp_path):
+    """
+    Verifica que cada mudança de conteúdo gera uma versão com as diferenças de linhas.
+    """
+    store = DataStore(str(tmp_path / "teste.db"))
+    store.save_table("exportacao", 2020, "vinhos", TABELA)
+    store.save_table("exportacao", 2020, "vinhos", TABELA)
+    assert store.last_seq() == 1
+
+    revisada = Table.from_parsed(
+        ParsedPage(
+            TABELA.title,
+            TABELA.headers,
+            [["Alemanha", "2.000", "5.678"], ["Uruguai", "10", "20"], ["Total", "2.010", "5.698"]],
+            [None, None, None],
+        ),
+        TABELA.source_url,
+    )
+    store.save_table("exportacao", 2020, "vinhos", revisada)
+    store.save_table("producao", 2020, None, TABELA)
+
+    changes = store.get_changes(since=1, with_diff=True)
+    assert [c["seq"] for c in changes] == [2, 3]
+    assert changes[0]["previous_hash"] == TABELA.content_hash()
+    assert changes[0]["content_hash"] == revisada.content_hash()
+    diff = changes[0]["diff"]
+    assert [row["product"] for row in diff["added"]] == ["Uruguai"]
+    assert [row["product"] for row in diff["removed"]] == ["Paraguai"]
+    assert [(row["product"], row["before"][1], row["after"][1]) for row in diff["changed"]] == [
+        ("Alemanha", 1234, 2000),
+        ("Total", 1234, 2010),
+    ]
+    # Primeira versão de uma tabela: sem diferenças
+    assert changes[1]["diff"] is None and changes[1]["previous_hash"] is None
+    assert [c["seq"] for c in store.get_changes(since=0, category="producao")] == [3]
+    assert "diff" not in store.get_changes()[0]
+
+
+def test_ano_fechado_servido_do_armazenamento(monkeypatch):
+    """
+    Verifica que anos encerrados já armazenados não acessam o site da Embrapa.
+    """
+    def fake_scrape(category, year=None, subcategory=None):
+        raise AssertionError("o site da Embrapa não deveria ser consultado")
+
+    api.response_cache.clear()
+    api.data_store.save_table("exportacao", 2020, "vinhos", TABELA)
+    monkeypatch.setattr(api, "_scrape_embrapa_data", fake_scrape)
+
+    assert api.fetch_embrapa_table("exportacao", "2020", "vinhos") == TABELA
+
+
+def test_armazenamento_como_reserva_em_caso_de_erro(monkeypatch):
+    """
+    Verifica que o armazenamento é usado quando o site da Embrapa está indisponível.
+    """
+    api.response_cache.clear()
+    api.data_store.save_table("producao", 2099, None, TABELA)
+    monkeypatch.setattr(api, "_scrape_embrapa_data", lambda *args: {"error": "Erro ao acessar o site da Embrapa"})
+
+    assert api.fetch_embrapa_data("producao", "2099") == TABELA.to_dict()
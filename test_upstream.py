@@ -0,0 +1,63 @@
+import pytest
+import requests
+
+from upstream import CircuitBreaker, CircuitOpenError, EmbrapaClient, UpstreamBusyError
+
+
+def test_novas_tentativas_em_erro_5xx(server):
+    """
+    Verifica que erros 5xx são repetidos até a resposta de sucesso.
+    """
+    server.statuses = [503, 502]
+    client = EmbrapaClient(retries=3, backoff_factor=0)
+
+    assert client.get(server.url).text == "ok"
+    assert server.hits == 3
+    assert client.stats()["errors"] == 0
+
+
+def test_disjuntor_abre_apos_falhas(server):
+    """
+    Verifica que o circuito abre após falhas consecutivas e rejeita novas requisições.
+    """
+    server.statuses = [500, 500]
+    client = EmbrapaClient(retries=0, failure_threshold=2, reset_timeout=60)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.HTTPError):
+            client.get(server.url)
+    with pytest.raises(CircuitOpenError):
+        client.get(server.url)
+
+    assert server.hits == 2
+    assert client.stats()["circuit_state"] == CircuitBreaker.OPEN
+
+
+def test_disjuntor_meio_aberto_libera_uma_requisicao():
+    """
+    Verifica que, passado o tempo de espera, apenas uma requisição de teste é liberada.
+    """
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_requisicao_de_teste_sem_vaga_nao_trava_o_disjuntor(server):
+    """
+    Verifica que a requisição de teste que não obtém vaga libera o disjuntor para a próxima.
+    """
+    client = EmbrapaClient(connect_timeout=0.01, read_timeout=0.01, failure_threshold=1, reset_timeout=0)
+    client.breaker.record_failure()
+    for _ in range(client.max_concurrency):
+        client._semaphore.acquire()
+    with pytest.raises(UpstreamBusyError):
+        client.get(server.url)
+    for _ in range(client.max_concurrency):
+        client._semaphore.release()
+
+    assert client.get(server.url).text == "ok"
+    assert client.stats()["circuit_state"] == CircuitBreaker.CLOSED
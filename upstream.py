@@ -0,0 +1,197 @@
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """Erro lançado quando o circuito está aberto e o site da Embrapa não é consultado."""
+
+
+class UpstreamBusyError(requests.exceptions.RequestException):
+    """Erro lançado quando não há vaga para uma nova requisição ao site da Embrapa."""
+
+
+class CircuitBreaker:
+    """
+    Disjuntor para o site da Embrapa.
+
+    Após ``failure_threshold`` falhas consecutivas o circuito abre e as requisições
+    falham imediatamente durante ``reset_timeout`` segundos. Em seguida uma única
+    requisição de teste é liberada (meio-aberto): se tiver sucesso o circuito fecha,
+    caso contrário volta a abrir.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probing = False
+        return self._state
+
+    def allow(self):
+        """Indica se uma requisição pode ser feita agora."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def abandon(self):
+        """Libera a requisição de teste que terminou sem resposta do site (sem vaga ou cancelada)."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class EmbrapaClient:
+    """
+    Cliente HTTP para o site da Embrapa Vitivinicultura.
+
+    Usa uma sessão com conexões persistentes (keep-alive) em pool, timeouts de
+    conexão e leitura, novas tentativas com backoff exponencial para erros 5xx e
+    de conexão, um semáforo que limita as requisições simultâneas e um disjuntor
+    que interrompe as requisições enquanto o site estiver falhando.
+
+    Se ``archive`` for informado (archive.HtmlArchive), o HTML de cada resposta
+    com sucesso é gravado no arquivo local.
+    """
+
+    def __init__(self, connect_timeout=5, read_timeout=30, retries=3, backoff_factor=0.5,
+                 max_concurrency=8, failure_threshold=5, reset_timeout=30, archive=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_concurrency = max_concurrency
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.archive = archive
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "rejected": 0, "in_flight": 0, "archive_errors": 0}
+
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset(["GET"]),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, url):
+        """
+        Faz uma requisição GET ao site da Embrapa.
+
+        Args:
+            url (str): URL completa da página.
+
+        Returns:
+            requests.Response: Resposta com status de sucesso.
+
+        Raises:
+            CircuitOpenError: Se o circuito estiver aberto.
+            UpstreamBusyError: Se o limite de requisições simultâneas não liberar vaga a tempo.
+            requests.exceptions.RequestException: Em caso de erro de conexão, timeout ou status de erro.
+        """
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("circuito aberto após falhas consecutivas no site da Embrapa")
+
+        try:
+            response = self._send(url)
+        except UpstreamBusyError:
+            self.breaker.abandon()
+            raise
+        except requests.exceptions.RequestException as e:
+            status = e.response.status_code if e.response is not None else None
+            # Erros 4xx indicam problema na requisição, não indisponibilidade do site
+            if status is None or status >= 500:
+                self.breaker.record_failure()
+            else:
+                self.breaker.record_success()
+            raise
+        except BaseException:
+            self.breaker.abandon()
+            raise
+
+        self.breaker.record_success()
+        if self.archive is not None:
+            try:
+                self.archive.save(url, response.content, response.encoding)
+            except (OSError, sqlite3.Error):
+                # Uma falha ao arquivar não impede o uso da resposta
+                self._count("archive_errors")
+        return response
+
+    def _send(self, url):
+        """Faz a requisição dentro do limite de requisições simultâneas."""
+        if not self._semaphore.acquire(timeout=sum(self.timeout)):
+            self._count("rejected")
+            raise UpstreamBusyError("limite de requisições simultâneas ao site da Embrapa atingido")
+        try:
+            self._count("requests")
+            self._count("in_flight")
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response
+        except requests.exceptions.RequestException:
+            self._count("errors")
+            raise
+        finally:
+            self._count("in_flight", -1)
+            self._semaphore.release()
+
+    def stats(self):
+        """Retorna os contadores do cliente e o estado do disjuntor."""
+        with self._lock:
+            stats = dict(self._stats)
+        stats["mode"] = "live"
+        stats["max_concurrency"] = self.max_concurrency
+        stats["circuit_state"] = self.breaker.state
+        return stats
+
+    def close(self):
+        self.session.close()
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._stats[name] += amount